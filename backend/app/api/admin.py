@@ -0,0 +1,83 @@
+"""
+Admin endpoints - on-demand profiling of the current worker
+Only registered when PROFILING_ENABLED=true
+"""
+import asyncio
+import os
+import re
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+
+from app.core.config import settings
+from app.core.profiler import SamplingProfiler, save_profile, profile_path, profile_lock
+from app.middlewares.auth import get_admin_user
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+PROFILE_FORMATS = "^(speedscope|collapsed)$"
+PROFILE_ID_PATTERN = re.compile(r"^[\w-]+$")
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: str = Query("speedscope", pattern=PROFILE_FORMATS),
+    include_idle: bool = False,
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Sample every thread of the worker serving this request for N seconds
+    Returns the profile (speedscope JSON or collapsed stacks)
+    """
+    if seconds > settings.profiling_max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be <= {settings.profiling_max_seconds}")
+    if not profile_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    
+    try:
+        profiler = SamplingProfiler(interval=interval_ms / 1000, include_idle=include_idle)
+        with profiler:
+            # Event loop keeps serving other requests while we sample it
+            await asyncio.sleep(seconds)
+    finally:
+        profile_lock.release()
+    
+    profile_id = save_profile(profiler, format, f"worker {os.getpid()} ({seconds:g}s)")
+    logger.info(
+        "worker_profiled",
+        profile_id=profile_id,
+        seconds=seconds,
+        samples=profiler.sample_count,
+        admin=current_user["email"]
+    )
+    return _profile_response(profile_id, format)
+
+
+@router.get("/profile/{profile_id}")
+def get_profile(
+    profile_id: str,
+    format: str = Query("speedscope", pattern=PROFILE_FORMATS),
+    current_user: dict = Depends(get_admin_user)
+):
+    """
+    Download a saved profile (e.g. one captured with the X-Profile header)
+    """
+    if not PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(profile_path(profile_id, format)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    return _profile_response(profile_id, format)
+
+
+def _profile_response(profile_id: str, fmt: str) -> FileResponse:
+    path = profile_path(profile_id, fmt)
+    media_type = "text/plain" if fmt == "collapsed" else "application/json"
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=os.path.basename(path),
+        headers={"X-Profile-Id": profile_id}
+    )
@@ -5,25 +5,222 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func, cast, Date
 from uuid import UUID
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional
 
-from app.db.base import get_db
+from app.db.replica import read_session
 from app.db import models, crud
 from app.schemas.analytics import (
     TokenAnalyticsResponse, TokenStats, SessionTokenStats, DailyTokenStats,
     SessionCompareRequest, SessionCompareResponse, SessionCompareItem
 )
 from app.middlewares.auth import get_current_user
+from app.core.cache import CachedEndpoint
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
+# by_day covers this many calendar days
+BY_DAY_WINDOW_DAYS = 30
+
+# Per-user response caches - ChatService writes invalidate them
+tokens_cache = CachedEndpoint(
+    "analytics_tokens", ttl=settings.analytics_cache_ttl_seconds, stale=settings.analytics_cache_stale_seconds
+)
+compare_cache = CachedEndpoint(
+    "analytics_compare", ttl=settings.analytics_cache_ttl_seconds, stale=settings.analytics_cache_stale_seconds
+)
+
+
+def build_compare_item(session: models.ChatSession, messages) -> SessionCompareItem:
+    """
+    Aggregate one session's messages into compare stats
+    """
+    assistant_msgs = [m for m in messages if m.role == "assistant"]
+    
+    # Calculate stats
+    total_tokens = sum((m.prompt_tokens or 0) + (m.completion_tokens or 0) for m in assistant_msgs)
+    
+    # Average confidence (legacy) and signal_strength (v2.1)
+    confidences = [m.confidence for m in assistant_msgs if m.confidence is not None]
+    avg_confidence = round(sum(confidences) / len(confidences), 3) if confidences else None
+    
+    signal_strengths = [m.signal_strength for m in assistant_msgs if hasattr(m, 'signal_strength') and m.signal_strength is not None]
+    avg_signal_strength = round(sum(signal_strengths) / len(signal_strengths), 3) if signal_strengths else None
+    
+    # Persona distribution (legacy or persona_used from metadata)
+    persona_dist = {}
+    for m in assistant_msgs:
+        if m.persona:
+            persona_dist[m.persona] = persona_dist.get(m.persona, 0) + 1
+    
+    # Tone distribution (v2.0+)
+    tone_dist = {}
+    for m in assistant_msgs:
+        if hasattr(m, 'tone') and m.tone:
+            tone_dist[m.tone] = tone_dist.get(m.tone, 0) + 1
+    
+    # Behavior distribution (v2.0+)
+    behavior_dist = {}
+    for m in assistant_msgs:
+        if hasattr(m, 'behavior') and m.behavior:
+            behavior_dist[m.behavior] = behavior_dist.get(m.behavior, 0) + 1
+    
+    # Model used (most common)
+    models_used = [m.model_name for m in assistant_msgs if m.model_name]
+    model_used = max(set(models_used), key=models_used.count) if models_used else None
+    
+    # Duration (first to last message)
+    if messages:
+        first_msg = min(messages, key=lambda m: m.created_at)
+        last_msg = max(messages, key=lambda m: m.created_at)
+        duration = (last_msg.created_at - first_msg.created_at).total_seconds() / 60
+    else:
+        duration = 0.0
+    
+    return SessionCompareItem(
+        session_id=session.id,
+        title=session.title,
+        message_count=len(messages),
+        total_tokens=total_tokens,
+        avg_confidence=avg_confidence,
+        avg_signal_strength=avg_signal_strength,
+        persona_distribution=persona_dist,
+        tone_distribution=tone_dist,
+        behavior_distribution=behavior_dist,
+        model_used=model_used,
+        created_at=session.created_at,
+        duration_minutes=round(duration, 2)
+    )
+
+
+def token_analytics(db: Session, user_id: UUID) -> TokenAnalyticsResponse:
+    """
+    Token usage of a user (uncached - see get_token_analytics)
+    """
+    # Get all user's sessions
+    user_sessions = db.query(models.ChatSession).filter(
+        models.ChatSession.user_id == user_id
+    ).all()
+    session_ids = [s.id for s in user_sessions]
+    
+    if not session_ids:
+        return TokenAnalyticsResponse(
+            overall=TokenStats(),
+            by_session=[],
+            by_day=[]
+        )
+    
+    # Messages don't predate their session (beyond crud.SINCE_MARGIN) - lower
+    # bound on the partition key lets the planner skip older partitions
+    since = min((s.created_at for s in user_sessions if s.created_at), default=None)
+    created_filter = [models.Message.created_at >= since - crud.SINCE_MARGIN] if since else []
+    
+    # Overall stats
+    overall_query = db.query(
+        func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
+        func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
+        func.count(models.Message.id).label("count")
+    ).filter(
+        models.Message.session_id.in_(session_ids),
+        models.Message.role == "assistant",
+        *created_filter
+    ).first()
+    
+    # Archived sessions' messages left the hot table - add their stored totals
+    archived_ids = [s.id for s in user_sessions if s.is_archived]
+    archives = db.query(
+        models.SessionArchive.session_id,
+        models.SessionArchive.prompt_tokens.label("prompt"),
+        models.SessionArchive.completion_tokens.label("completion"),
+        models.SessionArchive.assistant_message_count.label("count")
+    ).filter(
+        models.SessionArchive.session_id.in_(archived_ids)
+    ).all() if archived_ids else []
+    
+    total_prompt = (overall_query.prompt or 0) + sum(a.prompt for a in archives)
+    total_completion = (overall_query.completion or 0) + sum(a.completion for a in archives)
+    total_count = (overall_query.count or 0) + sum(a.count for a in archives)
+    
+    overall = TokenStats(
+        total_prompt_tokens=total_prompt,
+        total_completion_tokens=total_completion,
+        total_tokens=total_prompt + total_completion,
+        message_count=total_count,
+        avg_tokens_per_message=round((total_prompt + total_completion) / total_count, 2) if total_count > 0 else 0
+    )
+    
+    # By session stats
+    by_session_query = db.query(
+        models.Message.session_id,
+        func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
+        func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
+        func.count(models.Message.id).label("count")
+    ).filter(
+        models.Message.session_id.in_(session_ids),
+        models.Message.role == "assistant",
+        *created_filter
+    ).group_by(models.Message.session_id).all()
+    
+    # Map session titles
+    session_map = {s.id: s for s in user_sessions}
+    
+    by_session = []
+    for row in [*by_session_query, *(a for a in archives if a.count)]:
+        session = session_map.get(row.session_id)
+        by_session.append(SessionTokenStats(
+            session_id=row.session_id,
+            session_title=session.title if session else None,
+            prompt_tokens=row.prompt,
+            completion_tokens=row.completion,
+            total_tokens=row.prompt + row.completion,
+            message_count=row.count,
+            created_at=session.created_at if session else datetime.utcnow()
+        ))
+    
+    # Sort by total tokens desc
+    by_session.sort(key=lambda x: x.total_tokens, reverse=True)
+    
+    # By day stats (last BY_DAY_WINDOW_DAYS days - prunes to 1-2 partitions).
+    # Hot table only: sessions are archived after ARCHIVE_IDLE_DAYS without
+    # activity, which (at the default 90) is well outside the window
+    by_day_since = datetime.utcnow() - timedelta(days=BY_DAY_WINDOW_DAYS)
+    by_day_query = db.query(
+        cast(models.Message.created_at, Date).label("date"),
+        func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
+        func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
+        func.count(models.Message.id).label("count")
+    ).filter(
+        models.Message.session_id.in_(session_ids),
+        models.Message.role == "assistant",
+        models.Message.created_at >= by_day_since
+    ).group_by(cast(models.Message.created_at, Date)).order_by(
+        cast(models.Message.created_at, Date).desc()
+    ).limit(BY_DAY_WINDOW_DAYS).all()
+    
+    by_day = [
+        DailyTokenStats(
+            date=row.date,
+            prompt_tokens=row.prompt,
+            completion_tokens=row.completion,
+            total_tokens=row.prompt + row.completion,
+            message_count=row.count
+        )
+        for row in by_day_query
+    ]
+    
+    return TokenAnalyticsResponse(
+        overall=overall,
+        by_session=by_session,
+        by_day=by_day
+    )
+
 
 @router.get("/tokens", response_model=TokenAnalyticsResponse)
-def get_token_analytics(
-    db: Session = Depends(get_db),
+async def get_token_analytics(
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -31,200 +228,66 @@ def get_token_analytics(
     - Overall stats
     - By session
     - By day
+    Cached per user, refreshed in the background once stale
     """
     try:
         user_id = UUID(current_user["user_id"])
         
-        # Get all user's sessions
-        user_sessions = db.query(models.ChatSession).filter(
-            models.ChatSession.user_id == user_id
-        ).all()
-        session_ids = [s.id for s in user_sessions]
-        
-        if not session_ids:
-            return TokenAnalyticsResponse(
-                overall=TokenStats(),
-                by_session=[],
-                by_day=[]
-            )
-        
-        # Overall stats
-        overall_query = db.query(
-            func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
-            func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
-            func.count(models.Message.id).label("count")
-        ).filter(
-            models.Message.session_id.in_(session_ids),
-            models.Message.role == "assistant"
-        ).first()
-        
-        total_prompt = overall_query.prompt or 0
-        total_completion = overall_query.completion or 0
-        total_count = overall_query.count or 0
+        def load() -> TokenAnalyticsResponse:
+            with read_session(user_id) as db:
+                return token_analytics(db, user_id)
         
-        overall = TokenStats(
-            total_prompt_tokens=total_prompt,
-            total_completion_tokens=total_completion,
-            total_tokens=total_prompt + total_completion,
-            message_count=total_count,
-            avg_tokens_per_message=round((total_prompt + total_completion) / total_count, 2) if total_count > 0 else 0
-        )
-        
-        # By session stats
-        by_session_query = db.query(
-            models.Message.session_id,
-            func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
-            func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
-            func.count(models.Message.id).label("count")
-        ).filter(
-            models.Message.session_id.in_(session_ids),
-            models.Message.role == "assistant"
-        ).group_by(models.Message.session_id).all()
-        
-        # Map session titles
-        session_map = {s.id: s for s in user_sessions}
-        
-        by_session = []
-        for row in by_session_query:
-            session = session_map.get(row.session_id)
-            by_session.append(SessionTokenStats(
-                session_id=row.session_id,
-                session_title=session.title if session else None,
-                prompt_tokens=row.prompt,
-                completion_tokens=row.completion,
-                total_tokens=row.prompt + row.completion,
-                message_count=row.count,
-                created_at=session.created_at if session else datetime.utcnow()
-            ))
-        
-        # Sort by total tokens desc
-        by_session.sort(key=lambda x: x.total_tokens, reverse=True)
-        
-        # By day stats
-        by_day_query = db.query(
-            cast(models.Message.created_at, Date).label("date"),
-            func.coalesce(func.sum(models.Message.prompt_tokens), 0).label("prompt"),
-            func.coalesce(func.sum(models.Message.completion_tokens), 0).label("completion"),
-            func.count(models.Message.id).label("count")
-        ).filter(
-            models.Message.session_id.in_(session_ids),
-            models.Message.role == "assistant"
-        ).group_by(cast(models.Message.created_at, Date)).order_by(
-            cast(models.Message.created_at, Date).desc()
-        ).limit(30).all()
-        
-        by_day = [
-            DailyTokenStats(
-                date=row.date,
-                prompt_tokens=row.prompt,
-                completion_tokens=row.completion,
-                total_tokens=row.prompt + row.completion,
-                message_count=row.count
-            )
-            for row in by_day_query
-        ]
-        
-        return TokenAnalyticsResponse(
-            overall=overall,
-            by_session=by_session,
-            by_day=by_day
-        )
+        return await tokens_cache.get(user_id, "all", load)
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("get_token_analytics_error", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to get token analytics")
 
 
+def session_compare_stats(db: Session, session_id: UUID, user_id: UUID) -> SessionCompareItem:
+    """
+    Compare stats of one of the user's sessions (404 if not theirs)
+    """
+    # Ownership-scoped lookup (not found and not owned look the same)
+    session = crud.get_user_session(db, session_id, user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    
+    # Archived sessions are read from the archive - a cached (possibly
+    # background) load on a replica must not restore and commit
+    if session.is_archived:
+        messages = crud.get_archived_session_messages(db, session_id)
+    else:
+        messages = crud.get_session_messages(db, session_id, since=session.created_at)
+    return build_compare_item(session, messages)
+
+
 @router.post("/compare", response_model=SessionCompareResponse)
-def compare_sessions(
+async def compare_sessions(
     request: SessionCompareRequest,
-    db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Compare two sessions side by side
+    Cached per user + session pair, refreshed in the background once stale
     """
     try:
         user_id = UUID(current_user["user_id"])
         
-        # Check ownership of both sessions
-        if not crud.check_session_ownership(db, request.session_id_1, user_id):
-            raise HTTPException(status_code=403, detail="Not authorized to access session 1")
-        if not crud.check_session_ownership(db, request.session_id_2, user_id):
-            raise HTTPException(status_code=403, detail="Not authorized to access session 2")
-        
-        def get_session_stats(session_id: UUID) -> SessionCompareItem:
-            session = crud.get_session(db, session_id)
-            if not session:
-                raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
-            
-            messages = crud.get_session_messages(db, session_id)
-            assistant_msgs = [m for m in messages if m.role == "assistant"]
-            
-            # Calculate stats
-            total_tokens = sum((m.prompt_tokens or 0) + (m.completion_tokens or 0) for m in assistant_msgs)
-            
-            # Average confidence (legacy) and signal_strength (v2.1)
-            confidences = [m.confidence for m in assistant_msgs if m.confidence is not None]
-            avg_confidence = round(sum(confidences) / len(confidences), 3) if confidences else None
-            
-            signal_strengths = [m.signal_strength for m in assistant_msgs if hasattr(m, 'signal_strength') and m.signal_strength is not None]
-            avg_signal_strength = round(sum(signal_strengths) / len(signal_strengths), 3) if signal_strengths else None
-            
-            # Persona distribution (legacy or persona_used from metadata)
-            persona_dist = {}
-            for m in assistant_msgs:
-                if m.persona:
-                    persona_dist[m.persona] = persona_dist.get(m.persona, 0) + 1
-            
-            # Tone distribution (v2.0+)
-            tone_dist = {}
-            for m in assistant_msgs:
-                if hasattr(m, 'tone') and m.tone:
-                    tone_dist[m.tone] = tone_dist.get(m.tone, 0) + 1
-            
-            # Behavior distribution (v2.0+)
-            behavior_dist = {}
-            for m in assistant_msgs:
-                if hasattr(m, 'behavior') and m.behavior:
-                    behavior_dist[m.behavior] = behavior_dist.get(m.behavior, 0) + 1
-            
-            # Model used (most common)
-            models_used = [m.model_name for m in assistant_msgs if m.model_name]
-            model_used = max(set(models_used), key=models_used.count) if models_used else None
-            
-            # Duration (first to last message)
-            if messages:
-                first_msg = min(messages, key=lambda m: m.created_at)
-                last_msg = max(messages, key=lambda m: m.created_at)
-                duration = (last_msg.created_at - first_msg.created_at).total_seconds() / 60
-            else:
-                duration = 0.0
-            
-            return SessionCompareItem(
-                session_id=session_id,
-                title=session.title,
-                message_count=len(messages),
-                total_tokens=total_tokens,
-                avg_confidence=avg_confidence,
-                avg_signal_strength=avg_signal_strength,
-                persona_distribution=persona_dist,
-                tone_distribution=tone_dist,
-                behavior_distribution=behavior_dist,
-                model_used=model_used,
-                created_at=session.created_at,
-                duration_minutes=round(duration, 2)
-            )
+        def load() -> SessionCompareResponse:
+            with read_session(user_id) as db:
+                return SessionCompareResponse(
+                    session_1=session_compare_stats(db, request.session_id_1, user_id),
+                    session_2=session_compare_stats(db, request.session_id_2, user_id)
+                )
         
-        session_1_stats = get_session_stats(request.session_id_1)
-        session_2_stats = get_session_stats(request.session_id_2)
-        
-        return SessionCompareResponse(
-            session_1=session_1_stats,
-            session_2=session_2_stats
-        )
+        pair = f"{request.session_id_1}:{request.session_id_2}"
+        return await compare_cache.get(user_id, pair, load)
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("compare_sessions_error", error=str(e))
@@ -16,13 +16,15 @@ from app.schemas.auth import (
     UpdateProfileRequest
 )
 from app.middlewares.auth import get_current_user
+from app.middlewares.rate_limit import auth_rate_limit
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-@router.post("/register", response_model=TokenResponse)
+@router.post("/register", response_model=TokenResponse, dependencies=[Depends(auth_rate_limit)])
 def register(request: RegisterRequest, db: Session = Depends(get_db)):
     """Register new user"""
     try:
@@ -53,14 +55,14 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
             user=UserResponse.model_validate(user)
         )
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("register_error", error=str(e))
         raise HTTPException(status_code=500, detail="Registration failed")
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(auth_rate_limit)])
 def login(request: LoginRequest, db: Session = Depends(get_db)):
     """Login user"""
     try:
@@ -95,7 +97,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
             user=UserResponse.model_validate(user)
         )
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("login_error", error=str(e))
@@ -115,7 +117,7 @@ def get_current_user_info(
         
         return UserResponse.model_validate(user)
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("get_user_info_error", error=str(e))
@@ -141,6 +143,9 @@ def update_profile(
         
         return UserResponse.model_validate(user)
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("update_profile_error", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to update profile")
@@ -0,0 +1,57 @@
+"""
+Change feed endpoint - push instead of polling /sessions and history
+"""
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.core.change_feed import change_hub
+from app.core.config import settings
+from app.middlewares.auth import get_stream_user
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/changes", tags=["changes"])
+
+
+@router.get("")
+async def stream_changes(current_user: dict = Depends(get_stream_user)):
+    """
+    Server-sent events for the user's sessions and messages (all tabs/devices)
+    
+    - `ready` once subscribed, then one event per change (`message.created`,
+      `message.deleted`, `session.created`, `session.updated`, `session.deleted`)
+      with a compact JSON body - refetch what you need
+    - `resync`: events were missed (slow client / listener reconnect) - refetch everything
+    - Auth: Bearer header, or `?access_token=` for EventSource
+    """
+    if not settings.change_feed_enabled:
+        raise HTTPException(status_code=404, detail="Change feed disabled")
+    
+    user_id = current_user["user_id"]
+    
+    async def events():
+        # Subscribed inside the generator so a client gone before the first
+        # chunk never leaves a queue behind
+        queue = change_hub.subscribe(user_id)
+        logger.info("change_feed_subscribed", user_id=user_id)
+        try:
+            yield "event: ready\ndata: {}\n\n"
+            while True:
+                try:
+                    change = await asyncio.wait_for(queue.get(), timeout=settings.change_feed_heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {change['type']}\ndata: {json.dumps(change)}\n\n"
+        finally:
+            change_hub.unsubscribe(user_id, queue)
+            logger.info("change_feed_unsubscribed", user_id=user_id)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
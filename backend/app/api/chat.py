@@ -1,14 +1,19 @@
 """
 Chat endpoints
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from uuid import UUID
 
 from app.db.base import get_db
+from app.db.replica import get_read_db
 from app.schemas.chat import ChatRequest, ChatResponse, HistoryResponse
 from app.services.chat_service import chat_service
 from app.middlewares.auth import get_current_user
+from app.middlewares.rate_limit import chat_rate_limit, rate_limit_exceeded
+from app.core.rate_limit import RateLimitExceeded
+from app.core.disconnect import cancel_on_disconnect, ClientDisconnected
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 from app.db import crud
 
@@ -16,9 +21,10 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-@router.post("", response_model=ChatResponse)
+@router.post("", response_model=ChatResponse, dependencies=[Depends(chat_rate_limit)])
 async def send_message(
     request: ChatRequest,
+    http_request: Request,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
@@ -26,29 +32,41 @@ async def send_message(
     Send a chat message
     
     - Creates new session if session_id not provided
-    - Calls AI Core
+    - Rate limited per user / IP; AI Core calls fair-queued across users
+    - Calls AI Core (cancelled if the client disconnects)
     - Saves to database
     - Returns response with AI metadata
     """
     try:
         user_id = UUID(current_user["user_id"])
         
-        # If session_id provided, check ownership
+        # If session_id provided, ownership-scoped lookup (cached for ChatService)
         if request.session_id:
-            if not crud.check_session_ownership(db, request.session_id, current_user["user_id"]):
-                raise HTTPException(status_code=403, detail="Not authorized to access this session")
+            if not crud.get_user_session(db, UUID(request.session_id), user_id):
+                raise HTTPException(status_code=404, detail="Session not found")
         
-        response = await chat_service.process_message(
+        # Client disconnect cancels the AI Core request
+        response = await cancel_on_disconnect(http_request, chat_service.process_message(
             db=db,
             user_id=user_id,
             message=request.message,
             session_id=request.session_id
-        )
+        ))
         
         return response
     
     except HTTPException:
         raise
+    
+    except RateLimitExceeded as e:
+        raise rate_limit_exceeded(e)
+    
+    except ClientDisconnected:
+        # Nobody is listening; 499 (client closed request) keeps logs/metrics honest
+        raise HTTPException(status_code=499, detail="Client closed request")
+        
+    except DeadlineExceeded:
+        raise HTTPException(status_code=504, detail="Request deadline exceeded")
         
     except ValueError as e:
         logger.error("chat_value_error", error=str(e))
@@ -78,20 +96,23 @@ async def send_message(
 @router.get("/history/{session_id}", response_model=HistoryResponse)
 async def get_history(
     session_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get conversation history for a session
     """
     try:
-        # Check ownership
-        if not crud.check_session_ownership(db, session_id, current_user["user_id"]):
-            raise HTTPException(status_code=403, detail="Not authorized to access this session")
+        # Ownership-scoped lookup (not found and not owned look the same)
+        if not crud.get_user_session(db, session_id, UUID(current_user["user_id"])):
+            raise HTTPException(status_code=404, detail="Session not found")
         
         history = await chat_service.get_history(db, session_id)
         return history
         
+    except HTTPException:
+        raise
+        
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     
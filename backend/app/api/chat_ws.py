@@ -0,0 +1,234 @@
+"""
+Multiplexed WebSocket chat - one authenticated connection, many turns
+
+    ws://host/chat/ws  (?access_token=<JWT>, or send {"type": "auth", "token": ...} first)
+
+Client -> server:
+    {"type": "chat", "id": "c1", "message": "...", "session_id": null}
+    {"type": "cancel", "id": "c1"}
+    {"type": "subscribe", "channel": "changes"}   # change feed, as GET /changes
+    {"type": "ping"}
+Server -> client (every turn frame carries the client's id):
+    {"type": "ready", "user_id": ...}
+    {"type": "token", "id": "c1", "token": "..."}            # streamed reply (AI_CORE_STREAMING,
+                                                             # else the whole reply once)
+    {"type": "done", "id": "c1", "session_id": ..., "response": ..., "metadata": {...}}
+    {"type": "error", "id": "c1", "status": 429, "detail": "..."}
+    {"type": "cancelled", "id": "c1"}
+    {"type": "change", "change": {...}}
+    {"type": "pong"}
+
+Turns go through ChatService.process_message exactly like POST /chat (same
+rate limit, fair queue, deadline, persistence and disconnect policy); each
+turn gets its own DB session. Flow control: at most WS_MAX_IN_FLIGHT_TURNS
+turns per connection, and a bounded send queue - when the client reads
+slowly, token producers wait, which slows reading from AI Core.
+"""
+import asyncio
+import json
+from typing import Dict, Optional
+from uuid import UUID, uuid4
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+
+from app.db.base import SessionLocal
+from app.db import crud
+from app.db.replica import replica_router
+from app.schemas.chat import ChatRequest
+from app.services.chat_service import chat_service
+from app.core.auth import decode_access_token
+from app.core.change_feed import change_hub
+from app.core.config import settings
+from app.core.deadline import DeadlineExceeded, route_timeout_ms, set_deadline, reset_deadline
+from app.core.rate_limit import RateLimitExceeded
+from app.core.logging import get_logger
+from app.core import metrics
+from app.middlewares.rate_limit import chat_rate_limit
+from app.middlewares.request_id import request_id_var
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/chat", tags=["chat"])
+
+
+def turn_error(error: Exception) -> Dict[str, object]:
+    """Error frame fields - same status codes as POST /chat"""
+    if isinstance(error, RateLimitExceeded):
+        metrics.rate_limit_rejections_total.labels(limit=error.limit).inc()
+        return {"status": 429, "detail": "Too many requests - please slow down", "retry_after": error.headers()["Retry-After"]}
+    if isinstance(error, DeadlineExceeded):
+        return {"status": 504, "detail": "Request deadline exceeded"}
+    if isinstance(error, ValueError):
+        return {"status": 404, "detail": str(error)}
+    if "timeout" in str(error).lower():
+        return {"status": 503, "detail": "AI Core timeout - please try again"}
+    if "connect" in str(error).lower():
+        return {"status": 503, "detail": "Cannot connect to AI Core - is it running?"}
+    return {"status": 500, "detail": f"Internal error: {str(error)}"}
+
+
+class ChatConnection:
+    """One authenticated socket: turn tasks, change subscription, bounded outbox"""
+
+    def __init__(self, websocket: WebSocket, user_id: str):
+        self.websocket = websocket
+        self.user_id = user_id
+        self.ip = websocket.client.host if websocket.client else "unknown"
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.ws_send_queue_size)
+        self.turns: Dict[str, asyncio.Task] = {}
+        self.changes: Optional[asyncio.Task] = None
+
+    async def send(self, frame: dict) -> None:
+        """Queue a frame; waits while the outbox is full (backpressure)"""
+        await self.outbox.put(frame)
+
+    async def writer(self) -> None:
+        while True:
+            frame = await self.outbox.get()
+            await self.websocket.send_text(json.dumps(frame))
+
+    async def serve(self) -> None:
+        """Read frames until the client goes away"""
+        while True:
+            try:
+                frame = json.loads(await self.websocket.receive_text())
+            except ValueError:
+                frame = None
+            if not isinstance(frame, dict):
+                await self.send({"type": "error", "status": 400, "detail": "Frames must be JSON objects"})
+                continue
+            
+            kind = frame.get("type")
+            if kind == "chat":
+                await self.start_turn(frame)
+            elif kind == "cancel":
+                turn = self.turns.get(str(frame.get("id")))
+                if turn is not None:
+                    turn.cancel()
+            elif kind == "subscribe" and frame.get("channel") == "changes":
+                if self.changes is None:
+                    self.changes = asyncio.create_task(self.forward_changes())
+            elif kind == "ping":
+                await self.send({"type": "pong"})
+            else:
+                await self.send({"type": "error", "status": 400, "detail": f"Unknown frame type: {kind}"})
+
+    async def start_turn(self, frame: dict) -> None:
+        turn_id = str(frame.get("id") or "")
+        if not turn_id or turn_id in self.turns:
+            await self.send({"type": "error", "id": turn_id, "status": 400, "detail": "Each turn needs a unique id"})
+            return
+        if len(self.turns) >= settings.ws_max_in_flight_turns:
+            await self.send({"type": "error", "id": turn_id, "status": 429, "detail": "Too many turns in flight"})
+            return
+        try:
+            request = ChatRequest(message=frame.get("message"), session_id=frame.get("session_id"))
+        except ValidationError as e:
+            await self.send({"type": "error", "id": turn_id, "status": 422, "detail": e.errors(include_url=False)})
+            return
+        task = asyncio.create_task(self.run_turn(turn_id, request))
+        task.add_done_callback(lambda done: self.turn_finished(turn_id, done))
+        self.turns[turn_id] = task
+
+    async def run_turn(self, turn_id: str, request: ChatRequest) -> None:
+        """One chat turn - the same path as POST /chat, tokens streamed"""
+        request_id_var.set(str(uuid4()))
+        deadline_token = set_deadline(route_timeout_ms("POST", "/chat"))
+        db = SessionLocal()
+        try:
+            if settings.rate_limit_enabled:
+                await chat_rate_limit.take(self.user_id, self.ip)
+            
+            user_id = UUID(self.user_id)
+            if request.session_id and not crud.get_user_session(db, UUID(request.session_id), user_id):
+                await self.send({"type": "error", "id": turn_id, "status": 404, "detail": "Session not found"})
+                return
+            
+            async def on_token(token: str) -> None:
+                await self.send({"type": "token", "id": turn_id, "token": token})
+            
+            response = await chat_service.process_message(
+                db=db,
+                user_id=user_id,
+                message=request.message,
+                session_id=request.session_id,
+                on_token=on_token
+            )
+            await self.send({"type": "done", "id": turn_id, **response.model_dump(mode="json")})
+        
+        except Exception as e:
+            error = turn_error(e)
+            log = logger.error if error["status"] >= 500 else logger.warning
+            log("ws_chat_turn_failed", turn_id=turn_id, status=error["status"], error=str(e))
+            await self.send({"type": "error", "id": turn_id, **error})
+        
+        finally:
+            db.close()
+            reset_deadline(deadline_token)
+            # No HTTP request to carry the user to the commit hook
+            replica_router.note_write(self.user_id)
+
+    def turn_finished(self, turn_id: str, task: asyncio.Task) -> None:
+        """Done callback - also runs for turns cancelled before they started"""
+        self.turns.pop(turn_id, None)
+        # Cancel frame or connection closed - ChatService applied CHAT_DISCONNECT_POLICY
+        if task.cancelled() and not self.outbox.full():
+            self.outbox.put_nowait({"type": "cancelled", "id": turn_id})
+
+    async def forward_changes(self) -> None:
+        queue = change_hub.subscribe(self.user_id)
+        try:
+            while True:
+                await self.send({"type": "change", "change": await queue.get()})
+        finally:
+            change_hub.unsubscribe(self.user_id, queue)
+
+    async def close(self) -> None:
+        """Cancel everything; wait so cancelled turns finish their cleanup"""
+        tasks = list(self.turns.values()) + ([self.changes] if self.changes else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def authenticate(websocket: WebSocket) -> Optional[str]:
+    """user_id from ?access_token= or a first {"type": "auth"} frame"""
+    token = websocket.query_params.get("access_token")
+    if not token:
+        try:
+            frame = json.loads(
+                await asyncio.wait_for(websocket.receive_text(), timeout=settings.ws_auth_timeout)
+            )
+        except (asyncio.TimeoutError, ValueError):
+            return None
+        if not isinstance(frame, dict) or frame.get("type") != "auth":
+            return None
+        token = frame.get("token")
+    
+    payload = decode_access_token(token) if token else None
+    return payload.get("sub") if payload else None
+
+
+@router.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """Persistent chat connection - see module docstring for the protocol"""
+    await websocket.accept()
+    user_id = await authenticate(websocket)
+    if not user_id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Invalid or expired token")
+        return
+    
+    connection = ChatConnection(websocket, user_id)
+    writer = asyncio.create_task(connection.writer())
+    metrics.ws_connections.inc()
+    logger.info("ws_connected", user_id=user_id)
+    try:
+        await connection.send({"type": "ready", "user_id": user_id})
+        await connection.serve()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await connection.close()
+        writer.cancel()
+        metrics.ws_connections.dec()
+        logger.info("ws_disconnected", user_id=user_id)
@@ -7,6 +7,8 @@ from uuid import UUID
 
 from app.db.base import get_db
 from app.db import crud
+from app.db.instrumentation import current_query_stats
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -44,10 +46,11 @@ def get_message_metadata(
                 "prompt_tokens": message.prompt_tokens,
                 "completion_tokens": message.completion_tokens
             },
-            "created_at": message.created_at
+            "created_at": message.created_at,
+            "query_budget": current_query_stats().as_dict() if current_query_stats() else None
         }
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     
     except Exception as e:
@@ -77,9 +80,13 @@ def get_session_events(
                     "created_at": event.created_at
                 }
                 for event in events
-            ]
+            ],
+            "query_budget": current_query_stats().as_dict() if current_query_stats() else None
         }
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("get_events_error", error=str(e))
         raise HTTPException(status_code=500, detail="Internal error")
@@ -4,6 +4,11 @@ Health check endpoints
 from fastapi import APIRouter
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
+
+from app.core.admission import admission_controller
+from app.services.ai_core import ai_core_client
+from app.db.replica import replica_router
 
 router = APIRouter()
 
@@ -13,6 +18,9 @@ class HealthResponse(BaseModel):
     status: str
     timestamp: datetime
     service: str
+    admission: Optional[dict] = None  # Load signals / shedding state (/health only)
+    ai_core: Optional[dict] = None  # AI Core replica states (/health only)
+    db_replicas: Optional[dict] = None  # Read replica lag (/health only, when configured)
 
 
 @router.get("/", response_model=HealthResponse)
@@ -27,9 +35,15 @@ async def root():
 
 @router.get("/health", response_model=HealthResponse)
 async def health():
-    """Detailed health check"""
+    """Detailed health check - "degraded" while shedding load or with no AI Core replica available"""
+    admission = admission_controller.snapshot()
+    ai_core = ai_core_client.pool.snapshot()
+    degraded = admission["state"] != "ok" or not ai_core["available"]
     return HealthResponse(
-        status="healthy",
+        status="degraded" if degraded else "healthy",
         timestamp=datetime.utcnow(),
-        service="conversation-service"
+        service="conversation-service",
+        admission=admission,
+        ai_core=ai_core,
+        db_replicas=replica_router.snapshot() if replica_router.enabled else None
     )
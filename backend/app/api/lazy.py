@@ -0,0 +1,82 @@
+"""
+Lazy routers - import rarely used API modules on first request
+
+A placeholder route claims the router's prefix (/debug, /analytics, ...).
+The first request under that prefix imports the module, swaps the
+placeholder for the real routes and re-dispatches, so a worker that never
+serves those endpoints never pays for importing/registering them.
+
+Note: under gunicorn --preload the import happens per worker after fork
+(not shared copy-on-write) - only worth it for routers most workers never hit.
+"""
+import importlib
+import time
+
+from fastapi import FastAPI
+from starlette.routing import BaseRoute, Match
+from starlette.types import Receive, Scope, Send
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class LazyRouter(BaseRoute):
+    """Placeholder for app.api.<name>.router until a request needs it"""
+
+    def __init__(self, app: FastAPI, name: str, prefix: str):
+        self.app = app
+        self.name = name
+        self.prefix = prefix.rstrip("/")
+        # Route template for metrics/tracing until the real routes are in
+        self.path = f"{self.prefix}/*"
+
+    def matches(self, scope: Scope):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            if path == self.prefix or path.startswith(self.prefix + "/"):
+                return Match.FULL, {}
+        return Match.NONE, {}
+
+    def url_path_for(self, name: str, /, **path_params):
+        self.load()
+        return self.app.url_path_for(name, **path_params)
+
+    def load(self) -> None:
+        """Import the module and replace this placeholder with its routes"""
+        if self not in self.app.router.routes:
+            return  # already loaded
+        start = time.perf_counter()
+        module = importlib.import_module(f"app.api.{self.name}")
+        self.app.router.routes.remove(self)
+        self.app.include_router(module.router)
+        self.app.openapi_schema = None
+        logger.info(
+            "router_loaded",
+            router=self.name,
+            duration_ms=round((time.perf_counter() - start) * 1000, 2)
+        )
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send):
+        self.load()
+        # Route again - the real routes now match (or 404/405 as usual)
+        await self.app.router(scope, receive, send)
+
+
+def include_lazy_routers(app: FastAPI, routers: dict) -> None:
+    """
+    Register placeholders for {module name: prefix}
+
+    /openapi.json loads every lazy router first so the schema is complete.
+    """
+    placeholders = [LazyRouter(app, name, prefix) for name, prefix in routers.items()]
+    app.router.routes.extend(placeholders)
+
+    build_openapi = app.openapi
+
+    def openapi():
+        for placeholder in placeholders:
+            placeholder.load()
+        return build_openapi()
+
+    app.openapi = openapi
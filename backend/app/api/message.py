@@ -9,8 +9,11 @@ from typing import Optional, List
 from datetime import datetime
 
 from app.db.base import get_db
+from app.db.replica import get_read_db
 from app.db import crud
 from app.middlewares.auth import get_current_user
+from app.core.cache import invalidate_user_from_thread
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
@@ -62,9 +65,9 @@ def mark_message_mistake(
     try:
         user_id = UUID(current_user["user_id"])
         
-        # Check ownership
-        if not crud.check_message_ownership(db, message_id, user_id):
-            raise HTTPException(status_code=403, detail="Not authorized to modify this message")
+        # Ownership-scoped lookup (not found and not owned look the same)
+        if not crud.get_user_message(db, message_id, user_id):
+            raise HTTPException(status_code=404, detail="Message not found")
         
         message = crud.mark_message_mistake(
             db, 
@@ -75,6 +78,7 @@ def mark_message_mistake(
         
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
+        invalidate_user_from_thread(user_id)
         
         return MessageResponse(
             id=message.id,
@@ -92,7 +96,7 @@ def mark_message_mistake(
             created_at=message.created_at
         )
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("mark_mistake_error", error=str(e))
@@ -102,7 +106,7 @@ def mark_message_mistake(
 @router.get("/mistakes", response_model=MistakesListResponse)
 def get_user_mistakes(
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
@@ -135,6 +139,9 @@ def get_user_mistakes(
             total=len(mistakes)
         )
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("get_mistakes_error", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to get mistakes")
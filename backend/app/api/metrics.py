@@ -0,0 +1,15 @@
+"""
+Prometheus metrics endpoint
+"""
+from fastapi import APIRouter, Response
+
+from app.core.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus exposition (aggregated across workers in multiprocess mode)"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
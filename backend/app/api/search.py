@@ -0,0 +1,48 @@
+"""
+Message search endpoint
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from uuid import UUID
+from typing import Optional
+
+from app.db.base import get_db
+from app.schemas.search import SearchResponse
+from app.services.search_service import search_service
+from app.middlewares.auth import get_current_user
+from app.core.deadline import DeadlineExceeded
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("", response_model=SearchResponse)
+def search_messages(
+    q: str = Query(..., min_length=2, max_length=200, description="Search text"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Search current user's message history
+    
+    - Ranked full-text search, trigram matching for short queries
+    - Snippets HTML-escaped, matches highlighted with <mark></mark>
+    - Keyset pagination via next_cursor
+    """
+    try:
+        user_id = UUID(current_user["user_id"])
+        
+        return search_service.search(db, user_id, q, limit=limit, cursor=cursor)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    except DeadlineExceeded:
+        raise
+    
+    except Exception as e:
+        logger.error("search_error", error=str(e))
+        raise HTTPException(status_code=500, detail="Search failed")
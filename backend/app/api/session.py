@@ -6,10 +6,14 @@ from sqlalchemy.orm import Session
 from uuid import UUID
 
 from app.db.base import get_db
+from app.db.replica import get_read_db
 from app.schemas.session import SessionResponse, SessionListResponse, SessionUpdate
 from app.schemas.replay import SessionReplayResponse, ReplayMessage
 from app.services.session_service import session_service
+from app.services.archive_service import archive_service
 from app.middlewares.auth import get_current_user
+from app.core.cache import invalidate_user_from_thread
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import get_logger
 from app.db import crud
 
@@ -17,6 +21,58 @@ logger = get_logger(__name__)
 router = APIRouter(prefix="/session", tags=["session"])
 
 
+# Cap delay at 10 seconds for replay (real delays can be very long)
+MAX_REPLAY_DELAY_MS = 10000
+
+
+def build_replay(session, messages) -> SessionReplayResponse:
+    """
+    Build replay timeline for a session's messages (ordered by created_at)
+    """
+    if not messages:
+        return SessionReplayResponse(
+            session_id=session.id,
+            title=session.title,
+            messages=[],
+            total_duration_ms=0,
+            message_count=0
+        )
+    
+    # Calculate delays between messages
+    replay_messages = []
+    prev_time = messages[0].created_at
+    total_duration = 0
+    
+    for msg in messages:
+        delay_ms = int((msg.created_at - prev_time).total_seconds() * 1000)
+        delay_ms = min(delay_ms, MAX_REPLAY_DELAY_MS)
+        total_duration += delay_ms
+        
+        replay_messages.append(ReplayMessage(
+            id=msg.id,
+            role=msg.role,
+            content=msg.content,
+            persona=msg.persona,
+            context_type=msg.context_type,
+            confidence=msg.confidence,
+            model_name=msg.model_name,
+            prompt_tokens=msg.prompt_tokens,
+            completion_tokens=msg.completion_tokens,
+            created_at=msg.created_at,
+            delay_ms=delay_ms
+        ))
+        
+        prev_time = msg.created_at
+    
+    return SessionReplayResponse(
+        session_id=session.id,
+        title=session.title,
+        messages=replay_messages,
+        total_duration_ms=total_duration,
+        message_count=len(replay_messages)
+    )
+
+
 @router.post("", response_model=SessionResponse)
 def create_session(
     db: Session = Depends(get_db),
@@ -29,8 +85,12 @@ def create_session(
         user_id = UUID(current_user["user_id"])
         
         session = session_service.create_session(db, user_id)
+        invalidate_user_from_thread(user_id)
         return session
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("create_session_error", error=str(e))
         raise HTTPException(status_code=500, detail="Failed to create session")
@@ -39,21 +99,21 @@ def create_session(
 @router.get("/{session_id}", response_model=SessionResponse)
 def get_session(
     session_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get session by ID
     """
     try:
-        # Check ownership
-        if not crud.check_session_ownership(db, session_id, current_user["user_id"]):
-            raise HTTPException(status_code=403, detail="Not authorized to access this session")
+        # Ownership-scoped lookup (not found and not owned look the same)
+        if not crud.get_user_session(db, session_id, UUID(current_user["user_id"])):
+            raise HTTPException(status_code=404, detail="Session not found")
         
         session = session_service.get_session(db, session_id)
         return session
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     
     except ValueError as e:
@@ -67,18 +127,22 @@ def get_session(
 @router.get("s", response_model=SessionListResponse)
 def list_sessions(
     limit: int = 20,
-    db: Session = Depends(get_db),
+    archived: bool = False,
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
-    List user's sessions
+    List user's sessions (?archived=true for archived ones)
     """
     try:
         user_id = UUID(current_user["user_id"])
         
-        sessions = session_service.list_user_sessions(db, user_id, limit)
+        sessions = session_service.list_user_sessions(db, user_id, limit, archived)
         return sessions
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("list_sessions_error", error=str(e))
         raise HTTPException(status_code=500, detail="Internal error")
@@ -94,18 +158,21 @@ def delete_session(
     Delete session and all messages
     """
     try:
-        # Check ownership
-        if not crud.check_session_ownership(db, session_id, current_user["user_id"]):
-            raise HTTPException(status_code=403, detail="Not authorized to delete this session")
+        user_id = UUID(current_user["user_id"])
+        
+        # Ownership-scoped lookup (not found and not owned look the same)
+        if not crud.get_user_session(db, session_id, user_id):
+            raise HTTPException(status_code=404, detail="Session not found")
         
         success = session_service.delete_session(db, session_id)
         
         if success:
+            invalidate_user_from_thread(user_id)
             return {"status": "deleted", "session_id": str(session_id)}
         else:
             raise HTTPException(status_code=404, detail="Session not found")
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     
     except Exception as e:
@@ -124,18 +191,21 @@ def update_session(
     Update session (rename)
     """
     try:
-        # Check ownership
-        if not crud.check_session_ownership(db, session_id, current_user["user_id"]):
-            raise HTTPException(status_code=403, detail="Not authorized to update this session")
+        user_id = UUID(current_user["user_id"])
+        
+        # Ownership-scoped lookup (not found and not owned look the same)
+        if not crud.get_user_session(db, session_id, user_id):
+            raise HTTPException(status_code=404, detail="Session not found")
         
         updated_session = crud.update_session_title(db, session_id, request.title)
         
         if updated_session:
+            invalidate_user_from_thread(user_id)
             return updated_session
         else:
             raise HTTPException(status_code=404, detail="Session not found")
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     
     except Exception as e:
@@ -146,68 +216,24 @@ def update_session(
 @router.get("/{session_id}/replay", response_model=SessionReplayResponse)
 def get_session_replay(
     session_id: UUID,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: dict = Depends(get_current_user)
 ):
     """
     Get session replay data with timing information
     """
     try:
-        # Check ownership
-        if not crud.check_session_ownership(db, session_id, current_user["user_id"]):
-            raise HTTPException(status_code=403, detail="Not authorized to access this session")
-        
-        session = crud.get_session(db, session_id)
+        # Ownership-scoped lookup (not found and not owned look the same)
+        session = crud.get_user_session(db, session_id, UUID(current_user["user_id"]))
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
+        archive_service.ensure_active(db, session)
         
-        messages = crud.get_session_messages(db, session_id)
-        
-        if not messages:
-            return SessionReplayResponse(
-                session_id=session_id,
-                title=session.title,
-                messages=[],
-                total_duration_ms=0,
-                message_count=0
-            )
-        
-        # Calculate delays between messages
-        replay_messages = []
-        prev_time = messages[0].created_at
-        total_duration = 0
-        
-        for msg in messages:
-            delay_ms = int((msg.created_at - prev_time).total_seconds() * 1000)
-            # Cap delay at 10 seconds for replay (real delays can be very long)
-            delay_ms = min(delay_ms, 10000)
-            total_duration += delay_ms
-            
-            replay_messages.append(ReplayMessage(
-                id=msg.id,
-                role=msg.role,
-                content=msg.content,
-                persona=msg.persona,
-                context_type=msg.context_type,
-                confidence=msg.confidence,
-                model_name=msg.model_name,
-                prompt_tokens=msg.prompt_tokens,
-                completion_tokens=msg.completion_tokens,
-                created_at=msg.created_at,
-                delay_ms=delay_ms
-            ))
-            
-            prev_time = msg.created_at
+        messages = crud.get_session_messages(db, session_id, since=session.created_at)
         
-        return SessionReplayResponse(
-            session_id=session_id,
-            title=session.title,
-            messages=replay_messages,
-            total_duration_ms=total_duration,
-            message_count=len(replay_messages)
-        )
+        return build_replay(session, messages)
         
-    except HTTPException:
+    except (HTTPException, DeadlineExceeded):
         raise
     except Exception as e:
         logger.error("get_session_replay_error", error=str(e))
@@ -223,11 +249,15 @@ def delete_all_sessions(
     Delete ALL sessions for current user
     """
     try:
-        deleted_count = crud.delete_all_user_sessions(db, current_user["user_id"])
+        deleted_count = crud.delete_all_user_sessions(db, UUID(current_user["user_id"]))
+        invalidate_user_from_thread(current_user["user_id"])
         logger.info(f"Deleted {deleted_count} sessions for user {current_user['user_id']}")
         
         return {"deleted": deleted_count}
         
+    except DeadlineExceeded:
+        raise
+    
     except Exception as e:
         logger.error("delete_all_sessions_error", error=str(e))
         raise HTTPException(status_code=500, detail="Internal error")
@@ -0,0 +1,157 @@
+"""
+Admission control - shed low-priority traffic when the worker is overloaded
+
+A monitor task samples four signals every ADMISSION_SAMPLE_INTERVAL_MS:
+- event loop lag (how late a timer fires)
+- threadpool queue depth (sync routes / DB calls waiting for a thread)
+- DB pool wait (worst connection checkout wait)
+- AI Core in-flight (turns holding or waiting for an AI Core slot)
+
+pressure = max(signal / threshold), decaying gradually once load drops.
+Requests are classified by path:
+- critical (POST /chat, /auth, health, metrics) - always admitted
+- normal (sessions, history, messages, search) - shed when pressure >= ADMISSION_SHED_ALL_FACTOR
+- low (analytics, replay, debug, admin) - shed when pressure >= 1
+Shed requests get 503 + Retry-After.
+"""
+import asyncio
+import re
+import time
+from typing import Dict, Optional
+
+import anyio.to_thread
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+from app.core.rate_limit import ai_core_scheduler
+from app.db.instrumentation import pool_wait_stats
+
+logger = get_logger(__name__)
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+
+# Per sample, pressure falls to at most this fraction of its previous value
+PRESSURE_DECAY = 0.8
+
+# Checked in order; first match wins, anything else is NORMAL
+PRIORITY_RULES = [
+    (LOW, None, re.compile(r"^/(analytics|debug|admin)(/|$)")),
+    (LOW, None, re.compile(r"^/session/[^/]+/replay$")),
+    (CRITICAL, "POST", re.compile(r"^/chat$")),
+    (CRITICAL, None, re.compile(r"^/auth(/|$)")),
+    (CRITICAL, None, re.compile(r"^/(health|metrics)?$")),
+]
+
+
+def request_priority(method: str, path: str) -> str:
+    """Priority class of a request"""
+    for priority, rule_method, pattern in PRIORITY_RULES:
+        if (rule_method is None or rule_method == method) and pattern.match(path):
+            return priority
+    return NORMAL
+
+
+class AdmissionController:
+    """Samples load signals on the event loop and decides who gets in"""
+
+    def __init__(self):
+        self.signals: Dict[str, float] = {
+            "event_loop_lag_ms": 0.0,
+            "threadpool_queue": 0,
+            "db_pool_wait_ms": 0.0,
+            "ai_core_in_flight": 0,
+        }
+        self.pressure = 0.0
+        self.sampled_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def thresholds(self) -> Dict[str, float]:
+        return {
+            "event_loop_lag_ms": settings.admission_loop_lag_ms,
+            "threadpool_queue": settings.admission_threadpool_queue,
+            "db_pool_wait_ms": settings.admission_db_pool_wait_ms,
+            "ai_core_in_flight": settings.admission_ai_core_in_flight,
+        }
+
+    @property
+    def state(self) -> str:
+        if self.pressure >= settings.admission_shed_all_factor:
+            return "shedding_normal"
+        if self.pressure >= 1:
+            return "shedding_low"
+        return "ok"
+
+    def admit(self, priority: str) -> bool:
+        if not settings.admission_enabled or priority == CRITICAL:
+            return True
+        if priority == LOW:
+            return self.pressure < 1
+        return self.pressure < settings.admission_shed_all_factor
+
+    def start(self) -> None:
+        """Start sampling (call from the running event loop, e.g. lifespan)"""
+        if settings.admission_enabled and self._task is None:
+            self._task = asyncio.create_task(self._monitor())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _monitor(self) -> None:
+        loop = asyncio.get_running_loop()
+        interval = settings.admission_sample_interval_ms / 1000
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        while True:
+            scheduled = loop.time()
+            await asyncio.sleep(interval)
+            lag = max(0.0, loop.time() - scheduled - interval)
+            self.sample(lag, limiter.statistics().tasks_waiting)
+
+    def sample(self, loop_lag: float, threadpool_queue: int) -> None:
+        """Refresh signals and pressure"""
+        previous = self.state
+        self.signals = {
+            "event_loop_lag_ms": round(loop_lag * 1000, 2),
+            "threadpool_queue": threadpool_queue,
+            "db_pool_wait_ms": round(pool_wait_stats.sample_ms(), 2),
+            "ai_core_in_flight": ai_core_scheduler.active + ai_core_scheduler.queued,
+        }
+        thresholds = self.thresholds
+        current = max(
+            self.signals[name] / thresholds[name] for name in self.signals if thresholds[name] > 0
+        )
+        # Rise immediately, recover gradually - one quiet sample doesn't end shedding
+        self.pressure = max(current, self.pressure * PRESSURE_DECAY)
+        self.sampled_at = time.time()
+        metrics.event_loop_lag_seconds.set(loop_lag)
+        metrics.admission_pressure.set(self.pressure)
+
+        if self.state != previous:
+            logger.warning(
+                "admission_state_changed",
+                previous=previous,
+                state=self.state,
+                pressure=round(self.pressure, 2),
+                **self.signals
+            )
+
+    def snapshot(self) -> dict:
+        """Current state for the health endpoint"""
+        return {
+            "enabled": settings.admission_enabled,
+            "state": self.state,
+            "pressure": round(self.pressure, 3),
+            "signals": self.signals,
+            "thresholds": self.thresholds,
+        }
+
+
+# Global controller (per worker)
+admission_controller = AdmissionController()
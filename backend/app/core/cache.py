@@ -0,0 +1,360 @@
+"""
+Endpoint cache - per-user response caching for expensive, slowly changing reads
+
+    tokens_cache = CachedEndpoint("analytics_tokens", ttl=60, stale=600)
+    return await tokens_cache.get(user_id, params, loader)
+
+- fresh (age < ttl): served from the cache
+- stale (age < ttl + stale): served from the cache, refreshed in the background
+  (stale-while-revalidate)
+- missing / expired: loaded now; concurrent requests for the same key share one
+  load (single flight), and only one worker refreshes a shared entry (lease)
+- invalidate_user(): writes that change a user's data (ChatService, session and
+  message routes) drop all of that user's entries; loads already running for
+  the user are not stored. Every worker also drops its local entries for each
+  change feed event (forget_user), so memory entries follow writes made
+  through other workers when the feed uses Postgres NOTIFY
+
+loader is a sync callable (run in the threadpool, opens its own DB session -
+background refreshes outlive the request). Values are stored JSON-encoded.
+A failing backend (e.g. endpoint_cache table missing, DB blip) never fails the
+request: the value is loaded and served uncached (result="error").
+
+Backends (ENDPOINT_CACHE_BACKEND):
+- memory: dict per worker - several workers need the Postgres change feed
+  (otherwise only the worker of the write drops its entries)
+- postgres: endpoint_cache table, shared across workers/pods
+"""
+import abc
+import asyncio
+import contextvars
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from anyio import from_thread
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+
+logger = get_logger(__name__)
+
+# Seconds one worker may spend refreshing a shared entry before another may try
+REFRESH_LEASE_SECONDS = 30.0
+
+# Log a failing backend at most this often (per worker)
+BACKEND_ERROR_LOG_INTERVAL = 10.0
+_backend_error_logged_at = 0.0
+
+
+def _backend_failed(endpoint: str, operation: str, error: Exception) -> None:
+    """Log a backend error, throttled - every request would hit it while it lasts"""
+    global _backend_error_logged_at
+    now = time.monotonic()
+    if now - _backend_error_logged_at >= BACKEND_ERROR_LOG_INTERVAL:
+        _backend_error_logged_at = now
+        logger.error("endpoint_cache_backend_error", endpoint=endpoint, operation=operation, error=str(error))
+
+
+class CacheBackend(abc.ABC):
+    """Entry storage - implement these for a shared store"""
+
+    @abc.abstractmethod
+    async def get(self, user_id: str, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, age in seconds), or None if absent / expired"""
+
+    @abc.abstractmethod
+    async def set(self, user_id: str, key: str, value: Any, keep_seconds: float) -> None:
+        """Store value for keep_seconds"""
+
+    @abc.abstractmethod
+    async def claim_refresh(self, user_id: str, key: str, lease_seconds: float) -> bool:
+        """True if this worker should refresh the entry (no one else is)"""
+
+    @abc.abstractmethod
+    async def invalidate(self, user_id: str) -> None:
+        """Drop all entries of a user"""
+
+    def drop_local(self, user_id: str) -> None:
+        """Drop the user's entries held by this worker (sync, event loop) - none for shared stores"""
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Entries in a dict per user (per worker)
+    Runs on the event loop only - no locking needed
+    """
+
+    # Sweep expired entries (then evict the oldest users) past this many users
+    MAX_USERS = 10_000
+
+    def __init__(self):
+        self.users: Dict[str, Dict[str, list]] = {}  # user -> key -> [value, stored_at, expires_at]
+
+    async def get(self, user_id: str, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self.users.get(user_id, {}).get(key)
+        now = time.monotonic()
+        if entry is None or entry[2] <= now:
+            return None
+        return entry[0], now - entry[1]
+
+    async def set(self, user_id: str, key: str, value: Any, keep_seconds: float) -> None:
+        now = time.monotonic()
+        if user_id not in self.users and len(self.users) >= self.MAX_USERS:
+            self._sweep(now)
+        self.users.setdefault(user_id, {})[key] = [value, now, now + keep_seconds]
+
+    async def claim_refresh(self, user_id: str, key: str, lease_seconds: float) -> bool:
+        # Per-worker entries: the single flight already dedupes refreshes
+        return True
+
+    async def invalidate(self, user_id: str) -> None:
+        self.drop_local(user_id)
+
+    def drop_local(self, user_id: str) -> None:
+        self.users.pop(user_id, None)
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries; if still full, the least recently added users"""
+        for user_id in list(self.users):
+            entries = self.users[user_id]
+            for key in [k for k, entry in entries.items() if entry[2] <= now]:
+                del entries[key]
+            if not entries:
+                del self.users[user_id]
+        while len(self.users) >= self.MAX_USERS:
+            del self.users[next(iter(self.users))]
+
+
+class PostgresCacheBackend(CacheBackend):
+    """
+    Entries in the endpoint_cache table, shared across workers/pods
+    Ages and leases use the DB clock; always on the primary (UNLOGGED table)
+    """
+
+    # Delete expired rows every N sets
+    CLEANUP_EVERY = 1000
+
+    NOW = "extract(epoch FROM clock_timestamp())"
+
+    GET_SQL = f"""
+        SELECT value, {NOW} - stored_at
+        FROM endpoint_cache
+        WHERE user_id = :user_id AND key = :key AND expires_at > {NOW}
+    """
+
+    SET_SQL = f"""
+        INSERT INTO endpoint_cache (user_id, key, value, stored_at, expires_at, refreshing_until)
+        VALUES (:user_id, :key, :value, {NOW}, {NOW} + :keep, 0)
+        ON CONFLICT (user_id, key) DO UPDATE SET
+            value = excluded.value,
+            stored_at = excluded.stored_at,
+            expires_at = excluded.expires_at,
+            refreshing_until = 0
+    """
+
+    CLAIM_SQL = f"""
+        UPDATE endpoint_cache SET refreshing_until = {NOW} + :lease
+        WHERE user_id = :user_id AND key = :key AND refreshing_until < {NOW}
+        RETURNING 1
+    """
+
+    INVALIDATE_SQL = "DELETE FROM endpoint_cache WHERE user_id = :user_id"
+
+    CLEANUP_SQL = f"DELETE FROM endpoint_cache WHERE expires_at < {NOW}"
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self.sets = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db.base import engine
+            self._engine = engine
+        return self._engine
+
+    def _execute(self, sql: str, params: dict, fetch: bool = False):
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            result = conn.execute(text(sql), params)
+            return result.first() if fetch else None
+
+    async def get(self, user_id: str, key: str) -> Optional[Tuple[Any, float]]:
+        row = await run_in_threadpool(self._execute, self.GET_SQL, {"user_id": user_id, "key": key}, True)
+        if row is None:
+            return None
+        return json.loads(row[0]), float(row[1])
+
+    async def set(self, user_id: str, key: str, value: Any, keep_seconds: float) -> None:
+        params = {"user_id": user_id, "key": key, "value": json.dumps(value), "keep": keep_seconds}
+        await run_in_threadpool(self._execute, self.SET_SQL, params)
+        self.sets += 1
+        if self.sets % self.CLEANUP_EVERY == 0:
+            await run_in_threadpool(self._execute, self.CLEANUP_SQL, {})
+
+    async def claim_refresh(self, user_id: str, key: str, lease_seconds: float) -> bool:
+        params = {"user_id": user_id, "key": key, "lease": lease_seconds}
+        return await run_in_threadpool(self._execute, self.CLAIM_SQL, params, True) is not None
+
+    async def invalidate(self, user_id: str) -> None:
+        await run_in_threadpool(self._execute, self.INVALIDATE_SQL, {"user_id": user_id})
+
+
+def build_backend(name: str) -> CacheBackend:
+    """Backend from settings.endpoint_cache_backend"""
+    name = name.lower()
+    if name == "memory":
+        return MemoryCacheBackend()
+    if name == "postgres":
+        return PostgresCacheBackend()
+    raise ValueError(f"Unknown ENDPOINT_CACHE_BACKEND: {name}")
+
+
+class CachedEndpoint:
+    """
+    Cache for one endpoint's responses, keyed by user + request params
+
+    Args:
+        name: Key prefix and metric label
+        ttl: Seconds a value is served as fresh
+        stale: Further seconds it is served while being refreshed
+    """
+
+    def __init__(self, name: str, ttl: float, stale: float):
+        self.name = name
+        self.ttl = ttl
+        self.stale = stale
+        self.flights: Dict[Tuple[str, str], asyncio.Task] = {}  # loads in progress
+        self.revalidating: Dict[Tuple[str, str], asyncio.Task] = {}  # background refreshes
+        self.discarded: set = set()  # flights invalidated while loading - not stored
+        _endpoints.append(self)
+
+    async def get(self, user_id: str, params: str, loader: Callable[[], Any]) -> Any:
+        """
+        Cached value of loader() for this user + params (JSON-encoded)
+        Loader errors (e.g. HTTPException 404) propagate and are not cached
+        """
+        if not settings.endpoint_cache_enabled:
+            return jsonable_encoder(await run_in_threadpool(loader))
+
+        user_id, key = str(user_id), f"{self.name}:{params}"
+        try:
+            found = await cache_backend.get(user_id, key)
+        except Exception as e:
+            # Backend down: load (still single flight) without the cache
+            _backend_failed(self.name, "get", e)
+            metrics.endpoint_cache_requests_total.labels(endpoint=self.name, result="error").inc()
+            return await asyncio.shield(self._load(user_id, key, loader, "miss"))
+        
+        if found is not None:
+            value, age = found
+            if age < self.ttl:
+                metrics.endpoint_cache_requests_total.labels(endpoint=self.name, result="hit").inc()
+                return value
+            if age < self.ttl + self.stale:
+                metrics.endpoint_cache_requests_total.labels(endpoint=self.name, result="stale").inc()
+                self._revalidate(user_id, key, loader)
+                return value
+
+        metrics.endpoint_cache_requests_total.labels(endpoint=self.name, result="miss").inc()
+        # Shielded: a waiter going away does not cancel the load the others share
+        return await asyncio.shield(self._load(user_id, key, loader, "miss"))
+
+    def _load(self, user_id: str, key: str, loader: Callable[[], Any], kind: str) -> asyncio.Task:
+        """The running load for this key, or a new one (single flight)"""
+        flight = self.flights.get((user_id, key))
+        if flight is None:
+            flight = asyncio.create_task(self._fill(user_id, key, loader, kind))
+            # Retrieve the error even if every waiter was cancelled
+            flight.add_done_callback(lambda task: task.cancelled() or task.exception())
+            self.flights[(user_id, key)] = flight
+        return flight
+
+    async def _fill(self, user_id: str, key: str, loader: Callable[[], Any], kind: str) -> Any:
+        start = time.perf_counter()
+        try:
+            value = jsonable_encoder(await run_in_threadpool(loader))
+            if (user_id, key) not in self.discarded:
+                try:
+                    await cache_backend.set(user_id, key, value, self.ttl + self.stale)
+                except Exception as e:
+                    _backend_failed(self.name, "set", e)
+        except Exception:
+            metrics.endpoint_cache_loads_total.labels(endpoint=self.name, kind=kind, outcome="error").inc()
+            raise
+        finally:
+            self.flights.pop((user_id, key), None)
+            self.discarded.discard((user_id, key))
+        metrics.endpoint_cache_loads_total.labels(endpoint=self.name, kind=kind, outcome="ok").inc()
+        metrics.endpoint_cache_load_seconds.labels(endpoint=self.name).observe(time.perf_counter() - start)
+        return value
+
+    def _revalidate(self, user_id: str, key: str, loader: Callable[[], Any]) -> None:
+        """Refresh a stale entry in the background, once"""
+        if (user_id, key) in self.flights or (user_id, key) in self.revalidating:
+            return
+        # Fresh context: the refresh outlives the request (its deadline, query stats)
+        self.revalidating[(user_id, key)] = asyncio.create_task(
+            self._background_refresh(user_id, key, loader), context=contextvars.Context()
+        )
+
+    async def _background_refresh(self, user_id: str, key: str, loader: Callable[[], Any]) -> None:
+        try:
+            if await cache_backend.claim_refresh(user_id, key, REFRESH_LEASE_SECONDS):
+                await self._load(user_id, key, loader, "background")
+        except Exception as e:
+            logger.warning("endpoint_cache_refresh_failed", endpoint=self.name, error=str(e))
+        finally:
+            self.revalidating.pop((user_id, key), None)
+
+    def discard_flights(self, user_id: str) -> None:
+        """Loads of this user running now read old data - do not store them"""
+        self.discarded.update(flight for flight in self.flights if flight[0] == user_id)
+
+
+async def invalidate_user(user_id) -> None:
+    """
+    Drop every cached response of a user - call after writes that change their data
+    Never raises: a failed invalidation must not fail the write
+    """
+    if not settings.endpoint_cache_enabled:
+        return
+    user_id = str(user_id)
+    for endpoint in _endpoints:
+        endpoint.discard_flights(user_id)
+    try:
+        await cache_backend.invalidate(user_id)
+        metrics.endpoint_cache_invalidations_total.inc()
+    except Exception as e:
+        logger.error("endpoint_cache_invalidate_failed", user_id=user_id, error=str(e))
+
+
+def invalidate_user_from_thread(user_id) -> None:
+    """invalidate_user for sync routes (threadpool)"""
+    if settings.endpoint_cache_enabled:
+        from_thread.run(invalidate_user, user_id)
+
+
+def forget_user(user_id) -> None:
+    """
+    Drop what this worker holds for a user (event loop) - called for every
+    change feed event, including writes made through other workers
+    """
+    if not settings.endpoint_cache_enabled or not user_id:
+        return
+    user_id = str(user_id)
+    for endpoint in _endpoints:
+        endpoint.discard_flights(user_id)
+    cache_backend.drop_local(user_id)
+
+
+# Endpoints created so far (invalidate_user reaches their in-flight loads)
+_endpoints: List[CachedEndpoint] = []
+
+# Global backend
+cache_backend = build_backend(settings.endpoint_cache_backend)
@@ -0,0 +1,230 @@
+"""
+Change feed - push session/message changes to the user's open clients
+
+Publishing (app.db.crud writes) is transactional: an event is delivered only
+if the write commits.
+- postgres: `SELECT pg_notify(CHANGE_FEED_CHANNEL, payload)` inside the write's
+  transaction; Postgres delivers it on COMMIT to every worker/pod listening
+- memory: queued on the SQLAlchemy Session and handed to this worker's hub
+  after COMMIT (single worker / non-Postgres fallback)
+
+Each worker keeps ONE listener connection (LISTEN, polled from the event loop
+- no thread) and fans events out to the queues of that user's subscribers
+(GET /changes, server-sent events).
+
+Events are compact - clients refetch what they need:
+    {"type": "message.created", "session_id": ..., "message_id": ..., "role": ...}
+    {"type": "message.deleted", "session_id": ..., "message_id": ...}
+    {"type": "message.updated", "session_id": ..., "message_id": ..., "is_mistake": ...}
+    {"type": "session.created" | "session.updated", "session_id": ..., "title": ...}
+    {"type": "session.deleted", "session_id": ...}
+"""
+import asyncio
+import json
+from typing import Dict, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import forget_user
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+from app.db.replica import replica_router
+
+logger = get_logger(__name__)
+
+# Titles are cut so a payload stays far below NOTIFY's 8000 byte limit
+MAX_TITLE_LENGTH = 200
+
+# user_id of the session is resolved inside the same statement when unknown
+NOTIFY_SQL = text("""
+    SELECT pg_notify(
+        :channel,
+        CAST(CAST(:payload AS jsonb) || jsonb_build_object(
+            'user_id',
+            COALESCE(:user_id, (SELECT CAST(user_id AS text) FROM chat_sessions WHERE id = CAST(:session_id AS uuid)))
+        ) AS text)
+    )
+""")
+
+
+def _uses_notify(db: Session) -> bool:
+    return settings.change_feed_backend == "postgres" and db.get_bind().dialect.name == "postgresql"
+
+
+def publish_change(
+    db: Session,
+    event_type: str,
+    session_id: UUID,
+    user_id: Optional[UUID] = None,
+    **fields
+) -> None:
+    """
+    Publish a change with the current transaction (call before db.commit())
+
+    user_id: owner of the session (looked up when omitted)
+    """
+    if not settings.change_feed_enabled:
+        return
+    payload = {"type": event_type, "session_id": str(session_id)}
+    payload.update({key: str(value) if isinstance(value, UUID) else value for key, value in fields.items()})
+    if isinstance(payload.get("title"), str):
+        payload["title"] = payload["title"][:MAX_TITLE_LENGTH]
+
+    if _uses_notify(db):
+        db.execute(NOTIFY_SQL, {
+            "channel": settings.change_feed_channel,
+            "payload": json.dumps(payload),
+            "user_id": str(user_id) if user_id else None,
+            "session_id": str(session_id),
+        })
+    else:
+        if user_id is None:
+            from app.db import models
+            user_id = db.query(models.ChatSession.user_id).filter(models.ChatSession.id == session_id).scalar()
+            if user_id is None:
+                return
+        payload["user_id"] = str(user_id)
+        db.info.setdefault("pending_changes", []).append(payload)
+    metrics.change_events_published_total.labels(type=event_type).inc()
+
+
+@event.listens_for(Session, "after_commit")
+def _deliver_pending(db: Session) -> None:
+    """memory backend: hand committed changes to this worker's hub"""
+    pending = db.info.pop("pending_changes", None)
+    if pending:
+        change_hub.dispatch_threadsafe(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(db: Session) -> None:
+    db.info.pop("pending_changes", None)
+
+
+class ChangeHub:
+    """Per-worker fan-out of change events to subscriber queues"""
+
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def subscribe(self, user_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.setdefault(user_id, set()).add(queue)
+        metrics.change_subscribers.inc()
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue) -> None:
+        queues = self.subscribers.get(user_id)
+        if queues and queue in queues:
+            queues.discard(queue)
+            metrics.change_subscribers.dec()
+            if not queues:
+                del self.subscribers[user_id]
+
+    def dispatch(self, change: dict) -> None:
+        """Queue a change for its user's subscribers (event loop only)"""
+        user_id = change.pop("user_id", None)
+        # A write, possibly through another worker: keep this user's reads on the
+        # primary, drop the user's cached responses held here
+        replica_router.note_write(user_id)
+        forget_user(user_id)
+        for queue in self.subscribers.get(user_id, ()):
+            if queue.full():
+                # Slow client: drop its backlog and tell it to refetch instead
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait({"type": "resync"})
+                metrics.change_events_dropped_total.inc()
+                continue
+            queue.put_nowait(change)
+            metrics.change_events_delivered_total.inc()
+
+    def dispatch_threadsafe(self, changes: list) -> None:
+        """From a threadpool thread (after_commit of a sync write)"""
+        if self.loop is None or self.loop.is_closed():
+            return
+        for change in changes:
+            self.loop.call_soon_threadsafe(self.dispatch, change)
+
+    def start(self) -> None:
+        """Capture the loop and start the LISTEN connection (call from lifespan)"""
+        self.loop = asyncio.get_running_loop()
+        if not settings.change_feed_enabled or self._listener is not None:
+            return
+        from app.db.base import engine
+        if settings.change_feed_backend == "postgres" and engine.dialect.name == "postgresql":
+            self._listener = asyncio.create_task(self._listen(engine))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def _listen(self, engine) -> None:
+        """LISTEN on a dedicated connection; reconnect with backoff"""
+        delay = 1.0
+        while True:
+            conn = None
+            try:
+                conn = await asyncio.to_thread(self._connect, engine)
+                logger.info("change_feed_listening", channel=settings.change_feed_channel)
+                delay = 1.0
+                await self._drain(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("change_feed_listener_error", error=str(e), retry_in=delay)
+                # Events missed while disconnected: tell every client to refetch
+                for user_id in list(self.subscribers):
+                    self.dispatch({"type": "resync", "user_id": user_id})
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                if conn is not None:
+                    self.loop.remove_reader(conn.fileno())
+                    conn.close()
+
+    @staticmethod
+    def _connect(engine):
+        """Raw DBAPI connection outside the pool, autocommit, LISTENing"""
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        conn = engine.dialect.dbapi.connect(*cargs, **cparams)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{settings.change_feed_channel}"')
+        return conn
+
+    async def _drain(self, conn) -> None:
+        """Wake on socket readability, poll() and dispatch notifications"""
+        broken = self.loop.create_future()
+
+        def on_readable():
+            try:
+                conn.poll()
+            except Exception as e:
+                if not broken.done():
+                    broken.set_exception(e)
+                return
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    self.dispatch(json.loads(notify.payload))
+                except ValueError:
+                    logger.warning("change_feed_bad_payload", payload=notify.payload[:200])
+
+        self.loop.add_reader(conn.fileno(), on_readable)
+        await broken
+
+
+# Global hub (per worker)
+change_hub = ChangeHub(queue_size=settings.change_feed_queue_size)
@@ -3,7 +3,7 @@ Pydantic Settings for configuration management
 Loads from .env file
 """
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List
 
 
 class Settings(BaseSettings):
@@ -12,17 +12,138 @@ class Settings(BaseSettings):
     # Database
     database_url: str
     
+    # Read replicas (read-only routes; empty = everything on DATABASE_URL)
+    database_replica_urls: List[str] = []
+    replica_max_lag_seconds: float = 2.0  # More behind than this -> reads go to the primary
+    replica_lag_check_interval: float = 1.0  # Seconds between replay lag checks
+    replica_read_your_writes_seconds: float = 5.0  # Primary reads after a user's write (>= max lag + check interval)
+    
     # AI Core
     ai_core_url: str
     ai_core_timeout: float
+    ai_core_uds: str = ""  # Unix socket of a co-located AI Core (AI_CORE_URL then only sets Host)
+    ai_core_encoding: str = "json"  # json | msgpack (negotiated per replica, needs msgpack installed)
+    ai_core_streaming: bool = False  # AI Core serves POST /chat/stream (SSE tokens) - not in the standard contract
+    
+    # AI Core replicas (client-side load balancing, per worker)
+    ai_core_urls: List[str] = []  # Replicas; empty = [AI_CORE_URL]
+    ai_core_balancing: str = "least_outstanding"  # least_outstanding | p2c (power of two choices)
+    ai_core_session_affinity: bool = True  # Consistent-hash ai_session_id onto a replica
+    ai_core_affinity_load_factor: float = 1.25  # Leave the session's replica above ceil(this x average in-flight)
+    ai_core_health_check_interval: float = 10.0  # Seconds between active checks (0 = off)
+    ai_core_health_check_path: str = "/health"
+    ai_core_eject_failures: int = 5  # Consecutive connect errors/timeouts/5xx before ejection
+    ai_core_eject_seconds: float = 30.0  # x consecutive ejections
+    ai_core_max_ejected_percent: int = 50
+    
+    # AI Core retries / hedging (retries + hedges <= budget ratio x calls, per worker)
+    ai_core_max_retries: int = 2  # Connect errors and 5xx only
+    ai_core_retry_backoff_ms: float = 100  # Base of the exponential backoff (full jitter)
+    ai_core_retry_backoff_max_ms: float = 2000
+    ai_core_retry_budget_ratio: float = 1.0  # 1.0 = retries can at most double load
+    ai_core_hedging_enabled: bool = False  # Duplicate slow calls to another replica (AI Core does the work twice)
+    ai_core_hedge_percentile: float = 95  # Hedge after this percentile of recent latency
+    ai_core_hedge_min_delay_ms: float = 100
     
     # Server
     port: int = 3000
     host: str = "0.0.0.0"
     
+    # Startup
+    startup_mode: str = "full"  # full (create tables + default user) | check (Alembic revision + partitions) | skip (no DB work)
+    lazy_routers: bool = True  # Import debug/analytics/admin routers on first request
+    
+    # Production server (gunicorn.conf.py)
+    web_concurrency: int = 0  # Workers (0 = CPU count)
+    max_requests: int = 10000  # Recycle a worker after this many requests
+    max_requests_jitter: int = 1000  # Spread recycling so workers don't restart together
+    graceful_timeout: int = 30  # Seconds to finish in-flight requests on restart
+    
     # CORS
     cors_origins: List[str] = ["http://localhost:5173"]
     
+    # Request deadlines (X-Request-Timeout-Ms from the client is capped by these; 0 = none)
+    request_timeout_ms: int = 30000  # Default for every route
+    route_timeouts_ms: Dict[str, int] = {  # "METHOD /path" overrides, globs allowed
+        "POST /chat": 125000,  # > AI_CORE_TIMEOUT
+        "DELETE /sessions": 600000,  # Bulk purge, one transaction per batch
+        "DELETE /session/*": 120000,
+        "* /admin/*": 120000,  # > PROFILING_MAX_SECONDS
+    }
+    
+    # Rate limiting (token buckets; memory = per worker, postgres = shared)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    chat_rate_limit_per_minute: float = 20  # POST /chat per user
+    chat_rate_limit_burst: int = 10
+    ip_rate_limit_per_minute: float = 120  # POST /chat per client IP
+    ip_rate_limit_burst: int = 60
+    auth_rate_limit_per_minute: float = 10  # /auth/login, /auth/register per client IP
+    auth_rate_limit_burst: int = 10
+    
+    # Endpoint cache (/analytics/tokens, /analytics/compare; per user, stale-while-revalidate)
+    endpoint_cache_enabled: bool = True
+    endpoint_cache_backend: str = "memory"  # memory (per worker; several workers need the Postgres change feed) | postgres (shared)
+    analytics_cache_ttl_seconds: float = 60  # Served as fresh
+    analytics_cache_stale_seconds: float = 600  # Then served stale while refreshed in the background
+    
+    # AI Core fair queuing (per worker)
+    ai_core_max_concurrency: int = 32  # Concurrent AI Core calls
+    chat_max_in_flight_per_user: int = 2  # Of which one user may hold
+    chat_max_queued_per_user: int = 5  # Waiting turns per user before 429
+    chat_queue_timeout: float = 30.0  # Seconds to wait for a slot before 429
+    chat_disconnect_policy: str = "drop"  # Client left mid-generation: drop | record (keep user message)
+    
+    # Admission control (per worker; pressure = max signal / threshold)
+    admission_enabled: bool = True
+    admission_sample_interval_ms: float = 250
+    admission_loop_lag_ms: float = 100  # Event loop lag
+    admission_threadpool_queue: int = 20  # Tasks waiting for a threadpool thread
+    admission_db_pool_wait_ms: float = 250  # Worst connection checkout wait
+    admission_ai_core_in_flight: int = 48  # AI Core turns in flight + queued
+    admission_shed_all_factor: float = 2.0  # Pressure at which normal routes are shed too
+    
+    # Change feed (GET /changes; postgres = LISTEN/NOTIFY across workers, memory = this worker only)
+    change_feed_enabled: bool = True
+    change_feed_backend: str = "postgres"  # Falls back to memory on a non-Postgres DATABASE_URL
+    change_feed_channel: str = "chat_changes"
+    change_feed_queue_size: int = 100  # Events buffered per client before it is told to resync
+    change_feed_heartbeat_seconds: float = 15.0  # Keep-alive comments for proxies
+
+    # WebSocket chat (/chat/ws)
+    ws_max_in_flight_turns: int = 4  # Concurrent turns per connection (more -> error frame, 429)
+    ws_send_queue_size: int = 256  # Frames buffered per connection before token streaming waits
+    ws_auth_timeout: float = 10.0  # Seconds to send the auth frame
+    
+    # Partitioning (messages/events by created_at month)
+    partition_months_ahead: int = 3  # Future partitions created on startup
+    partition_retention_months: int = 0  # Drop partitions older than this (0 = keep all)
+    
+    # Archival (python -m app.services.archive_service)
+    archive_idle_days: int = 90
+    archive_batch_size: int = 100
+    
+    # Search
+    search_short_query_length: int = 4  # Shorter queries use trigram matching
+    
+    # Query instrumentation
+    slow_query_ms: float = 200.0  # Log statements slower than this
+    query_budget_per_request: int = 20  # More queries than this = N+1 suspect
+    query_stats_headers: bool = False  # X-DB-Query-Count / X-DB-Query-Time-Ms on responses
+    
+    # Tracing (none | otlp | file | console)
+    tracing_exporter: str = "none"
+    otlp_endpoint: str = "http://localhost:4318/v1/traces"
+    tracing_file: str = "traces.jsonl"
+    tracing_sample_ratio: float = 1.0
+    service_name: str = "conversation-service"
+    
+    # Profiling (admin only; nothing is loaded unless enabled)
+    profiling_enabled: bool = False
+    profiling_max_seconds: int = 60
+    profiling_output_dir: str = "profiles"
+    admin_emails: List[str] = []
+    
     # Logging
     log_level: str = "INFO"
     
@@ -0,0 +1,137 @@
+"""
+Request deadlines
+
+Every request gets a deadline: the client's X-Request-Timeout-Ms header,
+capped by the route's default (REQUEST_TIMEOUT_MS / ROUTE_TIMEOUTS_MS).
+It lives in a context var (copied into threadpool calls) and bounds:
+- the AI Core call: timeout = min(AI_CORE_TIMEOUT, remaining), remaining
+  forwarded as X-Request-Timeout-Ms
+- waiting for an AI Core slot
+- DB work: SET LOCAL statement_timeout = remaining at each Postgres
+  transaction start; a transaction is not even started past the deadline
+Running out raises DeadlineExceeded (504).
+"""
+import time
+from contextlib import contextmanager
+from fnmatch import fnmatchcase
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+
+logger = get_logger(__name__)
+
+TIMEOUT_HEADER = "X-Request-Timeout-Ms"
+
+# Absolute deadline (time.monotonic()) of the current request; None = unbounded
+_deadline: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
+
+# Postgres SQLSTATE for statement_timeout cancellations
+QUERY_CANCELED = "57014"
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed - surfaced as 504"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded ({stage})")
+        self.stage = stage
+        metrics.deadline_exceeded_total.labels(stage=stage).inc()
+
+
+def route_timeout_ms(method: str, path: str) -> int:
+    """
+    Default/maximum budget for a request
+    ROUTE_TIMEOUTS_MS keys: "METHOD /path", exact or a glob ("DELETE /session/*", "* /admin/*")
+    """
+    route = f"{method} {path}"
+    budget = settings.route_timeouts_ms.get(route)
+    if budget is not None:
+        return budget
+    for pattern, budget in settings.route_timeouts_ms.items():
+        if "*" in pattern and fnmatchcase(route, pattern):
+            return budget
+    return settings.request_timeout_ms
+
+
+def set_deadline(timeout_ms: Optional[float]):
+    """Start the current request's deadline (None/0 = no deadline)"""
+    deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left (may be negative), None without a deadline"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded if the deadline has passed"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(stage)
+
+
+def bounded_timeout(timeout: float) -> Tuple[float, bool]:
+    """
+    Timeout shrunk to the remaining budget
+
+    Returns:
+        (timeout, True if the deadline is the binding limit)
+    """
+    left = remaining()
+    if left is None or left >= timeout:
+        return timeout, False
+    return max(left, 0.0), True
+
+
+def deadline_headers() -> Dict[str, str]:
+    """Remaining budget for outgoing requests"""
+    left = remaining()
+    if left is None:
+        return {}
+    return {TIMEOUT_HEADER: str(max(int(left * 1000), 0))}
+
+
+@contextmanager
+def no_deadline():
+    """
+    Run cleanup / must-finish work without the request deadline
+    (e.g. undoing writes after the deadline already passed)
+    """
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def instrument_engine_deadlines(engine) -> None:
+    """Apply the request deadline to each Postgres transaction"""
+    if engine.dialect.name != "postgresql":
+        return
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        left = remaining()
+        if left is None:
+            return
+        if left <= 0:
+            raise DeadlineExceeded("db")
+        conn.exec_driver_sql(f"SET LOCAL statement_timeout = {max(int(left * 1000), 1)}")
+
+    @event.listens_for(engine, "handle_error")
+    def _on_error(exception_context):
+        # statement_timeout fired because of our deadline -> DeadlineExceeded
+        pgcode = getattr(exception_context.original_exception, "pgcode", None)
+        if pgcode == QUERY_CANCELED and remaining() is not None:
+            raise DeadlineExceeded("db") from exception_context.original_exception
@@ -0,0 +1,59 @@
+"""
+Client disconnect detection
+
+Once the request body has been read, the next ASGI receive() only returns
+when the client goes away (http.disconnect). cancel_on_disconnect races the
+handler's work against that and cancels the work - including an in-flight
+AI Core request - as soon as the client is gone.
+"""
+import asyncio
+from typing import Awaitable, TypeVar
+
+from starlette.requests import Request
+
+T = TypeVar("T")
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection before the response was ready"""
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    """Return when the client disconnects (body must already be consumed)"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable[T]) -> T:
+    """
+    Await work, cancelling it if the client disconnects first
+
+    The cancelled work is awaited to completion so its cleanup (e.g.
+    undoing DB writes) finishes before the request's DB session closes.
+
+    Raises:
+        ClientDisconnected
+    """
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    finally:
+        watcher.cancel()
+
+    if task.done():
+        return task.result()
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    else:
+        return task.result()  # finished while being cancelled
+    raise ClientDisconnected()
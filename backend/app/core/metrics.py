@@ -0,0 +1,254 @@
+"""
+Prometheus metrics
+
+All metrics live here so every module records into the same names.
+Multi-worker deployments set PROMETHEUS_MULTIPROC_DIR (empty dir, wiped on
+deploy) before the app is imported; each worker then writes its samples to
+mmap files there and /metrics aggregates all workers.
+"""
+import os
+import time
+from functools import wraps
+
+from prometheus_client import (
+    CollectorRegistry, Counter, Gauge, Histogram,
+    CONTENT_TYPE_LATEST, generate_latest, multiprocess,
+)
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Latency buckets (seconds) - HTTP routes wrap AI Core calls, so go up to a minute
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# HTTP
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests", ["method", "route", "status"]
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ["method", "route"], buckets=REQUEST_BUCKETS
+)
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+    ["route"], multiprocess_mode="livesum"
+)
+
+# AI Core
+ai_core_request_duration_seconds = Histogram(
+    "ai_core_request_duration_seconds", "AI Core call latency",
+    ["operation", "outcome"], buckets=REQUEST_BUCKETS
+)
+ai_core_errors_total = Counter(
+    "ai_core_errors_total", "AI Core call failures", ["operation", "kind"]
+)
+ai_core_timeouts_total = Counter(
+    "ai_core_timeouts_total", "AI Core calls that hit the client timeout", ["operation"]
+)
+ai_core_cancellations_total = Counter(
+    "ai_core_cancellations_total", "AI Core calls cancelled (client disconnected)", ["operation"]
+)
+ai_core_endpoint_in_flight = Gauge(
+    "ai_core_endpoint_in_flight", "AI Core calls in flight per replica",
+    ["endpoint"], multiprocess_mode="livesum"
+)
+ai_core_endpoint_healthy = Gauge(
+    "ai_core_endpoint_healthy", "Last active health check per replica (1 = passing)",
+    ["endpoint"], multiprocess_mode="livemin"
+)
+ai_core_ejections_total = Counter(
+    "ai_core_ejections_total", "AI Core replicas ejected after consecutive failures", ["endpoint"]
+)
+ai_core_retries_total = Counter(
+    "ai_core_retries_total", "AI Core attempts retried", ["operation", "reason"]
+)
+ai_core_retry_budget_exhausted_total = Counter(
+    "ai_core_retry_budget_exhausted_total", "AI Core retries skipped - retry budget used up", ["operation"]
+)
+ai_core_hedges_total = Counter(
+    "ai_core_hedges_total", "Hedged AI Core calls sent to a second replica", ["operation"]
+)
+ai_core_hedge_wins_total = Counter(
+    "ai_core_hedge_wins_total", "Hedged AI Core calls answered first by the hedge", ["operation"]
+)
+
+# Deadlines
+deadline_exceeded_total = Counter(
+    "deadline_exceeded_total", "Work abandoned because the request deadline passed", ["stage"]
+)
+
+# Rate limiting / AI Core fair queue
+rate_limit_rejections_total = Counter(
+    "rate_limit_rejections_total", "Requests rejected with 429", ["limit"]
+)
+ai_core_slots_in_use = Gauge(
+    "ai_core_slots_in_use", "Chat turns holding an AI Core slot",
+    multiprocess_mode="livesum"
+)
+ai_core_queued = Gauge(
+    "ai_core_queued", "Chat turns waiting for an AI Core slot",
+    multiprocess_mode="livesum"
+)
+ai_core_queue_wait_seconds = Histogram(
+    "ai_core_queue_wait_seconds", "Time spent waiting for an AI Core slot",
+    buckets=REQUEST_BUCKETS
+)
+
+# Endpoint cache - hit ratio: result=~"hit|stale" over all requests
+endpoint_cache_requests_total = Counter(
+    "endpoint_cache_requests_total", "Cached endpoint lookups (result: hit, stale, miss, error = backend failed)",
+    ["endpoint", "result"]
+)
+endpoint_cache_loads_total = Counter(
+    "endpoint_cache_loads_total", "Cache fills (kind: miss or background refresh)",
+    ["endpoint", "kind", "outcome"]
+)
+endpoint_cache_load_seconds = Histogram(
+    "endpoint_cache_load_seconds", "Duration of cache fills", ["endpoint"],
+    buckets=REQUEST_BUCKETS
+)
+endpoint_cache_invalidations_total = Counter(
+    "endpoint_cache_invalidations_total", "Per-user cache invalidations after writes"
+)
+
+# Admission control
+event_loop_lag_seconds = Gauge(
+    "event_loop_lag_seconds", "Event loop scheduling delay (last sample)",
+    multiprocess_mode="max"
+)
+admission_pressure = Gauge(
+    "admission_pressure", "Highest signal / threshold ratio (>= 1 sheds low priority)",
+    multiprocess_mode="max"
+)
+admission_shed_total = Counter(
+    "admission_shed_total", "Requests rejected by admission control", ["priority"]
+)
+
+# Change feed
+change_events_published_total = Counter(
+    "change_events_published_total", "Change events published by writes", ["type"]
+)
+change_events_delivered_total = Counter(
+    "change_events_delivered_total", "Change events queued for a subscribed client"
+)
+change_events_dropped_total = Counter(
+    "change_events_dropped_total", "Client backlogs dropped (client told to resync)"
+)
+change_subscribers = Gauge(
+    "change_subscribers", "Open change feed connections",
+    multiprocess_mode="livesum"
+)
+
+# WebSocket chat
+ws_connections = Gauge(
+    "ws_connections", "Open WebSocket chat connections",
+    multiprocess_mode="livesum"
+)
+
+# Database
+db_operation_duration_seconds = Histogram(
+    "db_operation_duration_seconds", "Duration of app.db.crud functions",
+    ["function"], buckets=DB_BUCKETS
+)
+db_queries_per_request = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250)
+)
+db_pool_connections = Gauge(
+    "db_pool_connections", "Open DB connections (per worker pool, summed)",
+    multiprocess_mode="livesum"
+)
+db_pool_checked_out = Gauge(
+    "db_pool_checked_out", "DB connections currently checked out",
+    multiprocess_mode="livesum"
+)
+db_pool_wait_seconds = Histogram(
+    "db_pool_wait_seconds", "Time waiting to check out a pooled connection",
+    buckets=DB_BUCKETS
+)
+db_read_sessions_total = Counter(
+    "db_read_sessions_total", "Read-only route sessions by target",
+    ["target", "reason"]
+)
+db_replica_lag_seconds = Gauge(
+    "db_replica_lag_seconds", "Replay lag of a read replica (last check)",
+    ["replica"], multiprocess_mode="max"
+)
+
+# Tokens - rate() over these gives tokens/second
+chat_tokens_total = Counter(
+    "chat_tokens_total", "Tokens reported by AI Core", ["kind"]
+)
+chat_messages_total = Counter(
+    "chat_messages_total", "Chat turns persisted", ["outcome"]
+)
+
+
+def observe_db(function_name: str):
+    """Decorator: record duration of a crud function"""
+    histogram = db_operation_duration_seconds.labels(function=function_name)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def instrument_pool(engine) -> None:
+    """Track open / checked-out connections via pool events"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        db_pool_connections.inc()
+
+    @event.listens_for(engine, "close")
+    def _on_close(dbapi_connection, connection_record):
+        db_pool_connections.dec()
+
+    @event.listens_for(engine, "detach")
+    def _on_detach(dbapi_connection, connection_record):
+        db_pool_connections.dec()
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        db_pool_checked_out.dec()
+
+
+def record_tokens(prompt_tokens, completion_tokens) -> None:
+    """Count tokens from an AI Core usage block (missing values ignored)"""
+    if prompt_tokens:
+        chat_tokens_total.labels(kind="prompt").inc(prompt_tokens)
+    if completion_tokens:
+        chat_tokens_total.labels(kind="completion").inc(completion_tokens)
+
+
+def render_metrics():
+    """
+    Exposition payload for /metrics
+
+    Returns:
+        (body, content_type)
+    """
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        from prometheus_client import REGISTRY as registry
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_worker_dead(pid: int) -> None:
+    """Drop a dead worker's live gauges (call from the process manager)"""
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid)
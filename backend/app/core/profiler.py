@@ -0,0 +1,161 @@
+"""
+Sampling profiler (stdlib only)
+
+A background thread snapshots every thread's Python stack with
+sys._current_frames() at a fixed interval. Nothing is hooked into the
+interpreter, so there is no cost unless a profile is running.
+
+Output:
+- collapsed stacks ("outer;inner;leaf 42" - flamegraph.pl / speedscope import)
+- speedscope JSON (https://www.speedscope.app)
+"""
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+# Leaf frames of threads parked waiting for work (event loop select, idle threadpool)
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+}
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+# One profile at a time per worker (samples cover every thread anyway)
+profile_lock = threading.Lock()
+
+
+class SamplingProfiler:
+    """Samples all threads (except its own) every interval seconds"""
+
+    def __init__(self, interval: float = 0.005, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                if not self.include_idle and (os.path.basename(stack[0][1]), stack[0][0]) in IDLE_LEAVES:
+                    continue
+                stack.reverse()
+                self.samples[tuple(stack)] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _label(frame: Frame) -> str:
+        name, filename, line = frame
+        return f"{name} ({_short_path(filename)}:{line})"
+
+    def collapsed(self) -> str:
+        """Brendan Gregg collapsed-stack format, one stack per line"""
+        lines = [
+            ";".join(self._label(frame) for frame in stack) + f" {count}"
+            for stack, count in self.samples.most_common()
+        ]
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "profile") -> dict:
+        """speedscope 'sampled' profile (weights in seconds)"""
+        frame_index = {}
+        frames = []
+        samples = []
+        weights = []
+        for stack, count in self.samples.most_common():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": _short_path(frame[1]), "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(round(count * self.interval, 6))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "conversation-service",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+def _short_path(filename: str) -> str:
+    """Trim site-packages / project prefixes so labels stay readable"""
+    for marker in ("site-packages" + os.sep, "backend" + os.sep):
+        if marker in filename:
+            return filename.split(marker, 1)[1]
+    return filename
+
+
+def save_profile(profiler: SamplingProfiler, fmt: str, name: str) -> str:
+    """
+    Write a finished profile to settings.profiling_output_dir
+
+    Returns:
+        Profile ID (file name without extension)
+    """
+    os.makedirs(settings.profiling_output_dir, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    if fmt == "collapsed":
+        body = profiler.collapsed()
+    else:
+        body = json.dumps(profiler.speedscope(name))
+    with open(profile_path(profile_id, fmt), "w") as f:
+        f.write(body)
+    return profile_id
+
+
+def profile_path(profile_id: str, fmt: str) -> str:
+    """File path of a saved profile"""
+    extension = "txt" if fmt == "collapsed" else "speedscope.json"
+    return os.path.join(settings.profiling_output_dir, f"{profile_id}.{extension}")
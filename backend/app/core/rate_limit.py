@@ -0,0 +1,330 @@
+"""
+Rate limiting and fair queuing for AI Core capacity
+
+Two independent mechanisms:
+
+- Token buckets (per user / per IP): `rate` tokens per second refill up to
+  `burst`; each request takes one. Backends:
+    memory   - per worker process (default)
+    postgres - one UNLOGGED row per key, refilled atomically in SQL, shared by
+               every worker and pod (one extra round trip per request)
+- FairScheduler: caps concurrent AI Core calls per worker and per user.
+  Waiting turns are queued per user and slots are granted round-robin
+  across users, so one user's burst cannot starve everyone else.
+"""
+import abc
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics, deadline
+
+logger = get_logger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Request rejected - surfaced as 429 with Retry-After"""
+
+    def __init__(self, limit: str, retry_after: float, result: "BucketResult" = None):
+        super().__init__(f"Rate limit exceeded: {limit}")
+        self.limit = limit
+        self.retry_after = retry_after
+        self.result = result
+
+    def headers(self) -> Dict[str, str]:
+        headers = self.result.headers() if self.result else {}
+        headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return headers
+
+
+@dataclass
+class BucketResult:
+    """Outcome of taking one token"""
+    allowed: bool
+    limit: int  # bucket size (burst)
+    remaining: float  # tokens left after this request
+    rate: float  # refill, tokens per second
+
+    @property
+    def retry_after(self) -> float:
+        """Seconds until one token is available"""
+        return max(0.0, (1 - self.remaining) / self.rate)
+
+    @property
+    def reset(self) -> float:
+        """Seconds until the bucket is full again"""
+        return max(0.0, (self.limit - self.remaining) / self.rate)
+
+    def headers(self) -> Dict[str, str]:
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(0, math.floor(self.remaining))),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+
+
+class RateLimitBackend(abc.ABC):
+    """Token bucket storage - implement take() and refund() for a shared store"""
+
+    @abc.abstractmethod
+    async def take(self, key: str, rate: float, burst: int) -> BucketResult:
+        """Take one token from the bucket at key (refilled at rate/s up to burst)"""
+
+    @abc.abstractmethod
+    async def refund(self, key: str, rate: float, burst: int) -> None:
+        """Give back a token taken by take() (request rejected by another bucket)"""
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in a dict (per worker, so the effective limit is N x workers)
+    Runs on the event loop only - no locking needed
+    """
+
+    # Sweep full (idle) buckets once the dict grows past this
+    MAX_KEYS = 100_000
+
+    def __init__(self):
+        self.buckets: Dict[str, list] = {}  # key -> [tokens, updated_at]
+
+    async def take(self, key: str, rate: float, burst: int) -> BucketResult:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= self.MAX_KEYS:
+                self._sweep(now, rate, burst)
+            bucket = self.buckets[key] = [float(burst), now]
+
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket[0], bucket[1] = tokens, now
+        return BucketResult(allowed=allowed, limit=burst, remaining=tokens, rate=rate)
+
+    async def refund(self, key: str, rate: float, burst: int) -> None:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+        now = time.monotonic()
+        bucket[0], bucket[1] = min(burst, bucket[0] + (now - bucket[1]) * rate + 1), now
+
+    def _sweep(self, now: float, rate: float, burst: int) -> None:
+        """Drop buckets that have refilled completely (same as absent)"""
+        idle = burst / rate
+        for key in [k for k, (_, updated_at) in self.buckets.items() if now - updated_at >= idle]:
+            del self.buckets[key]
+
+
+class PostgresRateLimitBackend(RateLimitBackend):
+    """
+    Buckets in the rate_limit_buckets table, shared across workers/pods
+    Refill + take is a single INSERT ... ON CONFLICT, using the DB clock
+    """
+
+    # Delete fully refilled rows every N calls
+    CLEANUP_EVERY = 1000
+
+    TAKE_SQL = """
+        INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at, allowed)
+        VALUES (:key, :burst - 1, extract(epoch FROM clock_timestamp()), true)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE
+                WHEN LEAST(:burst, b.tokens + (extract(epoch FROM clock_timestamp()) - b.updated_at) * :rate) >= 1
+                THEN LEAST(:burst, b.tokens + (extract(epoch FROM clock_timestamp()) - b.updated_at) * :rate) - 1
+                ELSE LEAST(:burst, b.tokens + (extract(epoch FROM clock_timestamp()) - b.updated_at) * :rate)
+            END,
+            allowed = LEAST(:burst, b.tokens + (extract(epoch FROM clock_timestamp()) - b.updated_at) * :rate) >= 1,
+            updated_at = extract(epoch FROM clock_timestamp())
+        RETURNING tokens, allowed
+    """
+
+    REFUND_SQL = """
+        UPDATE rate_limit_buckets SET
+            tokens = LEAST(:burst, tokens + (extract(epoch FROM clock_timestamp()) - updated_at) * :rate + 1),
+            updated_at = extract(epoch FROM clock_timestamp())
+        WHERE key = :key
+    """
+
+    CLEANUP_SQL = """
+        DELETE FROM rate_limit_buckets
+        WHERE updated_at < extract(epoch FROM clock_timestamp()) - :idle_seconds
+    """
+
+    def __init__(self, engine=None):
+        self._engine = engine
+        self.calls = 0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from app.db.base import engine
+            self._engine = engine
+        return self._engine
+
+    async def take(self, key: str, rate: float, burst: int) -> BucketResult:
+        return await run_in_threadpool(self._take, key, rate, burst)
+
+    def _take(self, key: str, rate: float, burst: int) -> BucketResult:
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            tokens, allowed = conn.execute(
+                text(self.TAKE_SQL), {"key": key, "rate": rate, "burst": burst}
+            ).one()
+
+            self.calls += 1
+            if self.calls % self.CLEANUP_EVERY == 0:
+                conn.execute(text(self.CLEANUP_SQL), {"idle_seconds": burst / rate})
+
+        return BucketResult(allowed=allowed, limit=burst, remaining=tokens, rate=rate)
+
+    async def refund(self, key: str, rate: float, burst: int) -> None:
+        await run_in_threadpool(self._refund, key, rate, burst)
+
+    def _refund(self, key: str, rate: float, burst: int) -> None:
+        from sqlalchemy import text
+
+        with self.engine.begin() as conn:
+            conn.execute(text(self.REFUND_SQL), {"key": key, "rate": rate, "burst": burst})
+
+
+def build_backend(name: str) -> RateLimitBackend:
+    """Backend from settings.rate_limit_backend"""
+    name = name.lower()
+    if name == "memory":
+        return MemoryRateLimitBackend()
+    if name == "postgres":
+        return PostgresRateLimitBackend()
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND: {name}")
+
+
+class FairScheduler:
+    """
+    Concurrency limit with per-user cap and round-robin fair queuing
+
+    - at most `capacity` turns hold a slot at once (per worker)
+    - at most `per_user` of them belong to one user
+    - waiters are queued per user; a freed slot goes to the next user in
+      round-robin order, FIFO within a user
+    """
+
+    def __init__(self, capacity: int, per_user: int, max_queued_per_user: int, queue_timeout: float):
+        self.capacity = capacity
+        self.per_user = per_user
+        self.max_queued_per_user = max_queued_per_user
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.active_by_user: Dict[str, int] = {}
+        self.waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # Smoothed slot hold time -> Retry-After hint when rejecting
+        self.avg_hold = 1.0
+
+    @property
+    def queued(self) -> int:
+        return sum(len(waiters) for waiters in self.waiting.values())
+
+    @asynccontextmanager
+    async def slot(self, user_id: str):
+        """Hold one AI Core slot for user_id (raises RateLimitExceeded)"""
+        await self.acquire(user_id)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.avg_hold = 0.9 * self.avg_hold + 0.1 * (time.perf_counter() - start)
+            self.release(user_id)
+
+    async def acquire(self, user_id: str) -> None:
+        if not self.waiting.get(user_id) and self._can_start(user_id):
+            self._grant(user_id)
+            return
+
+        waiters = self.waiting.setdefault(user_id, deque())
+        if len(waiters) >= self.max_queued_per_user:
+            if not waiters:
+                del self.waiting[user_id]
+            raise RateLimitExceeded("chat_queue", retry_after=self.avg_hold)
+
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        metrics.ai_core_queued.inc()
+        start = time.perf_counter()
+        timeout, deadline_bound = deadline.bounded_timeout(self.queue_timeout)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Granted just as we gave up - hand the slot on
+                self.release(user_id)
+            else:
+                future.cancel()
+                self._discard(user_id, future)
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning("ai_core_queue_timeout", user_id=user_id, timeout=timeout)
+                if deadline_bound:
+                    raise deadline.DeadlineExceeded("ai_core_queue")
+                raise RateLimitExceeded("chat_queue", retry_after=self.avg_hold)
+            raise
+        finally:
+            metrics.ai_core_queued.dec()
+            metrics.ai_core_queue_wait_seconds.observe(time.perf_counter() - start)
+
+    def release(self, user_id: str) -> None:
+        self.active -= 1
+        self.active_by_user[user_id] -= 1
+        if not self.active_by_user[user_id]:
+            del self.active_by_user[user_id]
+        metrics.ai_core_slots_in_use.dec()
+        self._dispatch()
+
+    def _can_start(self, user_id: str) -> bool:
+        return self.active < self.capacity and self.active_by_user.get(user_id, 0) < self.per_user
+
+    def _grant(self, user_id: str) -> None:
+        self.active += 1
+        self.active_by_user[user_id] = self.active_by_user.get(user_id, 0) + 1
+        metrics.ai_core_slots_in_use.inc()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to waiting users, round-robin"""
+        while self.active < self.capacity:
+            for user_id in self.waiting:
+                if self.active_by_user.get(user_id, 0) < self.per_user:
+                    break
+            else:
+                return  # every waiting user is at their cap
+
+            waiters = self.waiting.pop(user_id)
+            future = waiters.popleft()
+            if waiters:
+                self.waiting[user_id] = waiters  # back of the round-robin order
+            if future.done():
+                continue  # cancelled waiter
+            self._grant(user_id)
+            future.set_result(None)
+
+    def _discard(self, user_id: str, future: asyncio.Future) -> None:
+        waiters = self.waiting.get(user_id)
+        if waiters and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self.waiting[user_id]
+
+
+# Global instances (per worker)
+rate_limit_backend = build_backend(settings.rate_limit_backend)
+ai_core_scheduler = FairScheduler(
+    capacity=settings.ai_core_max_concurrency,
+    per_user=settings.chat_max_in_flight_per_user,
+    max_queued_per_user=settings.chat_max_queued_per_user,
+    queue_timeout=settings.chat_queue_timeout,
+)
@@ -0,0 +1,110 @@
+"""
+Distributed tracing (OpenTelemetry)
+
+Spans:
+- one SERVER span per HTTP request (RequestIDMiddleware), tagged with request.id
+- crud.<function> for every app.db.crud call
+- ai_core.send_message / ai_core.get_history (CLIENT), with W3C traceparent
+  injected into the AI Core request
+
+TRACING_EXPORTER selects the backend: none (default - API no-op tracer),
+otlp (OTLP/HTTP collector), file (JSON lines) or console.
+"""
+from functools import wraps
+from typing import Optional, Sequence
+
+from opentelemetry import trace, propagate
+from opentelemetry.trace import SpanKind, Status, StatusCode
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+tracer = trace.get_tracer("conversation-service")
+
+_provider = None
+
+
+def setup_tracing() -> None:
+    """Install the SDK tracer provider + exporter (no-op when TRACING_EXPORTER=none)"""
+    global _provider
+    exporter_name = settings.tracing_exporter.lower()
+    if exporter_name == "none" or _provider is not None:
+        return
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=settings.otlp_endpoint)
+    elif exporter_name == "file":
+        exporter = JsonLinesSpanExporter(settings.tracing_file)
+    elif exporter_name == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown TRACING_EXPORTER: {settings.tracing_exporter}")
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.tracing_sample_ratio)),
+    )
+    _provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(_provider)
+    logger.info("tracing_enabled", exporter=exporter_name, sample_ratio=settings.tracing_sample_ratio)
+
+
+def shutdown_tracing() -> None:
+    """Flush pending spans"""
+    if _provider is not None:
+        _provider.shutdown()
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Append finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: Sequence) -> SpanExportResult:
+        with open(self.path, "a") as f:
+            for span in spans:
+                f.write(span.to_json(indent=None) + "\n")
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self) -> None:
+        pass
+
+
+def traced(name: str, kind: SpanKind = SpanKind.INTERNAL):
+    """Decorator: run a sync function inside a span"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inject_trace_headers(headers: Optional[dict] = None) -> dict:
+    """Add traceparent/tracestate for the current span (outgoing requests)"""
+    headers = headers if headers is not None else {}
+    propagate.inject(headers)
+    return headers
+
+
+def extract_trace_context(headers):
+    """Parent context from incoming traceparent (None-safe for missing header)"""
+    return propagate.extract(headers)
+
+
+def mark_error(span, error: Exception) -> None:
+    """Record exception + ERROR status on a span"""
+    span.record_exception(error)
+    span.set_status(Status(StatusCode.ERROR, str(error)))
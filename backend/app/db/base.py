@@ -1,17 +1,44 @@
 """
 Database setup and session management
 """
-from sqlalchemy import create_engine
+from pathlib import Path
+import re
+
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
+from app.core.metrics import instrument_pool
+from app.db.instrumentation import instrument_engine, TimedQueuePool
+from app.core.deadline import instrument_engine_deadlines
+
+
+def build_engine(url: str):
+    """
+    Engine with pool, query and deadline instrumentation
+    Used for the primary and for read replicas (app.db.replica)
+    """
+    # SQLite keeps its default pool
+    db_engine = create_engine(
+        url,
+        pool_pre_ping=True,  # Verify connections before using
+        echo=False,  # Set to True to see SQL queries
+        **({} if url.startswith("sqlite") else {"poolclass": TimedQueuePool})
+    )
+    instrument_pool(db_engine)
+    instrument_engine(db_engine)
+    instrument_engine_deadlines(db_engine)
+    return db_engine
+
+
+# Create engine (primary - all writes)
+engine = build_engine(settings.database_url)
+
+# Alembic scripts (backend/migrations)
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "migrations"
 
-# Create engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,  # Verify connections before using
-    echo=False,  # Set to True to see SQL queries
-)
+_REVISION = re.compile(r"^revision\s*(?::[^=]*)?=\s*['\"](\w+)['\"]", re.MULTILINE)
+_DOWN_REVISION = re.compile(r"^down_revision\s*(?::[^=]*)?=\s*(.+)$", re.MULTILINE)
 
 # Session maker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -38,4 +65,52 @@ def init_db():
     Call this on app startup
     """
     from app.db import models  # Import models to register them
+    if engine.dialect.name == "postgresql":
+        # Trigram index on messages.content needs pg_trgm
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
     Base.metadata.create_all(bind=engine)
+
+
+def check_db_revision() -> str:
+    """
+    Verify the database is at the Alembic head revision
+    One query, no DDL - for startups where migrations run as a deploy step
+    
+    Returns:
+        Current revision
+    
+    Raises:
+        RuntimeError if the database is not at head
+    """
+    heads = migration_heads()
+    
+    with engine.connect() as conn:
+        current = set(conn.execute(text("SELECT version_num FROM alembic_version")).scalars())
+    
+    if current != heads:
+        raise RuntimeError(
+            f"Database revision {sorted(current)} != migrations head {sorted(heads)} "
+            f"- run 'alembic upgrade head'"
+        )
+    return ",".join(sorted(current))
+
+
+def migration_heads() -> set:
+    """
+    Head revision(s) of the migration scripts
+    Reads revision ids as text - importing alembic and executing every
+    script would cost more than the check itself
+    """
+    revisions = set()
+    parents = set()
+    for path in (MIGRATIONS_DIR / "versions").glob("*.py"):
+        source = path.read_text(encoding="utf-8")
+        revision = _REVISION.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down = _DOWN_REVISION.search(source)
+        if down:
+            parents.update(re.findall(r"['\"](\w+)['\"]", down.group(1)))
+    return revisions - parents
@@ -2,13 +2,35 @@
 CRUD operations for database
 """
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import func, tuple_, cast, literal, case, REAL, TIMESTAMP, select, insert, update, delete
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from typing import List, Optional, Tuple
 from uuid import UUID, uuid4
-from datetime import datetime
+from datetime import datetime, timedelta
+import inspect
 
 from app.db import models
 from app.schemas.chat import MessageCreate
 from app.schemas.session import SessionCreate
+from app.core.metrics import observe_db
+from app.core.change_feed import publish_change
+from app.core.tracing import traced
+
+
+# ============ REQUEST IDENTITY MAP ============
+
+def _identity_map(db: Session) -> dict:
+    """
+    Request-scoped identity map for ownership-filtered lookups.
+    get_db() hands out one Session per request, so Session.info lives
+    exactly as long as the request. Misses (None) are cached too.
+    """
+    return db.info.setdefault("owned_identity_map", {})
+
+
+def _clear_identity_map(db: Session) -> None:
+    """Drop cached lookups (after deletes, cached rows may be gone)"""
+    db.info.pop("owned_identity_map", None)
 
 
 # ============ USER CRUD ============
@@ -80,8 +102,23 @@ def get_or_create_user(db: Session, user_id: UUID, name: str) -> models.User:
 # ============ SESSION CRUD ============
 
 def get_session(db: Session, session_id: UUID) -> Optional[models.ChatSession]:
-    """Get session by ID"""
-    return db.query(models.ChatSession).filter(models.ChatSession.id == session_id).first()
+    """Get session by ID (served from the Session identity map when already loaded)"""
+    return db.get(models.ChatSession, session_id)
+
+
+def get_user_session(db: Session, session_id: UUID, user_id: UUID) -> Optional[models.ChatSession]:
+    """
+    Get session by ID only if it belongs to user - one query
+    Returns None for not-found and not-owned alike
+    """
+    key = ("session", str(session_id), str(user_id))
+    identity_map = _identity_map(db)
+    if key not in identity_map:
+        identity_map[key] = db.query(models.ChatSession).filter(
+            models.ChatSession.id == session_id,
+            models.ChatSession.user_id == user_id
+        ).first()
+    return identity_map[key]
 
 
 def get_session_by_ai_session_id(db: Session, ai_session_id: str) -> Optional[models.ChatSession]:
@@ -97,52 +134,101 @@ def create_session(db: Session, user_id: UUID, session_data: SessionCreate) -> m
         title=session_data.title
     )
     db.add(db_session)
+    db.flush()
+    publish_change(db, "session.created", db_session.id, user_id, title=db_session.title)
     db.commit()
     db.refresh(db_session)
     return db_session
 
 
-def list_user_sessions(db: Session, user_id: UUID, limit: int = 20) -> List[models.ChatSession]:
-    """List user's active sessions"""
+def list_user_sessions(
+    db: Session,
+    user_id: UUID,
+    limit: int = 20,
+    archived: bool = False
+) -> List[models.ChatSession]:
+    """List user's active (or archived) sessions"""
     return db.query(models.ChatSession)\
         .filter(
             models.ChatSession.user_id == user_id,
-            models.ChatSession.is_archived == 0
+            models.ChatSession.is_archived == (1 if archived else 0)
         )\
         .order_by(models.ChatSession.last_active_at.desc())\
         .limit(limit)\
         .all()
 
 
+# Rows per DELETE statement (and transaction) when purging a session
+DELETE_BATCH_SIZE = 5000
+
+
+def _purge_session_rows(db: Session, session_ids, batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """
+    Delete the messages and events of some sessions in bounded batches, committing each
+    Keeps memory flat and row locks short for huge sessions; batches span
+    sessions, so many small ones cost a couple of statements, not a couple each
+    
+    Args:
+        session_ids: List of session IDs, or a select of them
+    
+    Returns: Number of rows deleted
+    """
+    deleted = 0
+    for table in (models.Message.__table__, models.Event.__table__):
+        while True:
+            batch = select(table.c.id, table.c.created_at)\
+                .where(table.c.session_id.in_(session_ids))\
+                .limit(batch_size)
+            result = db.execute(
+                delete(table).where(tuple_(table.c.id, table.c.created_at).in_(batch))
+            )
+            db.commit()
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+    return deleted
+
+
 def delete_session(db: Session, session_id: UUID) -> bool:
-    """Delete session and all messages"""
-    db_session = get_session(db, session_id)
-    if db_session:
-        db.delete(db_session)
-        db.commit()
-        return True
-    return False
+    """
+    Delete session and all messages
+    Set-based: never loads Message/Event rows into the ORM
+    """
+    sessions = models.ChatSession.__table__
+    
+    _purge_session_rows(db, [session_id])
+    # Published first - the owner is looked up from the row being deleted
+    publish_change(db, "session.deleted", session_id)
+    # Anything inserted meanwhile goes with ON DELETE CASCADE
+    result = db.execute(delete(sessions).where(sessions.c.id == session_id))
+    db.commit()
+    _clear_identity_map(db)
+    return result.rowcount > 0
 
 
 def delete_all_user_sessions(db: Session, user_id: UUID) -> int:
     """
     Delete ALL sessions for a user (and all messages cascade)
+    Children of all the sessions are purged together in bounded batches first
     Returns: Number of sessions deleted
     """
-    count = db.query(models.ChatSession)\
-        .filter(models.ChatSession.user_id == user_id)\
-        .delete()
+    sessions = models.ChatSession.__table__
+    
+    _purge_session_rows(db, select(sessions.c.id).where(sessions.c.user_id == user_id))
+    
+    session_ids = db.execute(select(sessions.c.id).where(sessions.c.user_id == user_id)).scalars().all()
+    for session_id in session_ids:
+        publish_change(db, "session.deleted", session_id, user_id)
+    
+    result = db.execute(delete(sessions).where(sessions.c.user_id == user_id))
     db.commit()
-    return count
+    _clear_identity_map(db)
+    return result.rowcount
 
 
 def check_session_ownership(db: Session, session_id: UUID, user_id: UUID) -> bool:
     """Check if session belongs to user"""
-    session = db.query(models.ChatSession).filter(
-        models.ChatSession.id == session_id,
-        models.ChatSession.user_id == user_id
-    ).first()
-    return session is not None
+    return get_user_session(db, session_id, user_id) is not None
 
 
 def update_session_title(db: Session, session_id: UUID, title: str) -> Optional[models.ChatSession]:
@@ -150,12 +236,23 @@ def update_session_title(db: Session, session_id: UUID, title: str) -> Optional[
     db_session = get_session(db, session_id)
     if db_session:
         db_session.title = title
+        publish_change(db, "session.updated", session_id, db_session.user_id, title=title)
         db.commit()
         db.refresh(db_session)
         return db_session
     return None
 
 
+def update_session_ai_session_id(db: Session, session_id: UUID, ai_session_id: str) -> None:
+    """Point a session at a different AI Core session"""
+    db.execute(
+        update(models.ChatSession)
+        .where(models.ChatSession.id == session_id)
+        .values(ai_session_id=ai_session_id)
+    )
+    db.commit()
+
+
 # ============ MESSAGE CRUD ============
 
 def create_message(db: Session, session_id: UUID, message_data: MessageCreate) -> models.Message:
@@ -179,15 +276,48 @@ def create_message(db: Session, session_id: UUID, message_data: MessageCreate) -
     db_message.needs_knowledge = message_data.needs_knowledge
     
     db.add(db_message)
+    db.flush()
+    publish_change(db, "message.created", session_id, message_id=db_message.id, role=db_message.role)
     db.commit()
     db.refresh(db_message)
     return db_message
 
 
-def get_session_messages(db: Session, session_id: UUID, limit: int = 100) -> List[models.Message]:
-    """Get messages for a session"""
-    return db.query(models.Message)\
-        .filter(models.Message.session_id == session_id)\
+def delete_message(db: Session, message_id: UUID, created_at: datetime) -> bool:
+    """Delete one message (created_at = partition key, so only its partition is touched)"""
+    messages = models.Message.__table__
+    result = db.execute(
+        delete(messages).where(messages.c.id == message_id, messages.c.created_at == created_at)
+        .returning(messages.c.session_id)
+    )
+    session_id = result.scalar()
+    if session_id is not None:
+        publish_change(db, "message.deleted", session_id, message_id=message_id)
+    db.commit()
+    return session_id is not None
+
+
+# Slack on the since= partition bound: a row can be stamped slightly before its
+# session (created_at is the transaction start, so a transaction that began
+# before the session was committed)
+SINCE_MARGIN = timedelta(days=1)
+
+
+def get_session_messages(
+    db: Session,
+    session_id: UUID,
+    limit: int = 100,
+    since: Optional[datetime] = None
+) -> List[models.Message]:
+    """
+    Get messages for a session
+    Pass since=session.created_at so the planner prunes older partitions
+    (rows from since - SINCE_MARGIN on are returned)
+    """
+    query = db.query(models.Message).filter(models.Message.session_id == session_id)
+    if since is not None:
+        query = query.filter(models.Message.created_at >= since - SINCE_MARGIN)
+    return query\
         .order_by(models.Message.created_at.asc())\
         .limit(limit)\
         .all()
@@ -208,10 +338,20 @@ def create_event(db: Session, session_id: UUID, event_type: str, payload: dict)
     return db_event
 
 
-def get_session_events(db: Session, session_id: UUID) -> List[models.Event]:
-    """Get events for a session"""
-    return db.query(models.Event)\
-        .filter(models.Event.session_id == session_id)\
+def get_session_events(
+    db: Session,
+    session_id: UUID,
+    since: Optional[datetime] = None
+) -> List[models.Event]:
+    """
+    Get events for a session
+    Pass since=session.created_at so the planner prunes older partitions
+    (rows from since - SINCE_MARGIN on are returned)
+    """
+    query = db.query(models.Event).filter(models.Event.session_id == session_id)
+    if since is not None:
+        query = query.filter(models.Event.created_at >= since - SINCE_MARGIN)
+    return query\
         .order_by(models.Event.created_at.asc())\
         .all()
 
@@ -219,8 +359,26 @@ def get_session_events(db: Session, session_id: UUID) -> List[models.Event]:
 # ============ MESSAGE MISTAKE CRUD ============
 
 def get_message(db: Session, message_id: UUID) -> Optional[models.Message]:
-    """Get message by ID"""
-    return db.query(models.Message).filter(models.Message.id == message_id).first()
+    """Get message by ID (served from the Session identity map when already loaded)"""
+    return db.get(models.Message, message_id)
+
+
+def get_user_message(db: Session, message_id: UUID, user_id: UUID) -> Optional[models.Message]:
+    """
+    Get message by ID only if its session belongs to user - one query
+    Returns None for not-found and not-owned alike
+    """
+    key = ("message", str(message_id), str(user_id))
+    identity_map = _identity_map(db)
+    if key not in identity_map:
+        identity_map[key] = db.query(models.Message)\
+            .join(models.ChatSession, models.Message.session_id == models.ChatSession.id)\
+            .filter(
+                models.Message.id == message_id,
+                models.ChatSession.user_id == user_id
+            )\
+            .first()
+    return identity_map[key]
 
 
 def mark_message_mistake(
@@ -234,6 +392,7 @@ def mark_message_mistake(
     if message:
         message.is_mistake = 1 if is_mistake else 0
         message.mistake_note = note if is_mistake else None
+        publish_change(db, "message.updated", message.session_id, message_id=message_id, is_mistake=is_mistake)
         db.commit()
         db.refresh(message)
         return message
@@ -258,7 +417,272 @@ def get_user_mistakes(db: Session, user_id: UUID, limit: int = 50) -> List[model
 
 def check_message_ownership(db: Session, message_id: UUID, user_id: UUID) -> bool:
     """Check if message belongs to user (via session)"""
-    message = get_message(db, message_id)
-    if not message:
-        return False
-    return check_session_ownership(db, message.session_id, user_id)
+    return get_user_message(db, message_id, user_id) is not None
+
+
+# ============ ARCHIVE CRUD ============
+
+# Rows per INSERT when rehydrating an archive
+RESTORE_CHUNK_SIZE = 1000
+
+
+def _archive_columns(table) -> list:
+    """Columns copied to/from the archive (generated columns are recomputed)"""
+    return [column for column in table.columns if column.computed is None]
+
+
+def _row_to_document(table, row) -> dict:
+    """Table row -> JSON-safe dict"""
+    document = {}
+    for column in _archive_columns(table):
+        value = row[column.name]
+        if isinstance(value, UUID):
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        document[column.name] = value
+    return document
+
+
+def _document_to_row(table, document: dict) -> dict:
+    """JSON dict -> insertable table row"""
+    row = {}
+    for column in _archive_columns(table):
+        value = document.get(column.name)
+        if value is not None:
+            if isinstance(column.type, PG_UUID):
+                value = UUID(value)
+            elif isinstance(column.type, TIMESTAMP):
+                value = datetime.fromisoformat(value)
+        row[column.name] = value
+    return row
+
+
+def list_idle_session_ids(db: Session, cutoff: datetime, limit: int = 100) -> List[UUID]:
+    """
+    Active sessions with no activity since cutoff
+    (last_active_at isn't bumped by new messages, so check messages too)
+    """
+    recent_message = db.query(models.Message.session_id).filter(
+        models.Message.session_id == models.ChatSession.id,
+        models.Message.created_at >= cutoff
+    ).exists()
+    
+    rows = db.query(models.ChatSession.id)\
+        .filter(
+            models.ChatSession.is_archived == 0,
+            models.ChatSession.last_active_at < cutoff,
+            ~recent_message
+        )\
+        .order_by(models.ChatSession.last_active_at.asc())\
+        .limit(limit)\
+        .all()
+    return [row.id for row in rows]
+
+
+def archive_session(db: Session, session_id: UUID) -> Optional[int]:
+    """
+    Move a session's messages and events into session_archives (one transaction)
+    
+    Returns: Number of messages archived, None if session missing or already archived
+    """
+    sessions = models.ChatSession.__table__
+    messages = models.Message.__table__
+    events = models.Event.__table__
+    
+    # Row lock also blocks concurrent message inserts (FK check) until commit
+    db_session = db.query(models.ChatSession)\
+        .filter(models.ChatSession.id == session_id, models.ChatSession.is_archived == 0)\
+        .with_for_update()\
+        .first()
+    if not db_session:
+        return None
+    
+    # No created_at bound here: the copy must cover exactly what the DELETE removes
+    message_rows = db.execute(
+        select(*_archive_columns(messages))
+        .where(messages.c.session_id == session_id)
+        .order_by(messages.c.created_at)
+    ).mappings().all()
+    event_rows = db.execute(
+        select(*_archive_columns(events))
+        .where(events.c.session_id == session_id)
+        .order_by(events.c.created_at)
+    ).mappings().all()
+    
+    assistant_rows = [row for row in message_rows if row["role"] == "assistant"]
+    db.add(models.SessionArchive(
+        session_id=session_id,
+        messages=[_row_to_document(messages, row) for row in message_rows],
+        events=[_row_to_document(events, row) for row in event_rows],
+        message_count=len(message_rows),
+        prompt_tokens=sum(row["prompt_tokens"] or 0 for row in assistant_rows),
+        completion_tokens=sum(row["completion_tokens"] or 0 for row in assistant_rows),
+        assistant_message_count=len(assistant_rows)
+    ))
+    db.execute(delete(messages).where(messages.c.session_id == session_id))
+    db.execute(delete(events).where(events.c.session_id == session_id))
+    # Keep last_active_at as-is (column has onupdate=now())
+    db.execute(
+        update(sessions)
+        .where(sessions.c.id == session_id)
+        .values(is_archived=1, last_active_at=sessions.c.last_active_at)
+    )
+    db.commit()
+    _clear_identity_map(db)
+    return len(message_rows)
+
+
+def restore_session(db: Session, session_id: UUID) -> bool:
+    """
+    Move an archived session's messages and events back into the hot tables
+    
+    Returns: True if restored, False if there was no archive
+    """
+    sessions = models.ChatSession.__table__
+    messages = models.Message.__table__
+    events = models.Event.__table__
+    
+    # Concurrent restores wait here, then find nothing to do
+    archive = db.query(models.SessionArchive)\
+        .filter(models.SessionArchive.session_id == session_id)\
+        .with_for_update()\
+        .first()
+    
+    values = {"is_archived": 0}
+    if archive:
+        for table, documents in ((messages, archive.messages), (events, archive.events)):
+            for start in range(0, len(documents), RESTORE_CHUNK_SIZE):
+                chunk = documents[start:start + RESTORE_CHUNK_SIZE]
+                db.execute(insert(table), [_document_to_row(table, doc) for doc in chunk])
+        db.delete(archive)
+        
+        # Keep the since= bound safe: the session starts no later than its oldest row
+        earliest = min(
+            (datetime.fromisoformat(doc["created_at"])
+             for doc in archive.messages + archive.events if doc.get("created_at")),
+            default=None
+        )
+        if earliest is not None:
+            values["created_at"] = case(
+                (sessions.c.created_at > earliest, earliest), else_=sessions.c.created_at
+            )
+    
+    # Reopened - last_active_at moves to now() so it isn't re-archived right away
+    db.execute(update(sessions).where(sessions.c.id == session_id).values(**values))
+    db.commit()
+    _clear_identity_map(db)
+    return archive is not None
+
+
+def get_archived_session_messages(db: Session, session_id: UUID, limit: int = 100) -> List[models.Message]:
+    """
+    Messages of an archived session, read from its archive without restoring
+    (detached objects - read only; generated columns are not set)
+    """
+    documents = db.query(models.SessionArchive.messages)\
+        .filter(models.SessionArchive.session_id == session_id)\
+        .scalar() or []
+    messages = models.Message.__table__
+    return [models.Message(**_document_to_row(messages, doc)) for doc in documents[:limit]]
+
+
+# ============ SEARCH ============
+
+# ts_headline hit markers - control characters, so they cannot be confused with content
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+def _escape_like(value: str) -> str:
+    """Escape LIKE wildcards in user input"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_user_messages(
+    db: Session,
+    user_id: UUID,
+    query: str,
+    mode: str = "fulltext",
+    limit: int = 20,
+    after: Optional[Tuple[float, datetime, UUID]] = None
+) -> list:
+    """
+    Search a user's messages, best match first
+    
+    mode="fulltext": content_tsv @@ websearch_to_tsquery (GIN ix_messages_content_tsv),
+                     ranked by ts_rank_cd, highlighted with ts_headline
+                     (hits between HIGHLIGHT_START / HIGHLIGHT_STOP, content
+                     otherwise raw - escape before rendering)
+    mode="trigram":  content ILIKE '%query%' (GIN ix_messages_content_trgm),
+                     ranked by word_similarity, snippet = raw content
+    
+    Keyset pagination on (rank, created_at, id) - pass the last row's
+    values as `after` to get the next page.
+    
+    Returns rows: id, session_id, session_title, role, created_at, rank, snippet
+    """
+    if mode == "fulltext":
+        tsquery = func.websearch_to_tsquery(models.SEARCH_CONFIG, query)
+        match = models.Message.content_tsv.op("@@")(tsquery)
+        rank = func.ts_rank_cd(models.Message.content_tsv, tsquery)
+    else:
+        match = models.Message.content.ilike(f"%{_escape_like(query)}%", escape="\\")
+        rank = func.word_similarity(query, models.Message.content)
+    
+    page_query = db.query(
+        models.Message.id,
+        models.Message.session_id,
+        models.ChatSession.title.label("session_title"),
+        models.Message.role,
+        models.Message.content,
+        models.Message.created_at,
+        rank.label("rank")
+    )\
+        .join(models.ChatSession, models.Message.session_id == models.ChatSession.id)\
+        .filter(models.ChatSession.user_id == user_id, match)
+    
+    if after is not None:
+        after_rank, after_created_at, after_id = after
+        # rank is float4 - compare as REAL so the cursor round-trips exactly
+        page_query = page_query.filter(
+            tuple_(rank, models.Message.created_at, models.Message.id)
+            < tuple_(cast(literal(after_rank), REAL), after_created_at, after_id)
+        )
+    
+    page = page_query\
+        .order_by(rank.desc(), models.Message.created_at.desc(), models.Message.id.desc())\
+        .limit(limit)\
+        .subquery()
+    
+    # Highlight only the rows on this page (markers stripped from the content first)
+    if mode == "fulltext":
+        snippet = func.ts_headline(
+            models.SEARCH_CONFIG,
+            func.translate(page.c.content, HIGHLIGHT_START + HIGHLIGHT_STOP, ""),
+            tsquery,
+            f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2, MaxWords=30, MinWords=10"
+        )
+    else:
+        snippet = page.c.content
+    
+    return db.query(
+        page.c.id,
+        page.c.session_id,
+        page.c.session_title,
+        page.c.role,
+        page.c.created_at,
+        page.c.rank,
+        snippet.label("snippet")
+    )\
+        .order_by(page.c.rank.desc(), page.c.created_at.desc(), page.c.id.desc())\
+        .all()
+
+
+# ============ METRICS / TRACING ============
+
+# Wrap every public CRUD function: db_operation_duration_seconds{function=...}
+# and a crud.<function> span
+for _name, _fn in list(globals().items()):
+    if inspect.isfunction(_fn) and _fn.__module__ == __name__ and not _name.startswith("_"):
+        globals()[_name] = traced(f"crud.{_name}")(observe_db(_name)(_fn))
+del _name, _fn
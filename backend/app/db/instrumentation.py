@@ -0,0 +1,179 @@
+"""
+SQL query instrumentation
+
+Engine cursor events time every statement and attribute it to the current
+request (contextvar set by RequestIDMiddleware):
+- slow_query log above settings.slow_query_ms
+- n_plus_one_suspected log when a request runs more than
+  settings.query_budget_per_request statements
+- per-request QueryStats exposed in debug responses / X-DB-* headers
+
+TimedQueuePool additionally times connection checkouts (pool wait).
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+
+logger = get_logger(__name__)
+
+# Statement text logged is truncated to this many characters
+STATEMENT_LOG_LENGTH = 500
+
+
+class QueryStats:
+    """Queries executed during one request"""
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id = request_id
+        self.count = 0
+        self.total_ms = 0.0
+        self.rows = 0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, duration_ms: float, rows: int) -> None:
+        self.count += 1
+        self.total_ms += duration_ms
+        self.rows += max(rows, 0)
+        self.statements[statement] += 1
+
+    @property
+    def over_budget(self) -> bool:
+        return self.count > settings.query_budget_per_request
+
+    def as_dict(self) -> dict:
+        """Query budget summary for debug responses"""
+        return {
+            "request_id": self.request_id,
+            "queries": self.count,
+            "budget": settings.query_budget_per_request,
+            "over_budget": self.over_budget,
+            "total_ms": round(self.total_ms, 2),
+            "rows": self.rows,
+        }
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """QueryStats of the request being served (None outside a request)"""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(request_id: str):
+    """
+    Collect QueryStats for the enclosed request and flag N+1 patterns on exit
+
+    Sync routes run in the threadpool with a copy of this context, so they
+    see (and mutate) the same QueryStats object.
+    """
+    stats = QueryStats(request_id)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+        if stats.count:
+            metrics.db_queries_per_request.observe(stats.count)
+        if stats.over_budget:
+            statement, repeats = stats.statements.most_common(1)[0]
+            logger.warning(
+                "n_plus_one_suspected",
+                request_id=request_id,
+                queries=stats.count,
+                budget=settings.query_budget_per_request,
+                total_ms=round(stats.total_ms, 2),
+                most_repeated=statement[:STATEMENT_LOG_LENGTH],
+                repeats=repeats
+            )
+
+
+def instrument_engine(engine) -> None:
+    """Attach timing hooks to an Engine"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+        rows = cursor.rowcount if cursor.rowcount is not None else -1
+
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.record(statement, duration_ms, rows)
+
+        if duration_ms >= settings.slow_query_ms:
+            logger.warning(
+                "slow_query",
+                request_id=stats.request_id if stats else None,
+                duration_ms=round(duration_ms, 2),
+                rows=rows,
+                statement=statement[:STATEMENT_LOG_LENGTH]
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        # Failed statement never reaches after_cursor_execute
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+
+
+class PoolWaitStats:
+    """
+    Time spent waiting for a pooled connection (threads blocked on checkout)
+    Read by the admission controller: worst wait since the last sample,
+    including checkouts still waiting
+    """
+
+    def __init__(self):
+        self._waiting = {}  # token -> wait start
+        self._window_max = 0.0
+
+    def begin(self) -> object:
+        token = object()
+        self._waiting[token] = time.perf_counter()
+        return token
+
+    def end(self, token: object) -> None:
+        wait = time.perf_counter() - self._waiting.pop(token)
+        self._window_max = max(self._window_max, wait)
+        metrics.db_pool_wait_seconds.observe(wait)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def sample_ms(self) -> float:
+        """Worst wait (ms) since the previous sample; resets the window"""
+        now = time.perf_counter()
+        oldest = min(self._waiting.values(), default=now)
+        worst = max(self._window_max, now - oldest)
+        self._window_max = 0.0
+        return worst * 1000
+
+
+pool_wait_stats = PoolWaitStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        token = pool_wait_stats.begin()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_stats.end(token)
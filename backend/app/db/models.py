@@ -1,14 +1,18 @@
 """
 SQLAlchemy database models
 """
-from sqlalchemy import Column, String, Text, Float, Integer, TIMESTAMP, ForeignKey, CheckConstraint
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Text, Float, Integer, TIMESTAMP, ForeignKey, CheckConstraint, Computed, Index, Boolean, DDL, event
+from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.sql import func, text
 import uuid
 
 from app.db.base import Base
 
+# Text search config for messages.content_tsv - 'simple' = no stemming,
+# works for mixed Vietnamese/English content
+SEARCH_CONFIG = "simple"
+
 
 class User(Base):
     """User model with authentication"""
@@ -23,12 +27,20 @@ class User(Base):
     last_login_at = Column(TIMESTAMP, nullable=True)
     
     # Relationships
-    sessions = relationship("ChatSession", back_populates="user", cascade="all, delete-orphan")
+    # passive_deletes: rely on ON DELETE CASCADE instead of loading children
+    sessions = relationship("ChatSession", back_populates="user", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class ChatSession(Base):
     """Chat session with message count and archive support"""
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # list_user_sessions only ever reads active sessions
+        Index(
+            "ix_chat_sessions_user_active", "user_id", "last_active_at",
+            postgresql_where=text("is_archived = 0")
+        ),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -41,8 +53,9 @@ class ChatSession(Base):
     
     # Relationships
     user = relationship("User", back_populates="sessions")
-    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan")
-    events = relationship("Event", back_populates="session", cascade="all, delete-orphan")
+    # passive_deletes: rely on ON DELETE CASCADE instead of loading children
+    messages = relationship("Message", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
+    events = relationship("Event", back_populates="session", cascade="all, delete-orphan", passive_deletes=True)
 
 
 class Message(Base):
@@ -51,12 +64,30 @@ class Message(Base):
     Lưu đầy đủ AI metadata
     """
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_session_id_created_at", "session_id", "created_at"),
+        # Full-text search (GET /search)
+        Index("ix_messages_content_tsv", "content_tsv", postgresql_using="gin"),
+        # Trigram fallback for short/partial queries (requires pg_trgm)
+        Index(
+            "ix_messages_content_trgm", "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"}
+        ),
+        # Monthly partitions - see app/db/partitions.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     
     role = Column(Text, CheckConstraint("role IN ('user', 'assistant')"), nullable=False)
     content = Column(Text, nullable=False)
+    # Generated search vector - deferred so normal message loads never fetch it
+    content_tsv = deferred(Column(
+        TSVECTOR,
+        Computed(f"to_tsvector('{SEARCH_CONFIG}', content)", persisted=True)
+    ))
     
     # AI Metadata (chỉ có khi role = 'assistant')
     persona = Column(Text, nullable=True)  # Legacy - built from tone+behavior
@@ -103,10 +134,13 @@ class Message(Base):
     is_mistake = Column(Integer, default=0)  # 0=normal, 1=marked as mistake
     mistake_note = Column(Text, nullable=True)
     
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    # Partition key - part of the table PK (Postgres requires it), not the mapper PK
+    created_at = Column(TIMESTAMP, server_default=func.now(), primary_key=True)
     
     # Relationships
     session = relationship("ChatSession", back_populates="messages")
+    
+    __mapper_args__ = {"primary_key": [id]}
 
 
 class Event(Base):
@@ -114,12 +148,83 @@ class Event(Base):
     Event log - optional, ngon khi debug AI
     """
     __tablename__ = "events"
+    __table_args__ = (
+        Index("ix_events_session_id_created_at", "session_id", "created_at"),
+        # Monthly partitions - see app/db/partitions.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), nullable=False)
     type = Column(Text, nullable=False)  # 'persona_switch', 'warning', 'refusal'
     payload = Column(JSONB, nullable=True)
-    created_at = Column(TIMESTAMP, server_default=func.now())
+    # Partition key - part of the table PK (Postgres requires it), not the mapper PK
+    created_at = Column(TIMESTAMP, server_default=func.now(), primary_key=True)
     
     # Relationships
     session = relationship("ChatSession", back_populates="events")
+    
+    __mapper_args__ = {"primary_key": [id]}
+
+
+class SessionArchive(Base):
+    """
+    Cold storage for an archived session's messages and events
+    Rows are moved out of the hot (partitioned) tables as JSONB documents,
+    which Postgres TOAST-compresses. chat_sessions keeps the session row
+    (is_archived=1) so ownership checks and listing still work.
+    """
+    __tablename__ = "session_archives"
+    
+    session_id = Column(UUID(as_uuid=True), ForeignKey("chat_sessions.id", ondelete="CASCADE"), primary_key=True)
+    messages = Column(JSONB, nullable=False)  # List of message rows
+    events = Column(JSONB, nullable=False)  # List of event rows
+    message_count = Column(Integer, nullable=False, default=0)
+    # Assistant-message token totals (token analytics without reading the JSON)
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    assistant_message_count = Column(Integer, nullable=False, default=0)
+    archived_at = Column(TIMESTAMP, server_default=func.now())
+
+
+class RateLimitBucket(Base):
+    """
+    Shared token bucket state (RATE_LIMIT_BACKEND=postgres)
+    UNLOGGED: no WAL for this write-heavy, disposable data (emptied on crash)
+    """
+    __tablename__ = "rate_limit_buckets"
+    
+    key = Column(String(255), primary_key=True)  # <limit>:<user|ip>:<id>
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(Float, nullable=False)  # Epoch seconds (DB clock)
+    allowed = Column(Boolean, nullable=False)  # Outcome of the last take
+
+
+# create_all has no dialect-specific table prefixes - switch to UNLOGGED after creating
+event.listen(
+    RateLimitBucket.__table__,
+    "after_create",
+    DDL("ALTER TABLE rate_limit_buckets SET UNLOGGED").execute_if(dialect="postgresql")
+)
+
+
+class EndpointCacheEntry(Base):
+    """
+    Cached endpoint response (ENDPOINT_CACHE_BACKEND=postgres)
+    UNLOGGED: disposable, recomputed on a miss
+    """
+    __tablename__ = "endpoint_cache"
+    
+    user_id = Column(String(64), primary_key=True)
+    key = Column(String(255), primary_key=True)  # <endpoint>:<params>
+    value = Column(Text, nullable=False)  # JSON response
+    stored_at = Column(Float, nullable=False)  # Epoch seconds (DB clock)
+    expires_at = Column(Float, nullable=False)  # stored_at + ttl + stale
+    refreshing_until = Column(Float, nullable=False, server_default=text("0"))  # Background refresh lease
+
+
+event.listen(
+    EndpointCacheEntry.__table__,
+    "after_create",
+    DDL("ALTER TABLE endpoint_cache SET UNLOGGED").execute_if(dialect="postgresql")
+)
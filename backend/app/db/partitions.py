@@ -0,0 +1,173 @@
+"""
+Monthly range partitions for messages / events
+
+Both tables are PARTITION BY RANGE (created_at), one partition per month
+(e.g. messages_y2026m02) plus a DEFAULT partition that should stay empty.
+Future partitions are created ahead of time on startup; partitions older
+than the retention window are detached and dropped instead of DELETEd.
+
+Run manually / from cron:
+    python -m app.db.partitions
+"""
+from datetime import date, datetime
+from typing import Iterator, List
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PARTITIONED_TABLES = ("messages", "events")
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+
+def month_start(value: date) -> date:
+    """First day of the month containing value"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    """Shift a month start by N months"""
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def iter_months(first: date, last: date) -> Iterator[date]:
+    """Month starts from first to last (inclusive)"""
+    current = month_start(first)
+    while current <= last:
+        yield current
+        current = add_months(current, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Partition table name for a month, e.g. messages_y2026m02"""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def create_partition_sql(table: str, month: date) -> str:
+    """DDL for one monthly partition"""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+        f"PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def is_partitioned(conn: Connection, table: str) -> bool:
+    """Whether table is a declaratively partitioned parent"""
+    return conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": table}
+    ).first() is not None
+
+
+def list_partitions(conn: Connection, table: str) -> List[str]:
+    """Names of the partitions attached to table"""
+    rows = conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table)"
+        ),
+        {"table": table}
+    )
+    return [row[0] for row in rows]
+
+
+def create_partitions(conn: Connection, table: str, first: date, last: date) -> List[str]:
+    """
+    Create missing monthly partitions covering first..last plus the DEFAULT partition
+    Existing partitions are skipped without issuing DDL (no parent lock taken)
+
+    Returns: Names of partitions created
+    """
+    existing = set(list_partitions(conn, table))
+    created = []
+
+    for month in iter_months(first, last):
+        name = partition_name(table, month)
+        if name not in existing:
+            conn.execute(text(create_partition_sql(table, month)))
+            created.append(name)
+
+    if f"{table}_default" not in existing:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        created.append(f"{table}_default")
+
+    return created
+
+
+def ensure_partitions(engine: Engine, months_ahead: int = None) -> List[str]:
+    """
+    Make sure partitions exist from this month to N months ahead
+    Call on startup (and periodically) so the DEFAULT partition stays empty
+
+    Returns: Names of partitions created
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+
+    months_ahead = settings.partition_months_ahead if months_ahead is None else months_ahead
+    this_month = month_start(datetime.utcnow().date())
+    created = []
+
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            created += create_partitions(conn, table, this_month, add_months(this_month, months_ahead))
+
+    if created:
+        logger.info("partitions_created", partitions=created)
+    return created
+
+
+def drop_expired_partitions(engine: Engine, retention_months: int = None) -> List[str]:
+    """
+    Detach and drop monthly partitions that ended before the retention window
+    retention_months=0 keeps everything
+
+    Returns: Names of partitions dropped
+    """
+    if engine.dialect.name != "postgresql":
+        return []
+
+    retention_months = settings.partition_retention_months if retention_months is None else retention_months
+    if retention_months <= 0:
+        return []
+
+    cutoff = add_months(month_start(datetime.utcnow().date()), -retention_months)
+    dropped = []
+
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            for name in list_partitions(conn, table):
+                match = _PARTITION_NAME.match(name)
+                if not match or match.group("table") != table:
+                    continue
+                month = date(int(match.group("year")), int(match.group("month")), 1)
+                if add_months(month, 1) <= cutoff:
+                    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                    conn.execute(text(f"DROP TABLE {name}"))
+                    dropped.append(name)
+
+    if dropped:
+        logger.info("partitions_dropped", partitions=dropped, cutoff=cutoff.isoformat())
+    return dropped
+
+
+if __name__ == "__main__":
+    from app.core.logging import setup_logging
+    from app.db.base import engine
+
+    setup_logging()
+    ensure_partitions(engine)
+    drop_expired_partitions(engine)
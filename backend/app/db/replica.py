@@ -0,0 +1,241 @@
+"""
+Read replicas - serve read-only routes off the primary
+
+Read-only routes (analytics, GET /session*, GET /chat/history,
+GET /message/mistakes) take `Depends(get_read_db)` instead of get_db. Their
+session goes to a random replica from DATABASE_REPLICA_URLS, unless:
+- read-your-writes: the user committed a write within
+  REPLICA_READ_YOUR_WRITES_SECONDS. Recorded on commit in this worker
+  (ReadYourWritesMiddleware supplies the user), and from change feed events
+  for writes made through other workers
+- lag: no replica passed its last check with at most REPLICA_MAX_LAG_SECONDS
+  of replay lag (checked every REPLICA_LAG_CHECK_INTERVAL seconds; a check
+  older than 3 intervals counts as failed)
+Either way the primary serves the read. A read path that has to write
+(restoring an archived session) calls use_primary() first.
+"""
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+
+from fastapi import Depends
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.auth import decode_access_token
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+from app.db.base import SessionLocal, build_engine, engine
+from app.middlewares.auth import get_current_user
+
+logger = get_logger(__name__)
+
+# Seconds behind the primary; 0 once the standby replayed everything it received
+LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Bearer token of the current request (ReadYourWritesMiddleware) - decoded only on a write commit
+request_token_var: ContextVar[Optional[str]] = ContextVar("request_token", default=None)
+
+
+class Replica:
+    """One read replica: its engine and last lag check"""
+
+    def __init__(self, url: str):
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.engine = build_engine(url)
+        self.sessionmaker = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine, info={"replica": self.name}
+        )
+        self.lag: Optional[float] = None  # None = unreachable / not checked yet
+        self.checked_at = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "replica": self.name,
+            "lag_s": None if self.lag is None else round(self.lag, 3),
+            "checked_s_ago": round(time.monotonic() - self.checked_at, 1) if self.checked_at else None,
+        }
+
+
+class ReplicaRouter:
+    """Picks the database for each read-only session"""
+
+    # Sweep expired read-your-writes entries once the dict grows past this
+    MAX_WRITERS = 100_000
+
+    def __init__(self, urls: List[str], max_lag: float, check_interval: float, sticky_seconds: float):
+        self.replicas = [Replica(url) for url in dict.fromkeys(urls)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.sticky_seconds = sticky_seconds
+        self.recent_writes: Dict[str, float] = {}  # user_id -> primary reads until (monotonic)
+        self._checker: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def note_write(self, user_id) -> None:
+        """The user just wrote - read from the primary for a while (any thread)"""
+        if not self.replicas or not user_id:
+            return
+        now = time.monotonic()
+        if len(self.recent_writes) >= self.MAX_WRITERS:
+            for key, until in list(self.recent_writes.items()):
+                if until <= now:
+                    self.recent_writes.pop(key, None)
+        self.recent_writes[str(user_id)] = now + self.sticky_seconds
+
+    def usable(self) -> List[Replica]:
+        """Replicas whose last check is recent and within the lag limit"""
+        fresh_after = time.monotonic() - 3 * self.check_interval
+        return [
+            r for r in self.replicas
+            if r.lag is not None and r.lag <= self.max_lag and r.checked_at >= fresh_after
+        ]
+
+    def session(self, user_id: Optional[str]) -> Session:
+        """Session for a read-only route (see module docstring)"""
+        if not self.replicas:
+            return SessionLocal()
+
+        until = self.recent_writes.get(str(user_id)) if user_id else None
+        if until is not None and until > time.monotonic():
+            metrics.db_read_sessions_total.labels(target="primary", reason="read_your_writes").inc()
+            return SessionLocal()
+
+        replicas = self.usable()
+        if not replicas:
+            metrics.db_read_sessions_total.labels(target="primary", reason="replica_lagging").inc()
+            return SessionLocal()
+
+        metrics.db_read_sessions_total.labels(target="replica", reason="ok").inc()
+        return random.choice(replicas).sessionmaker()
+
+    def check(self, replica: Replica) -> None:
+        """One replay lag check (blocking - runs in a thread)"""
+        was_usable = replica.lag is not None and replica.lag <= self.max_lag
+        try:
+            with replica.engine.connect() as conn:
+                if replica.engine.dialect.name == "postgresql":
+                    lag = float(conn.execute(LAG_SQL).scalar())
+                else:
+                    # Stand-in without replication (e.g. SQLite): reachable = in sync
+                    conn.execute(text("SELECT 1"))
+                    lag = 0.0
+        except Exception as e:
+            if replica.lag is not None:
+                logger.warning("db_replica_unavailable", replica=replica.name, error=str(e))
+            replica.lag = None
+            return
+
+        replica.lag = lag
+        replica.checked_at = time.monotonic()
+        metrics.db_replica_lag_seconds.labels(replica=replica.name).set(lag)
+        if was_usable and lag > self.max_lag:
+            logger.warning("db_replica_lagging", replica=replica.name, lag_s=round(lag, 3))
+        elif not was_usable and lag <= self.max_lag:
+            logger.info("db_replica_in_sync", replica=replica.name, lag_s=round(lag, 3))
+
+    async def _check_loop(self) -> None:
+        while True:
+            await asyncio.gather(*(asyncio.to_thread(self.check, r) for r in self.replicas))
+            await asyncio.sleep(self.check_interval)
+
+    def start(self) -> None:
+        """Start lag checks (call from lifespan); without them every read uses the primary"""
+        if self.replicas and self._checker is None:
+            self._checker = asyncio.create_task(self._check_loop())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    def snapshot(self) -> dict:
+        """Replica states for the health endpoint"""
+        return {
+            "usable": len(self.usable()),
+            "max_lag_s": self.max_lag,
+            "replicas": [r.snapshot() for r in self.replicas],
+        }
+
+
+def use_primary(db: Session) -> None:
+    """Move a replica session to the primary before it writes (ends its read transaction)"""
+    if db.info.pop("replica", None) is None:
+        return
+    db.commit()
+    db.bind = engine
+
+
+@event.listens_for(Session, "after_flush")
+def _flag_flush(db: Session, flush_context) -> None:
+    db.info["wrote"] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _flag_dml(state) -> None:
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _note_committed_write(db: Session) -> None:
+    """A request's write is committed: its user reads from the primary for a while"""
+    if not db.info.pop("wrote", False) or not replica_router.enabled:
+        return
+    token = request_token_var.get()
+    payload = decode_access_token(token) if token else None
+    if payload:
+        replica_router.note_write(payload.get("sub"))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_write_flag(db: Session) -> None:
+    db.info.pop("wrote", None)
+
+
+@contextmanager
+def read_session(user_id) -> Iterator[Session]:
+    """Read-only session outside a request (background work) - same choice as get_read_db"""
+    db = replica_router.session(str(user_id))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_read_db(current_user: dict = Depends(get_current_user)) -> Session:
+    """
+    get_db for read-only routes
+    Yields a replica session when one can serve this user, else a primary one
+    """
+    with read_session(current_user["user_id"]) as db:
+        yield db
+
+
+# Global router (per worker)
+replica_router = ReplicaRouter(
+    urls=settings.database_replica_urls,
+    max_lag=settings.replica_max_lag_seconds,
+    check_interval=settings.replica_lag_check_interval,
+    sticky_seconds=settings.replica_read_your_writes_seconds,
+)
@@ -1,24 +1,110 @@
 """
 FastAPI application entry point
 """
-from fastapi import FastAPI
+import time
+
+# Startup breakdown starts here (imports included)
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.core.config import settings
+from app.core.deadline import DeadlineExceeded
 from app.core.logging import setup_logging, get_logger
-from app.db.base import init_db
+from app.core.tracing import setup_tracing, shutdown_tracing
+from app.db.base import init_db, check_db_revision, engine
+from app.db.partitions import ensure_partitions
 from app.db import crud
 from app.services.ai_core import ai_core_client
 from app.middlewares.request_id import RequestIDMiddleware
+from app.middlewares.metrics import MetricsMiddleware
+from app.middlewares.admission import AdmissionMiddleware
+from app.middlewares.deadline import DeadlineMiddleware
+from app.core.admission import admission_controller
+from app.core.change_feed import change_hub
+from app.db.replica import replica_router
+from app.api.lazy import include_lazy_routers
 
-# Import routers
-from app.api import health, chat, session, debug, auth, analytics, message
+# Import routers (debug/analytics/admin may be loaded lazily, see below)
+from app.api import health, chat, session, auth, message, search, metrics, changes, chat_ws
 
 # Setup logging
 setup_logging()
 logger = get_logger(__name__)
 
+# Setup tracing (no-op unless TRACING_EXPORTER is set)
+setup_tracing()
+
+
+def prepare_database() -> dict:
+    """
+    Startup DB work according to settings.startup_mode
+    
+    - full: create extension/tables, ensure partitions, default user
+    - check: verify the Alembic revision and ensure partitions (DDL only for
+      missing months)
+    - skip: nothing (schema and partitions managed entirely by deploy steps/cron)
+    
+    Returns:
+        Duration of each step in ms
+    """
+    timings = {}
+    mode = settings.startup_mode.lower()
+    
+    def step(name, fn, *args):
+        start = time.perf_counter()
+        result = fn(*args)
+        timings[f"{name}_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+    
+    if mode == "skip":
+        return timings
+    
+    if mode == "check":
+        revision = step("revision_check", check_db_revision)
+        logger.info("database_revision_ok", revision=revision)
+        # Otherwise rows land in the DEFAULT partition, which then blocks creating that month
+        try:
+            step("partitions", ensure_partitions, engine)
+        except Exception as e:
+            logger.error(
+                "partition_maintenance_failed",
+                error=str(e),
+                hint="run `python -m app.db.partitions` (deploy step / daily cron)"
+            )
+        return timings
+    
+    if mode != "full":
+        raise ValueError(f"Unknown STARTUP_MODE: {settings.startup_mode}")
+    
+    step("create_all", init_db)
+    logger.info("database_initialized")
+    
+    # Monthly partitions for messages/events (no-op if not partitioned)
+    step("partitions", ensure_partitions, engine)
+    
+    # Create default user if not exists
+    step("default_user", create_default_user)
+    logger.info("default_user_ready", user_id=settings.default_user_id)
+    return timings
+
+
+def create_default_user():
+    from app.db.base import SessionLocal
+    from uuid import UUID
+    db = SessionLocal()
+    try:
+        crud.get_or_create_user(
+            db,
+            UUID(settings.default_user_id),
+            settings.default_user_name
+        )
+    finally:
+        db.close()
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,36 +112,44 @@ async def lifespan(app: FastAPI):
     Lifespan events - startup and shutdown
     """
     # Startup
-    logger.info("app_startup", service="conversation-service")
+    logger.info("app_startup", service="conversation-service", startup_mode=settings.startup_mode)
+    startup_start = time.perf_counter()
     
     # Initialize database
     try:
-        init_db()
-        logger.info("database_initialized")
-        
-        # Create default user if not exists
-        from app.db.base import SessionLocal
-        from uuid import UUID
-        db = SessionLocal()
-        try:
-            crud.get_or_create_user(
-                db,
-                UUID(settings.default_user_id),
-                settings.default_user_name
-            )
-            logger.info("default_user_ready", user_id=settings.default_user_id)
-        finally:
-            db.close()
-            
+        timings = prepare_database()
     except Exception as e:
         logger.error("database_init_error", error=str(e))
         raise
     
+    logger.info(
+        "startup_timing",
+        startup_mode=settings.startup_mode,
+        import_ms=round(_import_ms, 2),
+        **timings,
+        lifespan_ms=round((time.perf_counter() - startup_start) * 1000, 2),
+        # Wall time since this module started importing (without interpreter boot)
+        total_ms=round((time.perf_counter() - _import_start) * 1000, 2)
+    )
+    
+    # Load signals for admission control / health
+    admission_controller.start()
+    # Active health checks of AI Core replicas
+    ai_core_client.start()
+    # One LISTEN connection per worker for the change feed
+    change_hub.start()
+    # Replay lag checks of read replicas
+    replica_router.start()
+    
     yield
     
     # Shutdown
     logger.info("app_shutdown")
+    await admission_controller.stop()
+    await change_hub.stop()
+    await replica_router.stop()
     await ai_core_client.close()
+    shutdown_tracing()
 
 
 # Create FastAPI app
@@ -66,8 +160,28 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-# Add middleware
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """Deadline ran out in any route (DB statement, AI Core, queue) -> 504"""
+    return JSONResponse(status_code=504, content={"detail": "Request deadline exceeded"})
+
+
+# Add middleware (innermost first)
+app.add_middleware(AdmissionMiddleware)
 app.add_middleware(RequestIDMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(DeadlineMiddleware)  # Wraps the others: the budget starts on arrival
+
+# Read-your-writes for read replicas - not installed without replicas
+if replica_router.enabled:
+    from app.middlewares.read_your_writes import ReadYourWritesMiddleware
+    app.add_middleware(ReadYourWritesMiddleware)
+
+# Profiling (admin only) - not installed at all unless enabled
+if settings.profiling_enabled:
+    from app.middlewares.profiling import ProfilingMiddleware
+    app.add_middleware(ProfilingMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -80,12 +194,28 @@ app.add_middleware(
 
 # Register routers
 app.include_router(health.router)
+app.include_router(metrics.router)
 app.include_router(auth.router)
 app.include_router(chat.router)
 app.include_router(session.router)
 app.include_router(message.router)
-app.include_router(analytics.router)
-app.include_router(debug.router)
+app.include_router(search.router)
+app.include_router(changes.router)
+app.include_router(chat_ws.router)
+
+# Rarely used routers - imported on first request when LAZY_ROUTERS is on
+rare_routers = {"analytics": "/analytics", "debug": "/debug"}
+if settings.profiling_enabled:
+    rare_routers["admin"] = "/admin"
+if settings.lazy_routers:
+    include_lazy_routers(app, rare_routers)
+else:
+    import importlib
+    for name in rare_routers:
+        app.include_router(importlib.import_module(f"app.api.{name}").router)
+
+# Module import + app construction (the lifespan adds the DB part)
+_import_ms = (time.perf_counter() - _import_start) * 1000
 
 
 if __name__ == "__main__":
@@ -0,0 +1,52 @@
+"""
+Admission middleware - 503 for low-priority requests while overloaded
+
+Pure ASGI and innermost, so shed requests still get X-Request-ID, metrics
+and CORS headers, but never reach routing, auth or the database.
+"""
+import json
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core import metrics
+from app.core.admission import admission_controller, request_priority
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Signals are sampled every few hundred ms; retry after a short back-off
+RETRY_AFTER_SECONDS = 5
+
+
+class AdmissionMiddleware:
+    """Reject requests the admission controller does not admit"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        priority = request_priority(scope["method"], scope["path"])
+        if admission_controller.admit(priority):
+            return await self.app(scope, receive, send)
+
+        metrics.admission_shed_total.labels(priority=priority).inc()
+        logger.warning(
+            "request_shed",
+            path=scope["path"],
+            priority=priority,
+            pressure=round(admission_controller.pressure, 2)
+        )
+        body = json.dumps({"detail": "Service overloaded - please retry later"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(RETRY_AFTER_SECONDS).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,11 +1,12 @@
 """
 JWT authentication middleware
 """
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 
 from app.core.auth import decode_access_token
+from app.core.config import settings
 
 security = HTTPBearer()
 
@@ -37,6 +38,39 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     return {"user_id": user_id, "email": email}
 
 
+def get_admin_user(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    Require an admin (email listed in settings.admin_emails)
+    Raises 403 otherwise
+    """
+    if not current_user.get("email") or current_user["email"] not in settings.admin_emails:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    
+    return current_user
+
+
+def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
+    access_token: Optional[str] = Query(None)
+) -> dict:
+    """
+    Auth for streaming clients that cannot set headers (EventSource, WebSocket):
+    Bearer header, or the same JWT as ?access_token=
+    """
+    if credentials is None and access_token:
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=access_token)
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated"
+        )
+    
+    return get_current_user(credentials)
+
+
 def get_optional_user(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False))
 ) -> Optional[dict]:
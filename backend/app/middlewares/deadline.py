@@ -0,0 +1,36 @@
+"""
+Deadline middleware - start each request's deadline
+
+X-Request-Timeout-Ms from the client (how long it is willing to wait),
+capped by the route default. Pure ASGI so the context var is set in the
+request's own task and reaches the handler (and threadpool calls).
+"""
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.deadline import TIMEOUT_HEADER, route_timeout_ms, set_deadline, reset_deadline
+
+
+class DeadlineMiddleware:
+    """Set the request deadline before anything else runs"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        budget_ms = route_timeout_ms(scope["method"], scope["path"])
+        try:
+            client_ms = float(Headers(scope=scope).get(TIMEOUT_HEADER, 0))
+        except ValueError:
+            client_ms = 0
+        if client_ms > 0:
+            budget_ms = min(client_ms, budget_ms) if budget_ms else client_ms
+
+        token = set_deadline(budget_ms)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            reset_deadline(token)
@@ -0,0 +1,58 @@
+"""
+Metrics middleware - per-route latency and in-flight requests
+"""
+import time
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import metrics
+
+
+def route_template(app, scope: Scope) -> str:
+    """
+    Route path template (/session/{session_id}), not the raw path,
+    so label cardinality stays bounded
+    """
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency and in-flight requests per route template
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        route = route_template(scope["app"], scope)
+        in_flight = metrics.http_requests_in_flight.labels(route=route)
+        in_flight.inc()
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            metrics.http_request_duration_seconds.labels(
+                method=method, route=route
+            ).observe(time.perf_counter() - start)
+            metrics.http_requests_total.labels(
+                method=method, route=route, status=str(status_code)
+            ).inc()
@@ -0,0 +1,82 @@
+"""
+Profiling middleware - profile a single request selected by header
+
+An admin sends `X-Profile: speedscope` (or `collapsed`); the request is
+sampled while in flight and the response carries `X-Profile-Id`, downloadable
+from GET /admin/profile/{id}. Only installed when PROFILING_ENABLED=true.
+"""
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.auth import decode_access_token
+from app.core.config import settings
+from app.core.profiler import SamplingProfiler, save_profile, profile_lock
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_HEADER = "X-Profile"
+REQUEST_SAMPLE_INTERVAL = 0.001  # Requests are short - sample at 1ms
+
+
+def is_admin_request(headers: Headers) -> bool:
+    """Bearer token belongs to an admin (same rule as get_admin_user)"""
+    scheme, _, token = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    payload = decode_access_token(token)
+    return bool(payload) and payload.get("email") in settings.admin_emails
+
+
+class ProfilingMiddleware:
+    """
+    Sample the worker while a header-selected admin request is in flight
+    Concurrent requests on the same worker show up in the profile too
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        fmt = headers.get(PROFILE_HEADER)
+        if not fmt or not is_admin_request(headers):
+            return await self.app(scope, receive, send)
+
+        fmt = "collapsed" if fmt == "collapsed" else "speedscope"
+        if not profile_lock.acquire(blocking=False):
+            # Another profile is running - serve the request unprofiled
+            return await self.app(scope, receive, send)
+
+        profiler = SamplingProfiler(interval=REQUEST_SAMPLE_INTERVAL)
+        profile_id = None
+
+        def finish() -> str:
+            nonlocal profile_id
+            if profile_id is None:
+                profiler.stop()
+                profile_lock.release()
+                profile_id = save_profile(profiler, fmt, f"{scope['method']} {scope['path']}")
+                logger.info(
+                    "request_profiled",
+                    profile_id=profile_id,
+                    path=scope["path"],
+                    duration_ms=round(profiler.duration * 1000, 2),
+                    samples=profiler.sample_count
+                )
+            return profile_id
+
+        async def send_with_profile(message: Message):
+            # Handler is done once headers go out - stop sampling and report the id
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = finish()
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            finish()
@@ -0,0 +1,135 @@
+"""
+Rate limit dependencies - token buckets per user / per IP
+
+Usage:
+    @router.post("", dependencies=[Depends(chat_rate_limit)])
+
+Adds X-RateLimit-Limit / -Remaining / -Reset to the response (the most
+restrictive bucket checked); raises 429 with Retry-After when empty.
+"""
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.core.config import settings
+from app.core.logging import get_logger
+from app.core import metrics
+from app.core.rate_limit import BucketResult, RateLimitExceeded, rate_limit_backend
+from app.middlewares.auth import get_current_user
+
+logger = get_logger(__name__)
+
+
+def client_ip(request: Request) -> str:
+    """Peer address (run uvicorn with --proxy-headers behind a trusted proxy)"""
+    return request.client.host if request.client else "unknown"
+
+
+def rate_limit_exceeded(error: RateLimitExceeded) -> HTTPException:
+    """429 response for a rejected request"""
+    metrics.rate_limit_rejections_total.labels(limit=error.limit).inc()
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests - please slow down",
+        headers=error.headers()
+    )
+
+
+class RateLimit:
+    """
+    Dependency enforcing one token bucket per user and/or per client IP
+
+    Args:
+        name: Limit name (bucket key prefix, metric label)
+        per_minute / burst: per-user bucket (None = no user limit)
+        ip_per_minute / ip_burst: per-IP bucket (None = no IP limit)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        per_minute: float = None,
+        burst: int = None,
+        ip_per_minute: float = None,
+        ip_burst: int = None
+    ):
+        self.name = name
+        self.per_minute = per_minute
+        self.burst = burst
+        self.ip_per_minute = ip_per_minute
+        self.ip_burst = ip_burst
+
+    async def check(self, request: Request, response: Response, user_id: str = None) -> None:
+        if not settings.rate_limit_enabled:
+            return
+
+        try:
+            tightest = await self.take(user_id, client_ip(request))
+        except RateLimitExceeded as e:
+            raise rate_limit_exceeded(e)
+
+        if tightest is not None:
+            response.headers.update(tightest.headers())
+
+    async def take(self, user_id: str = None, ip: str = None) -> Optional[BucketResult]:
+        """
+        Take one token from each bucket (also for non-HTTP callers, e.g. WebSocket turns)
+        A rejected request costs nothing: tokens already taken are refunded
+
+        Returns: the most restrictive result (None if no bucket applies)
+        Raises: RateLimitExceeded
+        """
+        buckets = []
+        if user_id and self.per_minute:
+            buckets.append((f"{self.name}:user:{user_id}", self.per_minute, self.burst))
+        if ip and self.ip_per_minute:
+            buckets.append((f"{self.name}:ip:{ip}", self.ip_per_minute, self.ip_burst))
+
+        tightest = None
+        for index, (key, per_minute, burst) in enumerate(buckets):
+            result = await rate_limit_backend.take(key, per_minute / 60, burst)
+            if not result.allowed:
+                logger.warning("rate_limited", limit=self.name, key=key, retry_after=round(result.retry_after, 2))
+                for taken_key, taken_per_minute, taken_burst in buckets[:index]:
+                    await rate_limit_backend.refund(taken_key, taken_per_minute / 60, taken_burst)
+                raise RateLimitExceeded(self.name, result.retry_after, result)
+            if tightest is None or result.remaining < tightest.remaining:
+                tightest = result
+        return tightest
+
+
+class UserRateLimit(RateLimit):
+    """Keyed by the authenticated user (plus client IP if configured)"""
+
+    async def __call__(
+        self,
+        request: Request,
+        response: Response,
+        current_user: dict = Depends(get_current_user)
+    ) -> dict:
+        await self.check(request, response, current_user["user_id"])
+        return current_user
+
+
+class IPRateLimit(RateLimit):
+    """Keyed by client IP only (unauthenticated endpoints)"""
+
+    async def __call__(self, request: Request, response: Response) -> None:
+        await self.check(request, response)
+
+
+# POST /chat - per user, plus a looser per-IP bucket (many accounts, one client)
+chat_rate_limit = UserRateLimit(
+    "chat",
+    per_minute=settings.chat_rate_limit_per_minute,
+    burst=settings.chat_rate_limit_burst,
+    ip_per_minute=settings.ip_rate_limit_per_minute,
+    ip_burst=settings.ip_rate_limit_burst
+)
+
+# /auth/login, /auth/register - per IP (credential stuffing, signup spam)
+auth_rate_limit = IPRateLimit(
+    "auth",
+    ip_per_minute=settings.auth_rate_limit_per_minute,
+    ip_burst=settings.auth_rate_limit_burst
+)
@@ -0,0 +1,33 @@
+"""
+Read-your-writes middleware - who is writing in this request
+
+Exposes the request's bearer token to app.db.replica, which decodes it when
+a write commits and sends that user's reads to the primary for
+REPLICA_READ_YOUR_WRITES_SECONDS. Pure ASGI so the context var reaches the
+handler (and threadpool calls). Only installed with read replicas.
+"""
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.db.replica import request_token_var
+
+
+class ReadYourWritesMiddleware:
+    """Make the bearer token available to the write-commit hook"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return await self.app(scope, receive, send)
+
+        reset = request_token_var.set(token)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_token_var.reset(reset)
@@ -1,28 +1,82 @@
 """
 Request ID middleware - tracking requests
+
+Pure ASGI (not BaseHTTPMiddleware): the handler runs in the same task, so
+context vars set here are visible downstream, and the response is passed
+through untouched - uvicorn counts it as completed (needed for
+max_requests worker recycling) and sees client disconnects directly.
 """
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from contextvars import ContextVar
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import uuid
 
+from app.core.config import settings
+from app.core.tracing import tracer, extract_trace_context, mark_error, SpanKind, Status, StatusCode
+from app.db.instrumentation import track_queries
+
+# Current request ID, readable anywhere below the middleware (logs, DB hooks, AI Core calls)
+request_id_var: ContextVar[str] = ContextVar("request_id", default=None)
+
 
-class RequestIDMiddleware(BaseHTTPMiddleware):
+class RequestIDMiddleware:
     """
     Add unique request ID to each request
     Useful for tracing and debugging
     """
-    
-    async def dispatch(self, request: Request, call_next):
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
         # Generate request ID
         request_id = str(uuid.uuid4())
-        
-        # Add to request state
-        request.state.request_id = request_id
-        
-        # Process request
-        response = await call_next(request)
-        
-        # Add to response headers
-        response.headers["X-Request-ID"] = request_id
-        
-        return response
+
+        # Add to request state (request.state.request_id)
+        scope.setdefault("state", {})["request_id"] = request_id
+        request_id_var.set(request_id)
+
+        method = scope["method"]
+        status_code = 500
+
+        # Server span (continues the caller's trace if it sent traceparent)
+        with tracer.start_as_current_span(
+            method,
+            context=extract_trace_context(Headers(scope=scope)),
+            kind=SpanKind.SERVER,
+            attributes={"request.id": request_id, "http.method": method, "http.target": scope["path"]},
+            record_exception=False
+        ) as span:
+            # Process request (SQL statements are attributed to this request)
+            with track_queries(request_id) as query_stats:
+
+                async def send_with_headers(message: Message):
+                    nonlocal status_code
+                    if message["type"] == "http.response.start":
+                        status_code = message["status"]
+                        # Add to response headers
+                        headers = MutableHeaders(scope=message)
+                        headers["X-Request-ID"] = request_id
+                        if settings.query_stats_headers:
+                            headers["X-DB-Query-Count"] = str(query_stats.count)
+                            headers["X-DB-Query-Time-Ms"] = f"{query_stats.total_ms:.2f}"
+                    await send(message)
+
+                try:
+                    await self.app(scope, receive, send_with_headers)
+                except Exception as e:
+                    mark_error(span, e)
+                    raise
+
+            # Name by route template once routing has run (bounded span names)
+            route = scope.get("route")
+            if route is not None:
+                span.update_name(f"{method} {route.path}")
+                span.set_attribute("http.route", route.path)
+            span.set_attribute("http.status_code", status_code)
+            span.set_attribute("db.query_count", query_stats.count)
+            if status_code >= 500:
+                span.set_status(Status(StatusCode.ERROR))
@@ -0,0 +1,26 @@
+"""
+Message search schemas
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+from uuid import UUID
+
+
+class SearchHit(BaseModel):
+    """A single matching message"""
+    message_id: UUID
+    session_id: UUID
+    session_title: Optional[str] = None
+    role: str
+    snippet: str = Field(..., description="Matched text, HTML-escaped, hits wrapped in <mark></mark>")
+    rank: float
+    created_at: datetime
+
+
+class SearchResponse(BaseModel):
+    """Search results page"""
+    query: str
+    mode: str = Field(..., description="fulltext | trigram")
+    hits: List[SearchHit]
+    next_cursor: Optional[str] = Field(None, description="Pass as ?cursor= for the next page")
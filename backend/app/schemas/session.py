@@ -24,6 +24,7 @@ class SessionResponse(BaseModel):
     user_id: UUID
     ai_session_id: str
     title: Optional[str]
+    is_archived: bool = False
     created_at: datetime
     last_active_at: datetime
     
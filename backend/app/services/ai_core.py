@@ -2,10 +2,20 @@
 AI Core HTTP client
 Điểm DUY NHẤT gọi AI Core API
 """
+import asyncio
+import json
 import httpx
-from typing import Optional, Dict, Any
+import time
+from opentelemetry import trace
+from typing import Optional, Dict, Any, List, Callable, Awaitable
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core import metrics, deadline
+from app.core.tracing import tracer, inject_trace_headers, SpanKind, Status, StatusCode
+from app.middlewares.request_id import request_id_var
+from app.services.ai_core_pool import EndpointPool, Endpoint
+from app.services.ai_core_policy import LatencyWindow, RetryBudget, backoff
+from app.services import ai_core_codec
 
 logger = get_logger(__name__)
 
@@ -13,13 +23,40 @@ logger = get_logger(__name__)
 class AICoreClient:
     """
     Client for AI Core API
-    Handles all communication with AI Core service
+    Handles all communication with AI Core service, balanced across replicas
     """
     
-    def __init__(self, base_url: str = None, timeout: float = None):
-        self.base_url = base_url or settings.ai_core_url
+    def __init__(
+        self,
+        base_url: str = None,
+        timeout: float = None,
+        urls: List[str] = None,
+        uds: str = None,
+        encoding: str = None
+    ):
+        urls = urls or ([base_url] if base_url else settings.ai_core_urls or [settings.ai_core_url])
+        self.pool = EndpointPool(
+            urls,
+            balancing=settings.ai_core_balancing,
+            affinity=settings.ai_core_session_affinity,
+            affinity_load_factor=settings.ai_core_affinity_load_factor,
+            eject_failures=settings.ai_core_eject_failures,
+            eject_seconds=settings.ai_core_eject_seconds,
+            max_ejected_percent=settings.ai_core_max_ejected_percent,
+        )
+        self.base_url = self.pool.endpoints[0].url
         self.timeout = timeout or settings.ai_core_timeout
-        self.client = httpx.AsyncClient(timeout=self.timeout)
+        # Co-located AI Core: Unix domain socket instead of TCP (URLs only give Host + path)
+        self.uds = uds if uds is not None else settings.ai_core_uds
+        self.encoding = encoding or settings.ai_core_encoding
+        ai_core_codec.check_encoding(self.encoding)
+        self.client = self._build_client()
+        # Off until enabled; turned off for good once AI Core answers 404/405
+        self.streaming = settings.ai_core_streaming
+        self._health_task: Optional[asyncio.Task] = None
+        # Successful attempt latencies per operation -> hedge delay
+        self.latency = {"send_message": LatencyWindow(), "get_history": LatencyWindow()}
+        self.retry_budget = RetryBudget(settings.ai_core_retry_budget_ratio)
     
     async def send_message(
         self, 
@@ -37,11 +74,11 @@ class AICoreClient:
             Dict with response, session_id, and metadata
             
         Raises:
-            httpx.HTTPStatusError: If API returns error
+            httpx.HTTPStatusError: If API returns error (after retries)
             httpx.TimeoutException: If request times out
-            httpx.ConnectError: If cannot connect to AI Core
+            httpx.ConnectError: If cannot connect to AI Core (after retries)
+            DeadlineExceeded: If the request deadline ran out
         """
-        url = f"{self.base_url}/chat"
         payload = {"message": message}
         
         if ai_session_id:
@@ -49,48 +86,182 @@ class AICoreClient:
         
         logger.info(
             "calling_ai_core",
-            url=url,
+            replicas=len(self.pool.endpoints),
             has_session=bool(ai_session_id),
             message_length=len(message)
         )
         
-        try:
-            response = await self.client.post(url, json=payload)
-            response.raise_for_status()
-            data = response.json()
-            
-            logger.info(
-                "ai_core_response_received",
-                session_id=data.get("session_id"),
-                persona=data.get("metadata", {}).get("persona"),
-                response_length=len(data.get("response", ""))
-            )
-            
-            return data
-            
-        except httpx.TimeoutException as e:
-            logger.error(
-                "ai_core_timeout",
-                timeout=self.timeout,
-                error=str(e)
-            )
-            raise
-            
-        except httpx.ConnectError as e:
-            logger.error(
-                "ai_core_connection_error",
-                url=self.base_url,
-                error=str(e)
-            )
-            raise
-            
-        except httpx.HTTPStatusError as e:
-            logger.error(
-                "ai_core_http_error",
-                status_code=e.response.status_code,
-                error=e.response.text
-            )
-            raise
+        with tracer.start_as_current_span(
+            "ai_core.send_message",
+            kind=SpanKind.CLIENT,
+            attributes={"http.method": "POST", "http.route": "/chat", "ai.session_id": ai_session_id or ""}
+        ):
+            start = time.perf_counter()
+            try:
+                response = await self._call("send_message", "POST", "/chat", ai_session_id, json=payload)
+                data = ai_core_codec.decode(response)
+                self._observe("send_message", start, "ok")
+                
+                logger.info(
+                    "ai_core_response_received",
+                    session_id=data.get("session_id"),
+                    persona=data.get("metadata", {}).get("persona"),
+                    response_length=len(data.get("response", ""))
+                )
+                
+                return data
+                
+            except asyncio.CancelledError:
+                # Caller cancelled (client gone) - httpx closes the connection
+                self._observe("send_message", start, "cancelled")
+                logger.info("ai_core_request_cancelled", elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+                raise
+                
+            except deadline.DeadlineExceeded:
+                self._observe("send_message", start, "timeout")
+                logger.error("ai_core_deadline_exceeded", elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+                raise
+                
+            except httpx.TimeoutException as e:
+                self._observe("send_message", start, "timeout")
+                logger.error(
+                    "ai_core_timeout",
+                    timeout=self.timeout,
+                    error=str(e)
+                )
+                raise
+                
+            except httpx.ConnectError as e:
+                self._observe("send_message", start, "connect_error")
+                logger.error(
+                    "ai_core_connection_error",
+                    url=str(e.request.url),
+                    error=str(e)
+                )
+                raise
+                
+            except httpx.HTTPStatusError as e:
+                self._observe("send_message", start, "http_error")
+                logger.error(
+                    "ai_core_http_error",
+                    status_code=e.response.status_code,
+                    error=e.response.text
+                )
+                raise
+                
+            except httpx.HTTPError as e:
+                self._observe("send_message", start, "error")
+                logger.error(
+                    "ai_core_request_error",
+                    error=str(e)
+                )
+                raise
+    
+    async def stream_message(
+        self,
+        message: str,
+        ai_session_id: Optional[str],
+        on_token: Callable[[str], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """
+        Send message to AI Core /chat/stream, passing tokens to on_token as they arrive
+        
+        /chat/stream is an optional AI Core extension (AI_CORE_STREAMING). Without
+        it - or once AI Core answers 404/405 - this falls back to send_message and
+        passes the whole reply to on_token as a single token.
+        Streams are not retried or hedged (tokens may already be delivered).
+        
+        Returns:
+            Same shape as send_message: response (all tokens), session_id, metadata
+        """
+        if not self.streaming:
+            return await self._send_as_stream(message, ai_session_id, on_token)
+        
+        payload = {"message": message}
+        if ai_session_id:
+            payload["session_id"] = ai_session_id
+        endpoint = self.pool.choose(ai_session_id)
+        
+        with tracer.start_as_current_span(
+            "ai_core.stream_message",
+            kind=SpanKind.CLIENT,
+            attributes={"http.method": "POST", "http.route": "/chat/stream", "ai.session_id": ai_session_id or ""}
+        ):
+            deadline.check("ai_core")
+            timeout, deadline_bound = deadline.bounded_timeout(self.timeout)
+            self.pool.acquire(endpoint)
+            ok = None
+            start = time.perf_counter()
+            tokens = []
+            final = {}
+            unsupported = False
+            try:
+                async with self.client.stream(
+                    "POST", f"{endpoint.url}/chat/stream", json=payload, headers=self._headers(), timeout=timeout
+                ) as response:
+                    ok = response.status_code < 500
+                    if response.is_error:
+                        await response.aread()
+                    unsupported = response.status_code in (404, 405)
+                    if not unsupported:
+                        response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        event = json.loads(line[5:])
+                        if "token" in event:
+                            tokens.append(event["token"])
+                            await on_token(event["token"])
+                        elif event.get("done"):
+                            final = event
+                if not unsupported:
+                    self._observe("stream_message", start, "ok")
+                
+            except asyncio.CancelledError:
+                self._observe("stream_message", start, "cancelled")
+                logger.info("ai_core_request_cancelled", elapsed_ms=round((time.perf_counter() - start) * 1000, 2))
+                raise
+                
+            except httpx.TimeoutException as e:
+                self._observe("stream_message", start, "timeout")
+                logger.error("ai_core_timeout", timeout=timeout, error=str(e))
+                if deadline_bound:
+                    raise deadline.DeadlineExceeded("ai_core") from e
+                ok = False
+                raise
+                
+            except Exception as e:
+                self._observe("stream_message", start, self._outcome(e))
+                if isinstance(e, httpx.TransportError):
+                    ok = False
+                logger.error("ai_core_stream_error", endpoint=endpoint.url, error=str(e))
+                raise
+                
+            finally:
+                self.pool.release(endpoint, ok)
+        
+        if unsupported:
+            self.streaming = False
+            logger.warning("ai_core_streaming_unsupported", endpoint=endpoint.url, status=response.status_code)
+            return await self._send_as_stream(message, ai_session_id, on_token)
+        
+        return {
+            "response": "".join(tokens),
+            "session_id": final.get("session_id"),
+            "metadata": final.get("metadata", {})
+        }
+    
+    async def _send_as_stream(
+        self,
+        message: str,
+        ai_session_id: Optional[str],
+        on_token: Callable[[str], Awaitable[None]]
+    ) -> Dict[str, Any]:
+        """Non-streaming AI Core: send_message, then the whole reply as one token"""
+        ai_response = await self.send_message(message, ai_session_id)
+        if ai_response.get("response"):
+            await on_token(ai_response["response"])
+        return ai_response
     
     async def get_history(self, ai_session_id: str, limit: int = 20) -> Dict[str, Any]:
         """
@@ -103,24 +274,291 @@ class AICoreClient:
         Returns:
             Dict with session_id and messages
         """
-        url = f"{self.base_url}/chat/history/{ai_session_id}"
         params = {"limit": limit}
         
+        with tracer.start_as_current_span(
+            "ai_core.get_history",
+            kind=SpanKind.CLIENT,
+            attributes={"http.method": "GET", "http.route": "/chat/history/{session_id}", "ai.session_id": ai_session_id}
+        ):
+            start = time.perf_counter()
+            try:
+                response = await self._call(
+                    "get_history", "GET", f"/chat/history/{ai_session_id}", ai_session_id, params=params
+                )
+                data = ai_core_codec.decode(response)
+                self._observe("get_history", start, "ok")
+                return data
+                
+            except Exception as e:
+                self._observe("get_history", start, self._outcome(e))
+                logger.error(
+                    "ai_core_history_error",
+                    session_id=ai_session_id,
+                    error=str(e)
+                )
+                raise
+    
+    async def _call(
+        self,
+        operation: str,
+        method: str,
+        path: str,
+        affinity_key: Optional[str],
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Successful response from some replica
+        
+        Connect errors and 5xx are retried on another replica (when there is
+        one) after a jittered backoff, within AI_CORE_MAX_RETRIES, the retry
+        budget and the request deadline.
+        """
+        self.retry_budget.record_call()
+        tried = []
+        for attempt in range(settings.ai_core_max_retries + 1):
+            endpoint = self.pool.choose(affinity_key, exclude=tried)
+            tried.append(endpoint)
+            try:
+                if settings.ai_core_hedging_enabled:
+                    return await self._hedged(operation, endpoint, tried, method, path, affinity_key, **kwargs)
+                return await self._request(operation, endpoint, method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.HTTPStatusError) as e:
+                reason = self._retry_reason(e)
+                if reason is None or attempt == settings.ai_core_max_retries:
+                    raise
+                delay = backoff(
+                    attempt,
+                    settings.ai_core_retry_backoff_ms / 1000,
+                    settings.ai_core_retry_backoff_max_ms / 1000
+                )
+                left = deadline.remaining()
+                if left is not None and left <= delay:
+                    raise
+                if not self.retry_budget.withdraw():
+                    metrics.ai_core_retry_budget_exhausted_total.labels(operation=operation).inc()
+                    logger.warning("ai_core_retry_budget_exhausted", operation=operation, reason=reason)
+                    raise
+                metrics.ai_core_retries_total.labels(operation=operation, reason=reason).inc()
+                logger.warning(
+                    "ai_core_retry",
+                    operation=operation,
+                    attempt=attempt + 1,
+                    reason=reason,
+                    endpoint=endpoint.url,
+                    backoff_ms=round(delay * 1000, 1)
+                )
+                await asyncio.sleep(delay)
+    
+    async def _hedged(
+        self,
+        operation: str,
+        endpoint: Endpoint,
+        tried: List[Endpoint],
+        method: str,
+        path: str,
+        affinity_key: Optional[str],
+        **kwargs
+    ) -> httpx.Response:
+        """
+        Call endpoint; if it hasn't answered after the hedge delay (recent
+        AI_CORE_HEDGE_PERCENTILE latency), send the same call to another
+        replica and take whichever succeeds first
+        """
+        primary = asyncio.ensure_future(self._request(operation, endpoint, method, path, **kwargs))
+        pending = {primary}
         try:
-            response = await self.client.get(url, params=params)
-            response.raise_for_status()
-            return response.json()
+            delay = self._hedge_delay(operation)
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done:
+                    hedge_endpoint = self.pool.choose(affinity_key, exclude=tried)
+                    if hedge_endpoint not in tried and self.retry_budget.withdraw():
+                        tried.append(hedge_endpoint)
+                        metrics.ai_core_hedges_total.labels(operation=operation).inc()
+                        logger.info(
+                            "ai_core_hedge_sent",
+                            operation=operation,
+                            delay_ms=round(delay * 1000, 1),
+                            endpoint=hedge_endpoint.url
+                        )
+                        pending.add(asyncio.ensure_future(
+                            self._request(operation, hedge_endpoint, method, path, **kwargs)
+                        ))
             
-        except Exception as e:
-            logger.error(
-                "ai_core_history_error",
-                session_id=ai_session_id,
-                error=str(e)
-            )
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            metrics.ai_core_hedge_wins_total.labels(operation=operation).inc()
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            # Loser (or everything, if we were cancelled) - httpx closes the connection
+            for task in pending:
+                task.cancel()
+    
+    def _hedge_delay(self, operation: str) -> Optional[float]:
+        """Seconds to wait before hedging (None = not enough latency samples yet)"""
+        observed = self.latency[operation].percentile(settings.ai_core_hedge_percentile)
+        if observed is None:
+            return None
+        return max(observed, settings.ai_core_hedge_min_delay_ms / 1000)
+    
+    async def _request(
+        self,
+        operation: str,
+        endpoint: Endpoint,
+        method: str,
+        path: str,
+        **kwargs
+    ) -> httpx.Response:
+        """One attempt on a replica, tracked for balancing and passive health checks"""
+        # Never wait past the request deadline
+        deadline.check("ai_core")
+        timeout, deadline_bound = deadline.bounded_timeout(self.timeout)
+        payload = kwargs.pop("json", None)
+        self.pool.acquire(endpoint)
+        ok = None
+        start = time.perf_counter()
+        try:
+            use_msgpack = self.encoding == "msgpack" and endpoint.accepts_msgpack
+            response = await self._send(endpoint, method, path, payload, use_msgpack, timeout, **kwargs)
+            if response.status_code == 415 and use_msgpack:
+                # Replica stopped understanding msgpack bodies (e.g. redeployed) - back to JSON
+                endpoint.accepts_msgpack = False
+                response = await self._send(endpoint, method, path, payload, False, timeout, **kwargs)
+            if self.encoding == "msgpack" and response.is_success:
+                endpoint.accepts_msgpack = ai_core_codec.is_msgpack(response)
+            ok = response.status_code < 500
+            response.raise_for_status()
+            self.latency[operation].add(time.perf_counter() - start)
+            return response
+        except httpx.TimeoutException as e:
+            if deadline_bound:
+                # Cut short by the request deadline - says nothing about the replica
+                raise deadline.DeadlineExceeded("ai_core") from e
+            ok = False
+            raise
+        except httpx.TransportError:
+            ok = False
             raise
+        finally:
+            self.pool.release(endpoint, ok)
+    
+    async def _send(
+        self,
+        endpoint: Endpoint,
+        method: str,
+        path: str,
+        payload: Any,
+        use_msgpack: bool,
+        timeout: float,
+        **kwargs
+    ) -> httpx.Response:
+        headers = self._headers()
+        headers["Accept"] = ai_core_codec.accept_header(self.encoding)
+        if payload is not None:
+            kwargs["content"], headers["Content-Type"] = ai_core_codec.encode(payload, use_msgpack)
+        return await self.client.request(
+            method, f"{endpoint.url}{path}", headers=headers, timeout=timeout, **kwargs
+        )
+    
+    @staticmethod
+    def _retry_reason(error: Exception) -> Optional[str]:
+        """Why a failed attempt may be retried (None = it may not)"""
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return "connect_error"  # never reached AI Core
+        if isinstance(error, httpx.HTTPStatusError) and error.response.status_code >= 500:
+            return "http_5xx"
+        return None
+    
+    async def check_health(self) -> None:
+        """Active health check of every replica"""
+        async def probe(endpoint: Endpoint) -> None:
+            try:
+                response = await self.client.get(
+                    f"{endpoint.url}{settings.ai_core_health_check_path}", timeout=5.0
+                )
+                healthy = response.status_code < 400
+            except httpx.HTTPError:
+                healthy = False
+            self.pool.set_healthy(endpoint, healthy)
+        
+        await asyncio.gather(*(probe(endpoint) for endpoint in self.pool.endpoints))
+    
+    async def _health_loop(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(settings.ai_core_health_check_interval)
+    
+    def start(self) -> None:
+        """Start active health checks (call from the running event loop, e.g. lifespan)"""
+        if (
+            len(self.pool.endpoints) > 1
+            and settings.ai_core_health_check_interval > 0
+            and self._health_task is None
+        ):
+            self._health_task = asyncio.create_task(self._health_loop())
+    
+    @staticmethod
+    def _headers() -> Dict[str, str]:
+        """Correlation headers: X-Request-ID + W3C traceparent + remaining deadline"""
+        headers = deadline.deadline_headers()
+        request_id = request_id_var.get()
+        if request_id:
+            headers["X-Request-ID"] = request_id
+        return inject_trace_headers(headers)
+    
+    @staticmethod
+    def _outcome(error: Exception) -> str:
+        """Metric outcome label for a failed call"""
+        if isinstance(error, (httpx.TimeoutException, deadline.DeadlineExceeded)):
+            return "timeout"
+        if isinstance(error, httpx.ConnectError):
+            return "connect_error"
+        if isinstance(error, httpx.HTTPStatusError):
+            return "http_error"
+        return "error"
+    
+    @staticmethod
+    def _observe(operation: str, start: float, outcome: str) -> None:
+        """Record call latency + error/timeout counters"""
+        metrics.ai_core_request_duration_seconds.labels(
+            operation=operation, outcome=outcome
+        ).observe(time.perf_counter() - start)
+        if outcome == "cancelled":
+            metrics.ai_core_cancellations_total.labels(operation=operation).inc()
+            return
+        if outcome == "timeout":
+            metrics.ai_core_timeouts_total.labels(operation=operation).inc()
+        if outcome != "ok":
+            metrics.ai_core_errors_total.labels(operation=operation, kind=outcome).inc()
+            trace.get_current_span().set_status(Status(StatusCode.ERROR, outcome))
+    
+    def reset(self):
+        """
+        Fresh connection pool - call in each worker after fork so
+        workers never share sockets created in the master
+        """
+        self.client = self._build_client()
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        transport = httpx.AsyncHTTPTransport(uds=self.uds) if self.uds else None
+        return httpx.AsyncClient(timeout=self.timeout, transport=transport)
     
     async def close(self):
-        """Close HTTP client"""
+        """Stop health checks and close HTTP client"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
         await self.client.aclose()
 
 
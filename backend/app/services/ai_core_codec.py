@@ -0,0 +1,54 @@
+"""
+AI Core body encoding - JSON, or msgpack negotiated by content type
+
+With AI_CORE_ENCODING=msgpack every call offers
+`Accept: application/msgpack, application/json`. A replica that answers in
+msgpack has shown it understands it, so later request bodies to it are sent
+as msgpack too; replicas that keep answering JSON keep getting JSON.
+msgpack is optional - only needed when enabled.
+"""
+import json
+from typing import Any, Tuple
+
+import httpx
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError as e:
+        raise RuntimeError("AI_CORE_ENCODING=msgpack requires the msgpack package") from e
+    return msgpack
+
+
+def check_encoding(encoding: str) -> None:
+    """Fail at startup on a bad AI_CORE_ENCODING / missing msgpack"""
+    if encoding not in ("json", "msgpack"):
+        raise ValueError(f"Unknown AI_CORE_ENCODING: {encoding}")
+    if encoding == "msgpack":
+        _msgpack()
+
+
+def accept_header(encoding: str) -> str:
+    return f"{MSGPACK}, {JSON}" if encoding == "msgpack" else JSON
+
+
+def encode(payload: Any, use_msgpack: bool) -> Tuple[bytes, str]:
+    """Request body + its Content-Type"""
+    if use_msgpack:
+        return _msgpack().packb(payload), MSGPACK
+    return json.dumps(payload, separators=(",", ":")).encode(), JSON
+
+
+def is_msgpack(response: httpx.Response) -> bool:
+    return response.headers.get("content-type", "").startswith(MSGPACK)
+
+
+def decode(response: httpx.Response) -> Any:
+    """Response body by its Content-Type"""
+    if is_msgpack(response):
+        return _msgpack().unpackb(response.content)
+    return response.json()
@@ -0,0 +1,79 @@
+"""
+AI Core retry / hedging policy
+
+- LatencyWindow: recent successful call latencies per operation -> the
+  hedge delay (AI_CORE_HEDGE_PERCENTILE of the window)
+- RetryBudget: retries + hedges may add at most AI_CORE_RETRY_BUDGET_RATIO x
+  the calls of the last BUDGET_WINDOW seconds (1.0 = load at most doubles),
+  so a failing AI Core is not hammered with retries
+- backoff: exponential with full jitter
+"""
+import math
+import random
+import time
+from collections import deque
+from typing import Deque, Optional
+
+
+class LatencyWindow:
+    """Sliding window of the last `size` latencies (seconds)"""
+
+    def __init__(self, size: int = 500, min_samples: int = 20):
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._cached: Optional[float] = None
+        self._cached_percentile: Optional[float] = None
+        self._added_since_cache = 0
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._added_since_cache += 1
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """None until min_samples latencies are known (re-sorted every 20 samples)"""
+        if len(self.samples) < self.min_samples:
+            return None
+        if self._cached_percentile != percentile or self._added_since_cache >= 20:
+            ordered = sorted(self.samples)
+            index = min(len(ordered) - 1, math.ceil(percentile / 100 * len(ordered)) - 1)
+            self._cached = ordered[max(index, 0)]
+            self._cached_percentile = percentile
+            self._added_since_cache = 0
+        return self._cached
+
+
+class RetryBudget:
+    """Extra attempts (retries, hedges) allowed as a fraction of recent calls"""
+
+    # Seconds of history the ratio applies to
+    BUDGET_WINDOW = 10.0
+
+    def __init__(self, ratio: float):
+        self.ratio = ratio
+        self.calls: Deque[float] = deque()
+        self.extra: Deque[float] = deque()
+
+    def record_call(self) -> None:
+        now = time.monotonic()
+        self.calls.append(now)
+        self._expire(now)
+
+    def withdraw(self) -> bool:
+        """Take one extra attempt if the budget allows it"""
+        now = time.monotonic()
+        self._expire(now)
+        if len(self.extra) + 1 > self.ratio * len(self.calls):
+            return False
+        self.extra.append(now)
+        return True
+
+    def _expire(self, now: float) -> None:
+        horizon = now - self.BUDGET_WINDOW
+        for window in (self.calls, self.extra):
+            while window and window[0] < horizon:
+                window.popleft()
+
+
+def backoff(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,200 @@
+"""
+AI Core replicas - client-side load balancing
+
+Picking a replica for a call:
+- session affinity: ai_session_id is consistent-hashed onto a ring of replicas
+  (AI Core keeps per-session memory). The session stays on its replica unless
+  that replica is unavailable or taking this call would put it above
+  ceil(AI_CORE_AFFINITY_LOAD_FACTOR x average in-flight calls, this one
+  included) (consistent hashing with bounded loads); it then
+  moves to the next replica on the ring, so adding/removing a replica only
+  remaps that replica's sessions.
+- otherwise: least outstanding requests, or power of two choices (two random
+  replicas, fewer in-flight wins).
+
+Health:
+- passive: AI_CORE_EJECT_FAILURES consecutive connect errors / timeouts / 5xx
+  eject a replica for AI_CORE_EJECT_SECONDS x consecutive ejections; at most
+  AI_CORE_MAX_EJECTED_PERCENT of replicas are ejected at once
+- active: GET AI_CORE_HEALTH_CHECK_PATH on every replica each
+  AI_CORE_HEALTH_CHECK_INTERVAL seconds (multi-replica only)
+If no replica is available, all of them are tried (better than failing outright).
+"""
+import bisect
+import hashlib
+import math
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+from app.core.logging import get_logger
+from app.core import metrics
+
+logger = get_logger(__name__)
+
+LEAST_OUTSTANDING, POWER_OF_TWO = "least_outstanding", "p2c"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+
+class Endpoint:
+    """One AI Core replica and its per-worker state"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True  # last active health check
+        self.consecutive_failures = 0
+        self.ejections = 0  # consecutive ejections -> longer ejection time
+        self.ejected_until = 0.0
+        self.accepts_msgpack = False  # answered a msgpack Accept in msgpack (AI_CORE_ENCODING=msgpack)
+
+    @property
+    def ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and not self.ejected
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "ejected_for_s": round(max(0.0, self.ejected_until - time.monotonic()), 1),
+            "outstanding": self.outstanding,
+            "consecutive_failures": self.consecutive_failures,
+        }
+
+
+class EndpointPool:
+    """Chooses a replica per call and tracks in-flight calls + health"""
+
+    # Points per replica on the hash ring
+    VIRTUAL_NODES = 100
+
+    def __init__(
+        self,
+        urls: List[str],
+        balancing: str = LEAST_OUTSTANDING,
+        affinity: bool = True,
+        affinity_load_factor: float = 1.25,
+        eject_failures: int = 5,
+        eject_seconds: float = 30.0,
+        max_ejected_percent: int = 50,
+    ):
+        if not urls:
+            raise ValueError("At least one AI Core URL is required")
+        if balancing not in (LEAST_OUTSTANDING, POWER_OF_TWO):
+            raise ValueError(f"Unknown AI_CORE_BALANCING: {balancing}")
+        self.endpoints = [Endpoint(url) for url in dict.fromkeys(urls)]
+        self.balancing = balancing
+        self.affinity = affinity
+        self.affinity_load_factor = affinity_load_factor
+        self.eject_failures = eject_failures
+        self.eject_seconds = eject_seconds
+        self.max_ejected_percent = max_ejected_percent
+
+        ring = sorted(
+            (_hash(f"{endpoint.url}#{i}"), index)
+            for index, endpoint in enumerate(self.endpoints)
+            for i in range(self.VIRTUAL_NODES)
+        )
+        self._ring_hashes = [point for point, _ in ring]
+        self._ring_endpoints = [self.endpoints[index] for _, index in ring]
+
+    def choose(self, affinity_key: Optional[str] = None, exclude: Iterable[Endpoint] = ()) -> Endpoint:
+        """Replica for the next call (exclude: replicas already tried for it)"""
+        exclude = set(exclude)
+        candidates = [e for e in self.endpoints if e.available and e not in exclude]
+        if not candidates:
+            candidates = [e for e in self.endpoints if e not in exclude] or self.endpoints
+            logger.warning("ai_core_no_available_endpoint", trying=len(candidates))
+
+        if len(candidates) == 1:
+            return candidates[0]
+        if self.affinity and affinity_key:
+            endpoint = self._affinity_choice(affinity_key, candidates)
+            if endpoint is not None:
+                return endpoint
+        if self.balancing == POWER_OF_TWO:
+            first, second = random.sample(candidates, 2)
+            return first if first.outstanding <= second.outstanding else second
+        fewest = min(e.outstanding for e in candidates)
+        return random.choice([e for e in candidates if e.outstanding == fewest])
+
+    def _affinity_choice(self, key: str, candidates: List[Endpoint]) -> Optional[Endpoint]:
+        """First candidate clockwise from hash(key) that is not overloaded
+
+        The bound is rounded up so an idle pool (bound 1) always keeps the
+        session on its home replica.
+        """
+        total = sum(e.outstanding for e in candidates)
+        bound = math.ceil(self.affinity_load_factor * (total + 1) / len(candidates))
+        allowed = set(candidates)
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        seen = set()
+        for i in range(len(self._ring_endpoints)):
+            endpoint = self._ring_endpoints[(start + i) % len(self._ring_endpoints)]
+            if endpoint in seen:
+                continue
+            seen.add(endpoint)
+            if endpoint in allowed and endpoint.outstanding + 1 <= bound:
+                return endpoint
+            if len(seen) == len(self.endpoints):
+                break
+        return None
+
+    def acquire(self, endpoint: Endpoint) -> None:
+        endpoint.outstanding += 1
+        metrics.ai_core_endpoint_in_flight.labels(endpoint=endpoint.url).inc()
+
+    def release(self, endpoint: Endpoint, ok: Optional[bool]) -> None:
+        """End a call - ok=None when it says nothing about the replica (cancelled)"""
+        endpoint.outstanding -= 1
+        metrics.ai_core_endpoint_in_flight.labels(endpoint=endpoint.url).dec()
+        if ok is None:
+            return
+        if ok:
+            endpoint.consecutive_failures = 0
+            endpoint.ejections = 0
+            return
+
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.eject_failures and not endpoint.ejected:
+            self._eject(endpoint)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        ejected = sum(1 for e in self.endpoints if e.ejected)
+        if (ejected + 1) * 100 > self.max_ejected_percent * len(self.endpoints):
+            logger.warning("ai_core_ejection_skipped", endpoint=endpoint.url, ejected=ejected)
+            return
+        endpoint.ejections += 1
+        duration = self.eject_seconds * endpoint.ejections
+        endpoint.ejected_until = time.monotonic() + duration
+        metrics.ai_core_ejections_total.labels(endpoint=endpoint.url).inc()
+        logger.warning(
+            "ai_core_endpoint_ejected",
+            endpoint=endpoint.url,
+            consecutive_failures=endpoint.consecutive_failures,
+            seconds=duration
+        )
+
+    def set_healthy(self, endpoint: Endpoint, healthy: bool) -> None:
+        """Result of an active health check"""
+        if healthy != endpoint.healthy:
+            logger.warning("ai_core_endpoint_health_changed", endpoint=endpoint.url, healthy=healthy)
+        endpoint.healthy = healthy
+        metrics.ai_core_endpoint_healthy.labels(endpoint=endpoint.url).set(1 if healthy else 0)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Replica states for the health endpoint"""
+        return {
+            "balancing": self.balancing,
+            "affinity": self.affinity,
+            "available": sum(1 for e in self.endpoints if e.available),
+            "endpoints": [e.snapshot() for e in self.endpoints],
+        }
@@ -0,0 +1,94 @@
+"""
+Archive service - cold storage for inactive sessions
+
+Sessions idle for ARCHIVE_IDLE_DAYS have their messages/events moved into
+session_archives, keeping the hot tables and their indexes small. Opening an
+archived session rehydrates it on demand.
+
+Run the archival job manually / from cron:
+    python -m app.services.archive_service
+"""
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+from app.db import crud, models
+from app.db.replica import use_primary
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ArchiveService:
+    """Session archival service"""
+
+    def archive_idle_sessions(
+        self,
+        db: Session,
+        idle_days: int = None,
+        batch_size: int = None
+    ) -> int:
+        """
+        Archive up to batch_size sessions idle for idle_days
+        Each session is moved in its own transaction
+
+        Args:
+            db: Database session
+            idle_days: Idle threshold (default settings.archive_idle_days)
+            batch_size: Max sessions per run (default settings.archive_batch_size)
+
+        Returns:
+            Number of sessions archived
+        """
+        idle_days = idle_days or settings.archive_idle_days
+        batch_size = batch_size or settings.archive_batch_size
+        cutoff = datetime.utcnow() - timedelta(days=idle_days)
+
+        archived = 0
+        for session_id in crud.list_idle_session_ids(db, cutoff, batch_size):
+            try:
+                message_count = crud.archive_session(db, session_id)
+            except Exception as e:
+                db.rollback()
+                logger.error("session_archive_error", session_id=str(session_id), error=str(e))
+                continue
+
+            if message_count is not None:
+                archived += 1
+                logger.info("session_archived", session_id=str(session_id), message_count=message_count)
+
+        logger.info("archive_run_complete", archived=archived, idle_days=idle_days)
+        return archived
+
+    def ensure_active(self, db: Session, db_session: models.ChatSession) -> None:
+        """
+        Rehydrate an archived session before its messages are read or written
+
+        Args:
+            db: Database session
+            db_session: Session about to be opened
+        """
+        if not db_session.is_archived:
+            return
+
+        # Read-only routes may hold a replica session - restore on the primary
+        use_primary(db)
+        session_id = db_session.id
+        restored = crud.restore_session(db, session_id)
+        logger.info("session_restored", session_id=str(session_id), had_archive=restored)
+
+
+# Global service instance
+archive_service = ArchiveService()
+
+
+if __name__ == "__main__":
+    from app.core.logging import setup_logging
+    from app.db.base import SessionLocal
+
+    setup_logging()
+    db = SessionLocal()
+    try:
+        archive_service.archive_idle_sessions(db)
+    finally:
+        db.close()
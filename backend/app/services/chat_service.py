@@ -1,16 +1,26 @@
 """
 Chat service - xử lý logic chat
 """
+import asyncio
+import time
+from datetime import datetime
 from sqlalchemy.orm import Session
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Awaitable, Callable, Optional, Tuple
 from uuid import UUID, uuid4
 
 from app.services.ai_core import ai_core_client
-from app.db import crud
+from app.services.archive_service import archive_service
+from app.db import crud, models
 from app.schemas.chat import ChatResponse, MessageCreate, MessageResponse, HistoryResponse
+from app.schemas.session import SessionCreate
 from app.schemas.common import MetadataSchema, ContextSchema, UsageSchema
 from app.core.config import settings
 from app.core.logging import get_logger
+from app.core import metrics, deadline
+from app.core.cache import invalidate_user
+from app.core.deadline import DeadlineExceeded
+from app.core.rate_limit import ai_core_scheduler, RateLimitExceeded
 
 logger = get_logger(__name__)
 
@@ -18,7 +28,7 @@ logger = get_logger(__name__)
 class ChatService:
     """
     Chat processing service
-    Orchestrates: get/create session → call AI Core → save to DB
+    Orchestrates: get session → call AI Core (user turn saved meanwhile) → save reply
     """
     
     async def process_message(
@@ -26,23 +36,33 @@ class ChatService:
         db: Session,
         user_id: UUID,
         message: str,
-        session_id: Optional[str] = None
+        session_id: Optional[str] = None,
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> ChatResponse:
         """
         Process a chat message
         
         Steps:
-        1. Get or create session
-        2. Call AI Core
-        3. Save user message to DB
-        4. Save assistant response to DB
-        5. Return response with metadata
+        1. Get session, or pre-assign the AI session ID for a new one
+        2. Wait for an AI Core slot, then call AI Core - meanwhile, create the
+           session + save the user message (threadpool, overlapping generation)
+        3. Save assistant response to DB (the only write after generation)
+        4. Return response with metadata
+        
+        Nothing is written before the fair queue admits the turn (a rejected or
+        timed-out turn leaves no trace); if AI Core fails, the user-turn writes
+        are undone (nothing persisted).
+        If the caller is cancelled (client disconnect) during generation, the AI
+        Core request is cancelled and CHAT_DISCONNECT_POLICY decides the turn.
+        The request deadline bounds the queue wait, the AI Core call and the DB
+        statements; undoing or finishing the turn runs without it.
         
         Args:
             db: Database session
             user_id: User ID
             message: User message
             session_id: Optional session ID
+            on_token: Stream the reply - called with each token as AI Core produces it
             
         Returns:
             ChatResponse with AI response and metadata
@@ -54,43 +74,203 @@ class ChatService:
             message_length=len(message)
         )
         
-        # 1. Get or create session
+        # 1. Get session (new sessions: AI Core adopts our ID, so the row needn't wait for it)
         if session_id:
             db_session = crud.get_session(db, UUID(session_id))
             if not db_session:
                 logger.warning("session_not_found", session_id=session_id)
                 raise ValueError(f"Session {session_id} not found")
+            archive_service.ensure_active(db, db_session)
             ai_session_id = db_session.ai_session_id
         else:
-            # Create new session
-            ai_session_id = None  # AI Core will create new session
+            ai_session_id = str(uuid4())
             db_session = None
         
-        # 2. Call AI Core
+        # 2. User-turn writes overlap the AI Core call (db is not touched on the loop meanwhile)
+        user_turn: Optional[asyncio.Future] = None
+        started = time.perf_counter()
         try:
-            ai_response = await ai_core_client.send_message(message, ai_session_id)
+            # Per-user in-flight cap + fair queue (raises RateLimitExceeded)
+            async with ai_core_scheduler.slot(str(user_id)):
+                # Admitted - only now write, so queue rejections cost no DB work
+                user_turn = asyncio.ensure_future(
+                    run_in_threadpool(self.save_user_turn, db, user_id, db_session, ai_session_id, message)
+                )
+                if on_token is None:
+                    ai_response = await ai_core_client.send_message(message, ai_session_id)
+                else:
+                    ai_response = await ai_core_client.stream_message(message, ai_session_id, on_token)
+        except asyncio.CancelledError:
+            # Client went away - the AI Core request is already cancelled
+            with deadline.no_deadline():
+                await self.cancel_user_turn(db, user_id, user_turn, started)
+            raise
         except Exception as e:
-            logger.error("ai_core_call_failed", error=str(e))
+            with deadline.no_deadline():
+                await self.discard_user_turn(db, user_turn)
+            if isinstance(e, DeadlineExceeded):
+                logger.warning("chat_deadline_exceeded", stage=e.stage)
+                metrics.chat_messages_total.labels(outcome="deadline_exceeded").inc()
+            elif not isinstance(e, RateLimitExceeded):
+                logger.error("ai_core_call_failed", error=str(e))
+                metrics.chat_messages_total.labels(outcome="ai_core_error").inc()
             raise
         
-        # 3. Create session in DB if new
-        if not db_session:
-            from app.schemas.session import SessionCreate
+        # 3. Save assistant response - the generation is paid for, so finish
+        # recording the turn even if the client disconnects or the deadline passes now
+        with deadline.no_deadline():
+            reply = asyncio.ensure_future(self.save_assistant_turn(db, user_id, user_turn, ai_session_id, ai_response))
+        try:
+            chat_session_id = await asyncio.shield(reply)
+        except asyncio.CancelledError:
+            await reply
+            raise
+        
+        metadata = ai_response.get("metadata", {})
+        context = metadata.get("context", {})
+        logger.info(
+            "process_message_complete",
+            session_id=str(chat_session_id),
+            persona=metadata.get("persona_used") or metadata.get("persona"),
+            tone=metadata.get("tone"),
+            behavior=metadata.get("behavior"),
+            signal_strength=context.get("signal_strength") or metadata.get("signal_strength"),
+            confidence=context.get("confidence") or metadata.get("confidence")
+        )
+        
+        # 4. Return response
+        return ChatResponse(
+            session_id=str(chat_session_id),
+            response=ai_response.get("response", ""),
+            metadata=self.build_metadata(ai_response)
+        )
+    
+    async def save_assistant_turn(
+        self,
+        db: Session,
+        user_id: UUID,
+        user_turn: asyncio.Future,
+        ai_session_id: str,
+        ai_response: dict
+    ) -> UUID:
+        """
+        Wait for the user-turn writes, then save the assistant message
+        and drop the user's cached analytics
+        
+        Returns:
+            Session ID
+        """
+        chat_session_id, _, _, _ = await user_turn
+        
+        if ai_response.get("session_id") and ai_response["session_id"] != ai_session_id:
+            # AI Core did not adopt the pre-assigned ID - follow its session
+            logger.warning(
+                "ai_session_id_replaced",
+                session_id=str(chat_session_id),
+                requested=ai_session_id,
+                returned=ai_response["session_id"]
+            )
+            await run_in_threadpool(
+                crud.update_session_ai_session_id, db, chat_session_id, ai_response["session_id"]
+            )
+        
+        assistant_msg_data = self.build_assistant_message(ai_response)
+        await run_in_threadpool(crud.create_message, db, chat_session_id, assistant_msg_data)
+        metrics.record_tokens(assistant_msg_data.prompt_tokens, assistant_msg_data.completion_tokens)
+        metrics.chat_messages_total.labels(outcome="ok").inc()
+        await invalidate_user(user_id)
+        return chat_session_id
+    
+    def save_user_turn(
+        self,
+        db: Session,
+        user_id: UUID,
+        db_session: Optional[models.ChatSession],
+        ai_session_id: str,
+        message: str
+    ) -> Tuple[UUID, UUID, datetime, bool]:
+        """
+        Create the session if new, then save the user message (sync - threadpool)
+        
+        Returns:
+            (session_id, user message ID, user message created_at, session created)
+        """
+        created = db_session is None
+        if created:
             session_data = SessionCreate(
-                ai_session_id=ai_response["session_id"],
+                ai_session_id=ai_session_id,
                 title=None  # Could auto-generate from first message
             )
             db_session = crud.create_session(db, user_id, session_data)
-            logger.info("session_created", session_id=str(db_session.id))
+            logger.info("session_created", session_id=str(db_session.id), ai_session_id=ai_session_id)
+        
+        user_msg = crud.create_message(db, db_session.id, MessageCreate(role="user", content=message))
+        result = (db_session.id, user_msg.id, user_msg.created_at, created)
         
-        # 4. Save user message
-        user_msg_data = MessageCreate(
-            role="user",
-            content=message
+        # End the transaction opened by refresh - the pooled connection goes back
+        # to the pool for the whole generation instead of idling in this request
+        db.commit()
+        return result
+    
+    async def discard_user_turn(self, db: Session, user_turn: Optional[asyncio.Future]) -> None:
+        """Undo save_user_turn after a failed AI Core call (None: never admitted, nothing to undo)"""
+        if user_turn is None:
+            return
+        try:
+            session_id, message_id, created_at, created = await user_turn
+        except Exception as e:
+            logger.error("save_user_turn_failed", error=str(e))
+            return
+        
+        if created:
+            await run_in_threadpool(crud.delete_session, db, session_id)
+        else:
+            await run_in_threadpool(crud.delete_message, db, message_id, created_at)
+        logger.info("user_turn_discarded", session_id=str(session_id), session_deleted=created)
+    
+    async def cancel_user_turn(
+        self,
+        db: Session,
+        user_id: UUID,
+        user_turn: Optional[asyncio.Future],
+        started: float
+    ) -> None:
+        """
+        Client disconnected before AI Core answered - apply CHAT_DISCONNECT_POLICY
+        
+        - drop: undo the user-turn writes, as for an AI Core failure
+        - record: keep the user message and log a turn_cancelled event
+        A turn still waiting in the fair queue has written nothing either way.
+        """
+        metrics.chat_messages_total.labels(outcome="cancelled").inc()
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        logger.info("chat_turn_cancelled", policy=settings.chat_disconnect_policy, elapsed_ms=elapsed_ms)
+        
+        if user_turn is None or settings.chat_disconnect_policy != "record":
+            await self.discard_user_turn(db, user_turn)
+            return
+        
+        try:
+            session_id, message_id, _, _ = await user_turn
+        except Exception as e:
+            logger.error("save_user_turn_failed", error=str(e))
+            return
+        await run_in_threadpool(
+            crud.create_event, db, session_id, "turn_cancelled",
+            {"message_id": str(message_id), "elapsed_ms": elapsed_ms}
         )
-        crud.create_message(db, db_session.id, user_msg_data)
+        await invalidate_user(user_id)
+    
+    def build_assistant_message(self, ai_response: dict) -> MessageCreate:
+        """
+        Map an AI Core response to the assistant message row
         
-        # 5. Save assistant response with metadata
+        Args:
+            ai_response: AI Core /chat response
+            
+        Returns:
+            MessageCreate for the assistant turn
+        """
         metadata = ai_response.get("metadata", {})
         context = metadata.get("context", {})  # Legacy nested object for backward compat
         
@@ -99,7 +279,7 @@ class ChatService:
         usage = metadata.get("usage", {})
         
         # v2.1: All fields available at top-level, fallback to context for backward compat
-        assistant_msg_data = MessageCreate(
+        return MessageCreate(
             role="assistant",
             content=ai_response.get("response", ""),
             persona=metadata.get("persona_used") or metadata.get("persona"),
@@ -114,21 +294,24 @@ class ChatService:
             prompt_tokens=usage.get("prompt_tokens"),
             completion_tokens=usage.get("completion_tokens")
         )
-        crud.create_message(db, db_session.id, assistant_msg_data)
+    
+    def build_metadata(self, ai_response: dict) -> MetadataSchema:
+        """
+        Map AI Core metadata (v2.1 flat or legacy nested) to the API schema
         
-        logger.info(
-            "process_message_complete",
-            session_id=str(db_session.id),
-            persona=metadata.get("persona_used") or metadata.get("persona"),
-            tone=metadata.get("tone"),
-            behavior=metadata.get("behavior"),
-            signal_strength=context.get("signal_strength") or metadata.get("signal_strength"),
-            confidence=context.get("confidence") or metadata.get("confidence")
-        )
+        Args:
+            ai_response: AI Core /chat response
+            
+        Returns:
+            MetadataSchema for ChatResponse
+        """
+        metadata = ai_response.get("metadata", {})
+        context = metadata.get("context", {})
+        model_name = metadata.get("model")
+        usage = metadata.get("usage", {})
         
-        # 6. Return response
         # Build metadata safely with nested objects
-        metadata_response = MetadataSchema(
+        return MetadataSchema(
             # v2.1 fields (top-level)
             persona_used=metadata.get("persona_used"),
             tone=metadata.get("tone"),
@@ -152,12 +335,6 @@ class ChatService:
             valid=metadata.get("valid", True),
             warnings=metadata.get("warnings", [])
         )
-        
-        return ChatResponse(
-            session_id=str(db_session.id),
-            response=ai_response.get("response", ""),
-            metadata=metadata_response
-        )
     
     async def get_history(
         self,
@@ -177,8 +354,9 @@ class ChatService:
         db_session = crud.get_session(db, session_id)
         if not db_session:
             raise ValueError(f"Session {session_id} not found")
+        archive_service.ensure_active(db, db_session)
         
-        messages = crud.get_session_messages(db, session_id)
+        messages = crud.get_session_messages(db, session_id, since=db_session.created_at)
         
         return HistoryResponse(
             session_id=session_id,
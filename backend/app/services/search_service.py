@@ -0,0 +1,139 @@
+"""
+Search service - full-text search over the user's message history
+"""
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+from uuid import UUID
+from datetime import datetime
+import base64
+import html
+import json
+import re
+
+from app.db import crud
+from app.schemas.search import SearchHit, SearchResponse
+from app.core.config import settings
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Characters of context kept around a trigram hit
+SNIPPET_RADIUS = 80
+
+
+class SearchService:
+    """Message search service"""
+    
+    def search(
+        self,
+        db: Session,
+        user_id: UUID,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> SearchResponse:
+        """
+        Search user's messages
+        
+        Full-text (tsvector) for normal queries, trigram for short ones.
+        A first page with no full-text hits falls back to trigram, which
+        also matches partial words ("dock" -> "Docker").
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            query: Search text
+            limit: Page size
+            cursor: Opaque cursor from a previous page
+            
+        Returns:
+            SearchResponse
+            
+        Raises:
+            ValueError: If cursor is malformed
+        """
+        query = query.strip()
+        mode = "trigram" if len(query) < settings.search_short_query_length else "fulltext"
+        after = None
+        if cursor:
+            mode, after = self._decode_cursor(cursor)
+        
+        rows = crud.search_user_messages(db, user_id, query, mode=mode, limit=limit, after=after)
+        
+        if not rows and mode == "fulltext" and after is None:
+            mode = "trigram"
+            rows = crud.search_user_messages(db, user_id, query, mode=mode, limit=limit)
+        
+        hits = [
+            SearchHit(
+                message_id=row.id,
+                session_id=row.session_id,
+                session_title=row.session_title,
+                role=row.role,
+                snippet=self._headline(row.snippet) if mode == "fulltext" else self._highlight(row.snippet, query),
+                rank=row.rank,
+                created_at=row.created_at
+            )
+            for row in rows
+        ]
+        
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = self._encode_cursor(mode, (last.rank, last.created_at, last.id))
+        
+        logger.info(
+            "search_complete",
+            user_id=str(user_id),
+            mode=mode,
+            query_length=len(query),
+            hits=len(hits)
+        )
+        
+        return SearchResponse(query=query, mode=mode, hits=hits, next_cursor=next_cursor)
+    
+    @staticmethod
+    def _headline(headline: str) -> str:
+        """Escape a ts_headline snippet, then turn its hit markers into <mark>"""
+        return html.escape(headline)\
+            .replace(crud.HIGHLIGHT_START, "<mark>")\
+            .replace(crud.HIGHLIGHT_STOP, "</mark>")
+    
+    @staticmethod
+    def _highlight(content: str, query: str) -> str:
+        """Cut a window around the first case-insensitive hit and mark it (content escaped)"""
+        match = re.search(re.escape(query), content, re.IGNORECASE)
+        if not match:
+            return html.escape(content[:2 * SNIPPET_RADIUS])
+        start = max(match.start() - SNIPPET_RADIUS, 0)
+        end = min(match.end() + SNIPPET_RADIUS, len(content))
+        return (
+            ("..." if start > 0 else "")
+            + html.escape(content[start:match.start()])
+            + "<mark>" + html.escape(match.group(0)) + "</mark>"
+            + html.escape(content[match.end():end])
+            + ("..." if end < len(content) else "")
+        )
+    
+    @staticmethod
+    def _encode_cursor(mode: str, key: Tuple[float, datetime, UUID]) -> str:
+        """Encode keyset position as an opaque URL-safe string"""
+        rank, created_at, message_id = key
+        raw = json.dumps([mode, rank, created_at.isoformat(), str(message_id)])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, Tuple[float, datetime, UUID]]:
+        """Decode cursor produced by _encode_cursor"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            mode, rank, created_at, message_id = json.loads(base64.urlsafe_b64decode(padded))
+            if mode not in ("fulltext", "trigram"):
+                raise ValueError(mode)
+            return mode, (float(rank), datetime.fromisoformat(created_at), UUID(message_id))
+        except Exception:
+            raise ValueError("Invalid cursor")
+
+
+# Global service instance
+search_service = SearchService()
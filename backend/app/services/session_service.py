@@ -79,7 +79,8 @@ class SessionService:
         self,
         db: Session,
         user_id: UUID,
-        limit: int = 20
+        limit: int = 20,
+        archived: bool = False
     ) -> SessionListResponse:
         """
         List user's sessions
@@ -88,11 +89,12 @@ class SessionService:
             db: Database session
             user_id: User ID
             limit: Max number of sessions
+            archived: List archived sessions instead of active ones
             
         Returns:
             SessionListResponse
         """
-        sessions = crud.list_user_sessions(db, user_id, limit)
+        sessions = crud.list_user_sessions(db, user_id, limit, archived)
         
         return SessionListResponse(
             sessions=[SessionResponse.model_validate(s) for s in sessions]
@@ -0,0 +1,71 @@
+"""
+Gunicorn config - production server
+
+Run (from backend/):
+    gunicorn -c gunicorn.conf.py app.main:app
+
+- Uvicorn workers (uvloop + httptools picked automatically when installed)
+- WEB_CONCURRENCY workers, default = CPU count (workers are async, one per core)
+- Workers recycled after MAX_REQUESTS (+ jitter) to bound memory growth
+- App preloaded in the master so workers share imported code copy-on-write;
+  DB pool and AI Core client are recreated in each worker after fork
+"""
+import os
+import shutil
+
+from app.core.config import settings
+
+# Prometheus multiprocess mode must be configured before the app is (pre)loaded;
+# start from an empty dir each deploy (stale worker files would skew counters)
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join("/tmp", "conversation-service-metrics"))
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+bind = f"{settings.host}:{settings.port}"
+workers = settings.web_concurrency or os.cpu_count() or 1
+worker_class = "uvicorn.workers.UvicornWorker"
+
+max_requests = settings.max_requests
+max_requests_jitter = settings.max_requests_jitter
+
+preload_app = True
+
+# Async workers heartbeat independently of request time; long AI Core calls are fine
+timeout = 60
+graceful_timeout = settings.graceful_timeout
+keepalive = 5
+
+loglevel = settings.log_level.lower()
+accesslog = "-"
+
+
+def on_starting(server):
+    """Warn about per-worker caches that several workers cannot keep consistent"""
+    shared_feed = (
+        settings.change_feed_enabled
+        and settings.change_feed_backend == "postgres"
+        and settings.database_url.startswith("postgresql")
+    )
+    if workers > 1 and settings.endpoint_cache_enabled and settings.endpoint_cache_backend == "memory" and not shared_feed:
+        server.log.warning(
+            "ENDPOINT_CACHE_BACKEND=memory with %d workers but no Postgres change feed: writes only "
+            "invalidate cached analytics in their own worker - use ENDPOINT_CACHE_BACKEND=postgres",
+            workers
+        )
+
+
+def post_fork(server, worker):
+    """Per-worker resources - never share sockets inherited from the master"""
+    from app.db.base import engine
+    from app.services.ai_core import ai_core_client
+
+    # Drop pooled connections inherited from the master without closing them
+    # (closing would tear down the parent's sockets)
+    engine.dispose(close=False)
+    ai_core_client.reset()
+
+
+def child_exit(server, worker):
+    """Remove the dead worker's live gauges (in-flight, pool) from /metrics"""
+    from app.core.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
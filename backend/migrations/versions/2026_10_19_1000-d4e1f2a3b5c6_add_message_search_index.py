@@ -0,0 +1,49 @@
+"""Add full-text search vector and trigram index to messages
+
+Revision ID: d4e1f2a3b5c6
+Revises: c8d5e3f7a2b4
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4e1f2a3b5c6'
+down_revision: Union[str, None] = 'c8d5e3f7a2b4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add generated tsvector column + GIN indexes for GET /search"""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # Generated column: Postgres keeps it in sync with content on every write
+    op.add_column('messages', sa.Column(
+        'content_tsv',
+        postgresql.TSVECTOR(),
+        sa.Computed("to_tsvector('simple', content)", persisted=True),
+        nullable=True
+    ))
+    
+    op.create_index(
+        'ix_messages_content_tsv', 'messages', ['content_tsv'],
+        unique=False, postgresql_using='gin'
+    )
+    op.create_index(
+        'ix_messages_content_trgm', 'messages', ['content'],
+        unique=False, postgresql_using='gin',
+        postgresql_ops={'content': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Remove search column and indexes"""
+    op.drop_index('ix_messages_content_trgm', table_name='messages')
+    op.drop_index('ix_messages_content_tsv', table_name='messages')
+    op.drop_column('messages', 'content_tsv')
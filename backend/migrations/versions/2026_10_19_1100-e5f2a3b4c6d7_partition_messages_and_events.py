@@ -0,0 +1,129 @@
+"""Partition messages and events by created_at month
+
+Revision ID: e5f2a3b4c6d7
+Revises: d4e1f2a3b5c6
+Create Date: 2026-10-19 11:00:00.000000
+
+Rebuilds both tables as PARTITION BY RANGE (created_at):
+1. Rename the old heap to <table>_unpartitioned
+2. Create the partitioned parent with the same columns (LIKE ... INCLUDING ALL
+   copies defaults, CHECK constraints and the generated content_tsv column)
+3. Create monthly partitions covering existing data + months ahead, and DEFAULT
+4. Copy rows, drop the old heap
+
+The copy holds an exclusive lock on the old table - run in a maintenance window.
+"""
+from typing import Sequence, Union
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+from app.db.partitions import create_partitions, month_start, add_months
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5f2a3b4c6d7'
+down_revision: Union[str, None] = 'd4e1f2a3b5c6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Indexes recreated on the partitioned parent (propagated to every partition)
+TABLE_INDEXES = {
+    'messages': [
+        "CREATE INDEX ix_messages_session_id_created_at ON messages (session_id, created_at)",
+        "CREATE INDEX ix_messages_content_tsv ON messages USING gin (content_tsv)",
+        "CREATE INDEX ix_messages_content_trgm ON messages USING gin (content gin_trgm_ops)",
+    ],
+    'events': [
+        "CREATE INDEX ix_events_session_id_created_at ON events (session_id, created_at)",
+    ],
+}
+
+# Indexes living on the old heaps (names are schema-global, so drop before recreating)
+OLD_INDEXES = {
+    'messages': ['ix_messages_content_tsv', 'ix_messages_content_trgm'],
+    'events': [],
+}
+
+
+def _copy_columns(conn, table: str) -> str:
+    """Column list for INSERT ... SELECT (generated columns can't be written)"""
+    rows = conn.execute(sa.text(
+        "SELECT column_name FROM information_schema.columns "
+        "WHERE table_name = :table AND is_generated = 'NEVER' "
+        "ORDER BY ordinal_position"
+    ), {"table": table})
+    return ", ".join(row[0] for row in rows)
+
+
+def _partition_table(conn, table: str) -> None:
+    old = f"{table}_unpartitioned"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} DROP CONSTRAINT {table}_pkey")
+    for index in OLD_INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute(f"UPDATE {old} SET created_at = now() WHERE created_at IS NULL")
+    op.execute(
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED) "
+        f"PARTITION BY RANGE (created_at)"
+    )
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN created_at SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id, created_at)")
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_session_id_fkey "
+        f"FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE"
+    )
+    for ddl in TABLE_INDEXES[table]:
+        op.execute(ddl)
+
+    # Partitions: oldest row's month .. N months ahead
+    this_month = month_start(datetime.utcnow().date())
+    oldest = conn.execute(sa.text(f"SELECT min(created_at) FROM {old}")).scalar()
+    first = month_start(oldest.date()) if oldest else this_month
+    create_partitions(conn, table, first, add_months(this_month, settings.partition_months_ahead))
+
+    columns = _copy_columns(conn, old)
+    op.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}")
+    op.execute(f"DROP TABLE {old}")
+
+
+def _unpartition_table(conn, table: str) -> None:
+    old = f"{table}_partitioned"
+
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} DROP CONSTRAINT {table}_pkey")
+    for ddl in TABLE_INDEXES[table]:
+        op.execute(f"DROP INDEX IF EXISTS {ddl.split()[2]}")
+
+    op.execute(f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)")
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY (id)")
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_session_id_fkey "
+        f"FOREIGN KEY (session_id) REFERENCES chat_sessions (id) ON DELETE CASCADE"
+    )
+    if table == 'messages':
+        op.execute("CREATE INDEX ix_messages_content_tsv ON messages USING gin (content_tsv)")
+        op.execute("CREATE INDEX ix_messages_content_trgm ON messages USING gin (content gin_trgm_ops)")
+
+    columns = _copy_columns(conn, old)
+    op.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}")
+    op.execute(f"DROP TABLE {old} CASCADE")
+
+
+def upgrade() -> None:
+    """Convert messages/events to monthly range-partitioned tables"""
+    conn = op.get_bind()
+    for table in ('messages', 'events'):
+        _partition_table(conn, table)
+
+
+def downgrade() -> None:
+    """Convert messages/events back to plain tables"""
+    conn = op.get_bind()
+    for table in ('messages', 'events'):
+        _unpartition_table(conn, table)
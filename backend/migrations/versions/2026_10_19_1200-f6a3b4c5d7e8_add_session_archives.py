@@ -0,0 +1,50 @@
+"""Add session_archives cold storage and active-session index
+
+Revision ID: f6a3b4c5d7e8
+Revises: e5f2a3b4c6d7
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6a3b4c5d7e8'
+down_revision: Union[str, None] = 'e5f2a3b4c6d7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create session_archives, backfill is_archived, index active sessions"""
+    # Sessions created before is_archived existed have NULL - treat as active
+    op.execute("UPDATE chat_sessions SET is_archived = 0 WHERE is_archived IS NULL")
+    op.alter_column('chat_sessions', 'is_archived', server_default='0')
+    
+    op.create_table(
+        'session_archives',
+        sa.Column('session_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('messages', postgresql.JSONB(), nullable=False),
+        sa.Column('events', postgresql.JSONB(), nullable=False),
+        sa.Column('message_count', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.TIMESTAMP(), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('session_id')
+    )
+    
+    # Partial index: session list only touches active rows
+    op.create_index(
+        'ix_chat_sessions_user_active', 'chat_sessions', ['user_id', 'last_active_at'],
+        unique=False, postgresql_where=sa.text('is_archived = 0')
+    )
+
+
+def downgrade() -> None:
+    """Drop session_archives (restore archived sessions first!)"""
+    op.drop_index('ix_chat_sessions_user_active', table_name='chat_sessions')
+    op.drop_table('session_archives')
+    op.alter_column('chat_sessions', 'is_archived', server_default=None)
@@ -0,0 +1,36 @@
+"""Add rate_limit_buckets for the shared rate limiter backend
+
+Revision ID: a7b4c5d6e8f9
+Revises: f6a3b4c5d7e8
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7b4c5d6e8f9'
+down_revision: Union[str, None] = 'f6a3b4c5d7e8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create UNLOGGED rate_limit_buckets (disposable state, no WAL)"""
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.Float(), nullable=False),
+        sa.Column('allowed', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+        prefixes=['UNLOGGED']
+    )
+
+
+def downgrade() -> None:
+    """Drop rate_limit_buckets"""
+    op.drop_table('rate_limit_buckets')
@@ -0,0 +1,38 @@
+"""Add endpoint_cache for the shared endpoint cache backend
+
+Revision ID: b8c5d6e7f9a0
+Revises: a7b4c5d6e8f9
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8c5d6e7f9a0'
+down_revision: Union[str, None] = 'a7b4c5d6e8f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create UNLOGGED endpoint_cache (disposable cached responses, no WAL)"""
+    op.create_table(
+        'endpoint_cache',
+        sa.Column('user_id', sa.String(length=64), nullable=False),
+        sa.Column('key', sa.String(length=255), nullable=False),
+        sa.Column('value', sa.Text(), nullable=False),
+        sa.Column('stored_at', sa.Float(), nullable=False),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.Column('refreshing_until', sa.Float(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'key'),
+        prefixes=['UNLOGGED']
+    )
+
+
+def downgrade() -> None:
+    """Drop endpoint_cache"""
+    op.drop_table('endpoint_cache')
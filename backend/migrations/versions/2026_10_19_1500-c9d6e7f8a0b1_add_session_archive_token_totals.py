@@ -0,0 +1,46 @@
+"""Add token totals to session_archives
+
+Revision ID: c9d6e7f8a0b1
+Revises: b8c5d6e7f9a0
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9d6e7f8a0b1'
+down_revision: Union[str, None] = 'b8c5d6e7f9a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Add assistant-message token totals, backfilled from the archived documents"""
+    for column in ('prompt_tokens', 'completion_tokens', 'assistant_message_count'):
+        op.add_column('session_archives', sa.Column(column, sa.Integer(), nullable=False, server_default='0'))
+    op.execute("""
+        UPDATE session_archives a
+        SET prompt_tokens = t.prompt,
+            completion_tokens = t.completion,
+            assistant_message_count = t.count
+        FROM (
+            SELECT a2.session_id,
+                   COALESCE(SUM((m->>'prompt_tokens')::int), 0) AS prompt,
+                   COALESCE(SUM((m->>'completion_tokens')::int), 0) AS completion,
+                   COUNT(*) AS count
+            FROM session_archives a2, jsonb_array_elements(a2.messages) AS m
+            WHERE m->>'role' = 'assistant'
+            GROUP BY a2.session_id
+        ) t
+        WHERE a.session_id = t.session_id
+    """)
+
+
+def downgrade() -> None:
+    """Drop the token totals"""
+    for column in ('assistant_message_count', 'completion_tokens', 'prompt_tokens'):
+        op.drop_column('session_archives', column)
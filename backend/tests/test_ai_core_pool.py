@@ -0,0 +1,28 @@
+"""AI Core replica selection"""
+from app.services.ai_core_pool import EndpointPool
+
+
+URLS = ["http://ai-core-1:8000", "http://ai-core-2:8000", "http://ai-core-3:8000"]
+
+
+def test_idle_pool_keeps_session_on_its_replica():
+    for count in (2, 3):
+        pool = EndpointPool(URLS[:count])
+        for n in range(200):
+            key = f"session-{n}"
+            home = pool.choose(affinity_key=key)
+            assert all(pool.choose(affinity_key=key) is home for _ in range(5))
+
+
+def test_idle_pool_spreads_sessions_over_replicas():
+    pool = EndpointPool(URLS)
+    homes = {pool.choose(affinity_key=f"session-{n}").url for n in range(200)}
+    assert homes == set(URLS)
+
+
+def test_busy_home_replica_hands_session_over():
+    pool = EndpointPool(URLS[:2])
+    home = pool.choose(affinity_key="session-1")
+    for _ in range(4):
+        pool.acquire(home)
+    assert pool.choose(affinity_key="session-1") is not home
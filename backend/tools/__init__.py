@@ -0,0 +1 @@
+"""Developer tools - fake AI Core, load and benchmark harnesses"""
@@ -0,0 +1,461 @@
+"""
+Microbenchmarks for backend hot paths
+
+Covers the per-request CPU work that sits next to the AI Core call:
+- ChatService metadata mapping (AI Core response -> MessageCreate / MetadataSchema)
+- MessageResponse.model_validate over a large history
+- decode_access_token
+- Replay delay computation and compare_sessions aggregation
+- CRUD round trips against a real database (Postgres, or in-memory SQLite stand-in)
+- AI Core body encoding (JSON vs msgpack) and, with --transport, full
+  AICoreClient round trips to a zero-latency fake AI Core over TCP vs a Unix
+  socket, JSON vs msgpack
+
+Each benchmark is calibrated to ~--min-time seconds per repeat and run
+--repeat times; results (per-op mean/median/p95/min/stdev) are written as JSON
+so runs can be diffed:
+
+    python -m tools.benchmarks --output before.json
+    # ... change code ...
+    python -m tools.benchmarks --output after.json --compare before.json
+
+CRUD benchmarks use DATABASE_URL unless --database-url is given. Against
+Postgres they need a migrated schema and clean up the rows they create.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from tools.load_test import percentile
+
+DEFAULT_OUTPUT_DIR = "benchmark-results"
+HISTORY_SIZE = 1000  # Messages per fake session (MessageResponse / replay / compare)
+
+
+def sample_ai_response() -> dict:
+    """AI Core /chat response in the v2.1 flat shape plus legacy context"""
+    return {
+        "response": "Sure - expose the port with `ports: [\"8080:80\"]` in the service definition.",
+        "session_id": str(uuid.uuid4()),
+        "metadata": {
+            "persona_used": "Technical + Normal",
+            "tone": "technical",
+            "behavior": "normal",
+            "context_type": "technical",
+            "signal_strength": 0.82,
+            "context_clarity": True,
+            "needs_knowledge": False,
+            "length": 78,
+            "word_count": 12,
+            "estimated_read_time": 1,
+            "has_code_blocks": True,
+            "model": "fake-llm",
+            "usage": {"prompt_tokens": 212, "completion_tokens": 148},
+            "context": {"context_type": "technical", "confidence": 0.9},
+            "valid": True,
+            "warnings": []
+        }
+    }
+
+
+def fake_history(size: int = HISTORY_SIZE):
+    """Transient ChatSession + ordered Message rows (no database needed)"""
+    from app.db import models
+
+    started = datetime.utcnow() - timedelta(hours=6)
+    session = models.ChatSession(
+        id=uuid.uuid4(), user_id=uuid.uuid4(), ai_session_id=str(uuid.uuid4()),
+        title="Benchmark session", created_at=started, is_archived=0
+    )
+    messages = []
+    for index in range(size):
+        assistant = index % 2 == 1
+        messages.append(models.Message(
+            id=uuid.uuid4(),
+            session_id=session.id,
+            role="assistant" if assistant else "user",
+            content=f"message {index} " * 20,
+            persona="Technical + Normal" if assistant else None,
+            tone=("technical" if index % 3 else "casual") if assistant else None,
+            behavior="normal" if assistant else None,
+            context_type="technical" if assistant else None,
+            confidence=0.8 if assistant else None,
+            signal_strength=(index % 10) / 10 if assistant else None,
+            model_name="fake-llm" if assistant else None,
+            prompt_tokens=200 if assistant else None,
+            completion_tokens=150 if assistant else None,
+            created_at=started + timedelta(seconds=index * 7),
+        ))
+    return session, messages
+
+
+def cpu_benchmarks() -> Dict[str, Callable[[], None]]:
+    """Benchmarks that need no database"""
+    from app.services.chat_service import chat_service
+    from app.schemas.chat import MessageResponse
+    from app.core.auth import create_access_token, decode_access_token
+    from app.api.session import build_replay
+    from app.api.analytics import build_compare_item
+
+    ai_response = sample_ai_response()
+    session, messages = fake_history()
+    token = create_access_token({"user_id": str(uuid.uuid4()), "email": "bench@example.com"})
+
+    benchmarks = {
+        "chat.build_assistant_message": lambda: chat_service.build_assistant_message(ai_response),
+        "chat.build_metadata": lambda: chat_service.build_metadata(ai_response),
+        f"history.model_validate_{HISTORY_SIZE}": lambda: [MessageResponse.model_validate(m) for m in messages],
+        "auth.decode_access_token": lambda: decode_access_token(token),
+        f"replay.build_{HISTORY_SIZE}": lambda: build_replay(session, messages),
+        f"analytics.compare_item_{HISTORY_SIZE}": lambda: build_compare_item(session, messages),
+    }
+    benchmarks.update(codec_benchmarks(ai_response))
+    return benchmarks
+
+
+def codec_benchmarks(ai_response: dict) -> Dict[str, Callable[[], None]]:
+    """AI Core response body encode + decode per encoding"""
+    import httpx
+    from app.services import ai_core_codec
+
+    encodings = {"json": False}
+    try:
+        import msgpack  # noqa: F401
+        encodings["msgpack"] = True
+    except ImportError:
+        pass
+
+    benchmarks = {}
+    for name, use_msgpack in encodings.items():
+        body, content_type = ai_core_codec.encode(ai_response, use_msgpack)
+
+        def roundtrip(use_msgpack=use_msgpack, body=body, content_type=content_type):
+            ai_core_codec.encode(ai_response, use_msgpack)
+            ai_core_codec.decode(httpx.Response(200, content=body, headers={"content-type": content_type}))
+
+        benchmarks[f"ai_core.codec_{name}"] = roundtrip
+    return benchmarks
+
+
+def chat_fields() -> dict:
+    """Assistant MessageCreate fields for sample_ai_response()"""
+    from app.services.chat_service import chat_service
+    return chat_service.build_assistant_message(sample_ai_response()).model_dump()
+
+
+def _sqlite_compat() -> None:
+    """Let the Postgres-typed models create on SQLite (stand-in only)"""
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    from sqlalchemy.ext.compiler import compiles
+    from sqlalchemy.dialects.postgresql import UUID, JSONB, TSVECTOR
+
+    compiles(UUID, "sqlite")(lambda type_, compiler, **kw: "CHAR(32)")
+    compiles(JSONB, "sqlite")(lambda type_, compiler, **kw: "JSON")
+    compiles(TSVECTOR, "sqlite")(lambda type_, compiler, **kw: "TEXT")
+
+    @event.listens_for(Engine, "connect")
+    def _register_functions(dbapi_connection, connection_record):
+        dbapi_connection.create_function("to_tsvector", 2, lambda config, text: text, deterministic=True)
+
+
+class CrudFixture:
+    """Benchmark user + session with a seeded history; removed on close"""
+
+    def __init__(self, database_url: str, history_size: int):
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from app.db import crud
+        from app.db.base import Base
+        from app.schemas.chat import MessageCreate
+        from app.schemas.session import SessionCreate
+
+        if database_url.startswith("sqlite"):
+            _sqlite_compat()
+            self.engine = create_engine(database_url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+            from app.db import models  # noqa: F401 - register tables
+            Base.metadata.create_all(bind=self.engine)
+        else:
+            self.engine = create_engine(database_url, pool_pre_ping=True)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+
+        db = self.SessionLocal()
+        try:
+            user = crud.create_user(db, f"bench-{uuid.uuid4().hex[:12]}@example.com", "x", "Benchmark")
+            self.user_id = user.id
+            session = crud.create_session(db, user.id, SessionCreate(ai_session_id=str(uuid.uuid4()), title="bench"))
+            self.session_id = session.id
+            self.since = session.created_at
+            assistant = MessageCreate(**chat_fields())
+            for index in range(history_size):
+                crud.create_message(db, self.session_id, assistant if index % 2 else MessageCreate(role="user", content="hello"))
+        finally:
+            db.close()
+
+    def close(self) -> None:
+        from app.db import crud, models
+
+        db = self.SessionLocal()
+        try:
+            crud.delete_all_user_sessions(db, self.user_id)
+            db.query(models.User).filter(models.User.id == self.user_id).delete()
+            db.commit()
+        finally:
+            db.close()
+        self.engine.dispose()
+
+
+def crud_benchmarks(fixture: CrudFixture) -> Dict[str, Callable[[], None]]:
+    """Round trips through app.db.crud, one Session per op like get_db"""
+    from app.db import crud
+    from app.schemas.chat import MessageCreate
+
+    assistant = MessageCreate(**chat_fields())
+
+    def with_session(fn):
+        def run():
+            db = fixture.SessionLocal()
+            try:
+                fn(db)
+            finally:
+                db.close()
+        return run
+
+    def request_roundtrip(db):
+        # What POST /chat does around the AI Core call
+        session = crud.get_user_session(db, fixture.session_id, fixture.user_id)
+        crud.create_message(db, session.id, MessageCreate(role="user", content="hello"))
+        crud.create_message(db, session.id, assistant)
+
+    return {
+        "crud.get_user_session": with_session(lambda db: crud.get_user_session(db, fixture.session_id, fixture.user_id)),
+        "crud.create_message": with_session(lambda db: crud.create_message(db, fixture.session_id, assistant)),
+        "crud.get_session_messages_100": with_session(
+            lambda db: crud.get_session_messages(db, fixture.session_id, limit=100, since=fixture.since)
+        ),
+        "crud.list_user_sessions": with_session(lambda db: crud.list_user_sessions(db, fixture.user_id)),
+        "crud.chat_request_roundtrip": with_session(request_roundtrip),
+    }
+
+
+class TransportFixture:
+    """Zero-latency fake AI Core on a TCP port and a Unix socket; stopped on close"""
+
+    def __init__(self):
+        import logging
+        import structlog
+
+        # Per-call info logs would dominate a sub-millisecond round trip
+        structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.WARNING))
+        self.dir = tempfile.mkdtemp(prefix="ai-core-bench-")
+        self.socket_path = os.path.join(self.dir, "ai-core.sock")
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+
+        fake = [sys.executable, "-m", "tools.fake_ai_core", "--latency-ms", "0", "--latency-dist", "fixed"]
+        self.processes = [
+            subprocess.Popen(fake + ["--port", str(self.port)]),
+            subprocess.Popen(fake + ["--uds", self.socket_path]),
+        ]
+        self.loop = asyncio.new_event_loop()
+        self.clients = []
+        self._wait_ready()
+
+    def _wait_ready(self, timeout: float = 15.0) -> None:
+        import httpx
+
+        deadline = time.monotonic() + timeout
+        for transport in (httpx.HTTPTransport(), httpx.HTTPTransport(uds=self.socket_path)):
+            with httpx.Client(transport=transport) as client:
+                while True:
+                    try:
+                        client.get(f"http://127.0.0.1:{self.port}/health").raise_for_status()
+                        break
+                    except httpx.HTTPError:
+                        if time.monotonic() > deadline:
+                            raise RuntimeError("fake AI Core did not start")
+                        time.sleep(0.1)
+
+    def client(self, uds: bool, encoding: str):
+        from app.services.ai_core import AICoreClient
+
+        client = AICoreClient(
+            base_url=f"http://127.0.0.1:{self.port}",
+            timeout=10.0,
+            uds=self.socket_path if uds else "",
+            encoding=encoding
+        )
+        self.clients.append(client)
+        return client
+
+    def close(self) -> None:
+        for client in self.clients:
+            self.loop.run_until_complete(client.close())
+        self.loop.close()
+        for process in self.processes:
+            process.terminate()
+            process.wait()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        os.rmdir(self.dir)
+
+
+def transport_benchmarks(fixture: TransportFixture) -> Dict[str, Callable[[], None]]:
+    """AICoreClient.send_message round trip per transport/encoding (pure overhead)"""
+    encodings = ["json"]
+    try:
+        import msgpack  # noqa: F401
+        encodings.append("msgpack")
+    except ImportError:
+        pass
+
+    session_id = str(uuid.uuid4())
+    benchmarks = {}
+    for transport in ("tcp", "uds"):
+        for encoding in encodings:
+            client = fixture.client(uds=transport == "uds", encoding=encoding)
+            benchmarks[f"ai_core.send_message_{transport}_{encoding}"] = (
+                lambda client=client: fixture.loop.run_until_complete(client.send_message("hello", session_id))
+            )
+    return benchmarks
+
+
+def measure(fn: Callable[[], None], repeat: int, min_time: float) -> dict:
+    """Calibrate loop count to min_time, then time `repeat` batches"""
+    fn()  # warm-up (imports, caches, connection pool)
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+
+    per_op = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_op.append((time.perf_counter() - start) / loops)
+
+    ordered = sorted(per_op)
+    median = statistics.median(ordered)
+    return {
+        "loops": loops,
+        "repeat": repeat,
+        "mean_us": round(statistics.fmean(ordered) * 1e6, 3),
+        "median_us": round(median * 1e6, 3),
+        "p95_us": round(percentile(ordered, 95) * 1e6, 3),
+        "min_us": round(ordered[0] * 1e6, 3),
+        "stdev_us": round(statistics.stdev(ordered) * 1e6, 3) if len(ordered) > 1 else 0.0,
+        "ops_per_s": round(1 / median, 1) if median else None,
+    }
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "git_commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_report(results: Dict[str, dict], baseline: Optional[Dict[str, dict]]) -> None:
+    header = f"{'benchmark':<36}{'median us':>12}{'p95 us':>12}{'stdev us':>12}{'ops/s':>12}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in results.items():
+        line = (
+            f"{name:<36}{stats['median_us']:>12}{stats['p95_us']:>12}"
+            f"{stats['stdev_us']:>12}{stats['ops_per_s']:>12}"
+        )
+        if baseline:
+            before = baseline.get(name)
+            if before and before["median_us"]:
+                change = (stats["median_us"] - before["median_us"]) / before["median_us"] * 100
+                line += f"{change:>+9.1f}%"
+            else:
+                line += f"{'new':>10}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for backend hot paths")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed batches per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.1, help="Target seconds per batch")
+    parser.add_argument("--database-url", default=None, help="CRUD target (default DATABASE_URL; sqlite:// for stand-in)")
+    parser.add_argument("--history-size", type=int, default=200, help="Messages seeded for CRUD benchmarks")
+    parser.add_argument("--no-db", action="store_true", help="Skip CRUD benchmarks")
+    parser.add_argument("--transport", action="store_true", help="Also run AI Core TCP/UDS round trips (starts fake AI Core)")
+    parser.add_argument("--output", default=None, help=f"Results JSON (default {DEFAULT_OUTPUT_DIR}/<timestamp>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline results JSON to diff against")
+    args = parser.parse_args()
+
+    benchmarks = cpu_benchmarks()
+    fixture = None
+    if not args.no_db:
+        from app.core.config import settings
+        fixture = CrudFixture(args.database_url or settings.database_url, args.history_size)
+        benchmarks.update(crud_benchmarks(fixture))
+    transport = None
+    if args.transport:
+        transport = TransportFixture()
+        benchmarks.update(transport_benchmarks(transport))
+
+    results = {}
+    try:
+        for name, fn in benchmarks.items():
+            if args.filter and args.filter not in name:
+                continue
+            results[name] = measure(fn, args.repeat, args.min_time)
+            print(f"  {name}: {results[name]['median_us']} us", file=sys.stderr)
+    finally:
+        if fixture:
+            fixture.close()
+        if transport:
+            transport.close()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["benchmarks"]
+    print_report(results, baseline)
+
+    output = args.output
+    if not output:
+        os.makedirs(DEFAULT_OUTPUT_DIR, exist_ok=True)
+        output = os.path.join(DEFAULT_OUTPUT_DIR, datetime.utcnow().strftime("%Y%m%dT%H%M%S") + ".json")
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "benchmarks": results}, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
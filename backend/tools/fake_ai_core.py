@@ -0,0 +1,215 @@
+"""
+Fake AI Core - local stand-in for load testing
+
+Implements the contract AICoreClient uses:
+- POST /chat                      {message, session_id?} -> {response, session_id, metadata}
+- GET  /chat/history/{session_id} ?limit=              -> {session_id, messages}
+- POST /chat/stream               same body, text/event-stream of tokens + final metadata
+
+Latency, error rate, hangs and token counts are configurable so the
+backend can be load-tested without a real LLM. Bodies are JSON, or msgpack
+when the client sends / accepts application/msgpack (if msgpack is installed).
+
+Run:
+    python -m tools.fake_ai_core --port 8000 --latency-ms 800 --latency-dist lognormal --error-rate 0.01
+    python -m tools.fake_ai_core --uds /tmp/ai-core.sock  # AI_CORE_UDS=/tmp/ai-core.sock
+"""
+import argparse
+import asyncio
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+try:
+    import msgpack
+except ImportError:  # JSON only
+    msgpack = None
+
+MSGPACK = "application/msgpack"
+
+WORDS = (
+    "docker container image volume network compose build deploy python fastapi "
+    "postgres index query cache latency worker session token model prompt stream "
+    "ok sure well actually hmm nice question let me think about that for a second"
+).split()
+
+
+@dataclass
+class FakeConfig:
+    """Behaviour knobs (set from CLI flags)"""
+    latency_ms: float = 500.0  # Median generation latency
+    latency_dist: str = "lognormal"  # fixed | uniform | lognormal
+    latency_sigma: float = 0.5  # lognormal shape / uniform spread (fraction of median)
+    error_rate: float = 0.0  # Fraction of requests answered with HTTP 500
+    hang_rate: float = 0.0  # Fraction of requests that never answer (client timeout)
+    prompt_tokens: int = 200  # Mean prompt tokens
+    completion_tokens: int = 150  # Mean completion tokens
+    model: str = "fake-llm"
+
+
+config = FakeConfig()
+
+# session_id -> messages (the "AI memory")
+sessions: Dict[str, List[dict]] = {}
+
+
+class ChatRequest(BaseModel):
+    message: str
+    session_id: Optional[str] = None
+
+
+def sample_latency() -> float:
+    """Generation latency in seconds, drawn from the configured distribution"""
+    median = config.latency_ms / 1000
+    if config.latency_dist == "fixed":
+        return median
+    if config.latency_dist == "uniform":
+        spread = median * config.latency_sigma
+        return max(random.uniform(median - spread, median + spread), 0.0)
+    # lognormal: median = exp(mu) -> heavy right tail like real LLM latency
+    return random.lognormvariate(0.0, config.latency_sigma) * median
+
+
+def sample_tokens(mean: int) -> int:
+    """Token count around mean (+/- 50%)"""
+    return max(int(random.uniform(0.5, 1.5) * mean), 1)
+
+
+async def maybe_fail() -> None:
+    """Inject configured errors / hangs"""
+    roll = random.random()
+    if roll < config.hang_rate:
+        await asyncio.sleep(3600)
+    if roll < config.hang_rate + config.error_rate:
+        raise HTTPException(status_code=500, detail="Injected AI Core failure")
+
+
+async def read_chat_request(request: Request) -> ChatRequest:
+    """Body as JSON or msgpack, by Content-Type"""
+    body = await request.body()
+    if request.headers.get("content-type", "").startswith(MSGPACK):
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="msgpack not supported")
+        return ChatRequest(**msgpack.unpackb(body))
+    return ChatRequest(**json.loads(body))
+
+
+def encoded(request: Request, data: dict) -> Response:
+    """msgpack if the client accepts it (and we can), else JSON"""
+    if msgpack is not None and MSGPACK in request.headers.get("accept", ""):
+        return Response(msgpack.packb(data), media_type=MSGPACK)
+    return JSONResponse(data)
+
+
+def build_turn(request: ChatRequest):
+    """Create response text + metadata and record the turn in session memory"""
+    session_id = request.session_id or str(uuid.uuid4())
+    completion_tokens = sample_tokens(config.completion_tokens)
+    words = [random.choice(WORDS) for _ in range(completion_tokens)]
+    text = " ".join(words)
+    tone = random.choice(["casual", "technical"])
+    behavior = random.choice(["normal", "cautious"])
+
+    metadata = {
+        "persona_used": f"{tone.title()} + {behavior.title()}",
+        "tone": tone,
+        "behavior": behavior,
+        "context_type": tone,
+        "signal_strength": round(random.random(), 3),
+        "context_clarity": random.random() > 0.1,
+        "needs_knowledge": random.random() < 0.2,
+        "length": len(text),
+        "word_count": len(words),
+        "estimated_read_time": max(len(words) // 200, 1),
+        "has_code_blocks": False,
+        "model": config.model,
+        "usage": {
+            "prompt_tokens": sample_tokens(config.prompt_tokens),
+            "completion_tokens": completion_tokens
+        },
+        "valid": True,
+        "warnings": []
+    }
+
+    history = sessions.setdefault(session_id, [])
+    history.append({"role": "user", "content": request.message})
+    history.append({"role": "assistant", "content": text})
+    return session_id, words, metadata
+
+
+app = FastAPI(title="Fake AI Core")
+
+
+@app.post("/chat")
+async def chat(http_request: Request):
+    """Non-streaming chat turn"""
+    request = await read_chat_request(http_request)
+    await maybe_fail()
+    await asyncio.sleep(sample_latency())
+    session_id, words, metadata = build_turn(request)
+    return encoded(http_request, {"response": " ".join(words), "session_id": session_id, "metadata": metadata})
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming chat turn - latency spread evenly across tokens"""
+    await maybe_fail()
+    latency = sample_latency()
+    session_id, words, metadata = build_turn(request)
+
+    async def events():
+        delay = latency / len(words)
+        for index, word in enumerate(words):
+            await asyncio.sleep(delay)
+            token = word if index == 0 else f" {word}"
+            yield f"data: {json.dumps({'token': token})}\n\n"
+        yield f"data: {json.dumps({'done': True, 'session_id': session_id, 'metadata': metadata})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/chat/history/{session_id}")
+async def history(http_request: Request, session_id: str, limit: int = 20):
+    """Conversation memory for a session"""
+    messages = sessions.get(session_id, [])
+    return encoded(http_request, {"session_id": session_id, "messages": messages[-limit:]})
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "sessions": len(sessions)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake AI Core for load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--uds", default=None, help="Listen on this Unix socket instead of host:port")
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--latency-dist", choices=["fixed", "uniform", "lognormal"], default=config.latency_dist)
+    parser.add_argument("--latency-sigma", type=float, default=config.latency_sigma)
+    parser.add_argument("--error-rate", type=float, default=config.error_rate)
+    parser.add_argument("--hang-rate", type=float, default=config.hang_rate)
+    parser.add_argument("--prompt-tokens", type=int, default=config.prompt_tokens)
+    parser.add_argument("--completion-tokens", type=int, default=config.completion_tokens)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    for field in ("latency_ms", "latency_dist", "latency_sigma", "error_rate",
+                  "hang_rate", "prompt_tokens", "completion_tokens"):
+        setattr(config, field, getattr(args, field))
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, uds=args.uds, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
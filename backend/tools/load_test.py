@@ -0,0 +1,207 @@
+"""
+End-to-end load generator for the Conversation Service
+
+Each virtual user registers, logs in, then loops over a weighted mix of
+chat / history / sessions / analytics calls until the run ends. Reports
+throughput and p50/p95/p99 latency per endpoint.
+
+Run against a backend pointed at the fake AI Core:
+    python -m tools.fake_ai_core --port 8000 &
+    python main.py &
+    python -m tools.load_test --base-url http://localhost:3000 --users 20 --duration 60 \\
+        --mix chat=60,history=20,sessions=10,analytics=10 --json results.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+DEFAULT_MIX = "chat=60,history=20,sessions=10,analytics=10"
+
+PROMPTS = [
+    "How do I expose a port in docker compose?",
+    "Explain postgres partial indexes",
+    "tell me a joke",
+    "What's the difference between a process and a thread?",
+    "Why is my fastapi endpoint slow?",
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+class Recorder:
+    """Per-endpoint latency samples and error counts"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool) -> None:
+        self.latencies[endpoint].append(seconds)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, dict]:
+        result = {}
+        for endpoint, samples in sorted(self.latencies.items()):
+            ordered = sorted(samples)
+            result[endpoint] = {
+                "count": len(ordered),
+                "errors": self.errors[endpoint],
+                "rps": round(len(ordered) / elapsed, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1),
+            }
+        return result
+
+
+class LoginFailed(Exception):
+    """A virtual user could not get a token - the run would measure nothing"""
+
+
+class VirtualUser:
+    """One simulated user with its own token and chat session"""
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, mix: Dict[str, int]):
+        self.client = client
+        self.recorder = recorder
+        self.mix = mix
+        self.headers: Dict[str, str] = {}
+        self.session_id: Optional[str] = None
+
+    async def call(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Timed request; transport errors count as failures"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, headers=self.headers, **kwargs)
+        except httpx.HTTPError:
+            self.recorder.record(endpoint, time.perf_counter() - start, ok=False)
+            return None
+        self.recorder.record(endpoint, time.perf_counter() - start, ok=response.status_code < 400)
+        return response
+
+    async def login(self) -> None:
+        email = f"load-{uuid.uuid4().hex[:12]}@example.com"
+        password = "load-test-password"
+        await self.call("register", "POST", "/auth/register",
+                        json={"email": email, "password": password, "name": "Load Test"})
+        response = await self.call("login", "POST", "/auth/login",
+                                   json={"email": email, "password": password})
+        if response is None:
+            raise LoginFailed("login: no response from the backend")
+        if response.status_code != 200:
+            raise LoginFailed(f"login: HTTP {response.status_code} {response.text[:200]}")
+        self.headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def chat(self) -> None:
+        payload = {"message": random.choice(PROMPTS)}
+        if self.session_id:
+            payload["session_id"] = self.session_id
+        response = await self.call("chat", "POST", "/chat", json=payload)
+        if response is not None and response.status_code == 200:
+            self.session_id = response.json()["session_id"]
+
+    async def history(self) -> None:
+        if not self.session_id:
+            return await self.chat()
+        await self.call("history", "GET", f"/chat/history/{self.session_id}")
+
+    async def sessions(self) -> None:
+        await self.call("sessions", "GET", "/sessions")
+
+    async def analytics(self) -> None:
+        await self.call("analytics", "GET", "/analytics/tokens")
+
+    async def run(self, deadline: float, think_time: float) -> None:
+        actions = list(self.mix)
+        weights = [self.mix[action] for action in actions]
+        while time.perf_counter() < deadline:
+            action = random.choices(actions, weights=weights)[0]
+            await getattr(self, action)()
+            if think_time:
+                await asyncio.sleep(random.expovariate(1 / think_time))
+
+
+def parse_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in ("chat", "history", "sessions", "analytics"):
+            raise argparse.ArgumentTypeError(f"Unknown action: {name}")
+        mix[name] = int(weight)
+    return mix
+
+
+def print_report(summary: Dict[str, dict], elapsed: float) -> None:
+    print(f"\nDuration: {elapsed:.1f}s")
+    header = f"{'endpoint':<12}{'count':>8}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, stats in summary.items():
+        print(
+            f"{endpoint:<12}{stats['count']:>8}{stats['errors']:>8}{stats['rps']:>9}"
+            f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+        )
+
+
+async def run_load(args) -> Dict[str, dict]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        # Everyone logs in before the clock starts - a user without a token would
+        # silently shrink the load (e.g. auth rate limit: all users share one IP)
+        users = [VirtualUser(client, recorder, args.mix) for _ in range(args.users)]
+        await asyncio.gather(*(user.login() for user in users))
+
+        start = time.perf_counter()
+        deadline = start + args.duration
+        await asyncio.gather(*(user.run(deadline, args.think_time) for user in users))
+        elapsed = time.perf_counter() - start
+
+    summary = recorder.summary(elapsed)
+    print_report(summary, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"duration_s": round(elapsed, 2), "users": args.users, "endpoints": summary}, f, indent=2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the Conversation Service")
+    parser.add_argument("--base-url", default="http://localhost:3000")
+    parser.add_argument("--users", type=int, default=10, help="Concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"Action weights (default {DEFAULT_MIX})")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Mean pause between actions (s)")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", default=None, help="Write results to this file")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    try:
+        asyncio.run(run_load(args))
+    except LoginFailed as e:
+        sys.exit(f"Aborted, a virtual user could not log in ({e}). Start the backend with "
+                 "RATE_LIMIT_ENABLED=false, or raise AUTH_RATE_LIMIT_* and IP_RATE_LIMIT_*.")
+
+
+if __name__ == "__main__":
+    main()